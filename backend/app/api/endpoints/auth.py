@@ -120,7 +120,7 @@ async def auth_via_google(
             print(f"[DEBUG] Updating user picture from Google to: {google_picture}")
             await users_collection.update_one(
                 {"_id": user["_id"]},
-                {"$set": {"picture": google_picture}}
+                {"$set": {"picture": google_picture}, "$inc": {"data_version": 1}}  # Invalidates /users/me ETags
             )
             user['picture'] = google_picture
         elif not google_picture:
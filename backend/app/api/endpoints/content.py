@@ -1,21 +1,37 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, status, Request, Response
+from fastapi import APIRouter, HTTPException, Depends, status, Request, Response, Query
+from fastapi.responses import StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from typing import List
+from typing import List, AsyncIterator, Optional
+import json
 import os
 import httpx
 from bson import ObjectId
 import asyncio
 import ssl
+from datetime import datetime, timedelta
 
 from app.core.security import get_current_user
 from app.db.database import get_db, get_content_collection
 from app.core.config import settings
 from app.schemas.content_schema import Content, ContentResponse
 from app.schemas.quiz_schema import QuizResponse
-from app.schemas.user_schema import SummaryResponse, AskRequest, AskResponse
+from app.schemas.user_schema import SummaryResponse, AskRequest, AskBatchRequest, AskResponse, UserPreferences
 from app.utils.file_manager import get_file_manager
+from app.utils.multipart import AsyncMultipartFile
+from app.utils.upload_stream import ALLOWED_UPLOAD_TYPES, MultipartFileStream, checked_upload_chunks, reject_oversized_request
 from app.middleware.rate_limiter import limiter, get_rate_limit
-from app.utils.markdown_formatter import enhance_summary_response
+from app.utils.markdown_formatter import enhance_summary_response, IncrementalMarkdownCleaner
+from app.utils.ai_client import get_ai_client, raise_for_ai_status, iter_ai_text, AISessionExpiredError
+from app.utils.summary_store import get_summary_store
+from app.utils.quiz_bank import get_quiz_bank, normalize_question
+from app.utils.answer_cache import get_answer_cache
+from app.utils.single_flight import get_single_flight
+from app.utils.job_manager import get_job_manager, job_accepted_response
+from app.utils.ai_operations import run_ai_operation
+from app.utils.request_queue import get_queue_manager
+from app.utils.deadlines import run_with_deadline, stream_with_deadline, cancel_on_disconnect
+from app.utils.compression import negotiate_encoding
+from app.utils.etags import bump_data_version, user_etag, etag_matches, not_modified, set_etag
 
 router = APIRouter()
 
@@ -23,33 +39,41 @@ router = APIRouter()
 UPLOAD_DIRECTORY = "./uploads"
 os.makedirs(UPLOAD_DIRECTORY, exist_ok=True)
 
-# AI Service URL
-AI_SERVICE_URL = settings.AI_SERVICE_URL
-
 # Get file manager instance
-file_manager = get_file_manager(UPLOAD_DIRECTORY)
+file_manager = get_file_manager(UPLOAD_DIRECTORY, settings.UPLOAD_TEMP_DIRECTORY or None)
 
+# Shared AI gateway (pooled connections, opened in the app lifespan)
+ai_client = get_ai_client()
 
-def create_http_client():
-    """
-    Create an HTTP client with SSL verification disabled and connection pooling.
-    This helps with unstable ngrok tunnels and SSL handshake issues.
-    """
-    # Disable SSL verification for ngrok tunnels
-    ssl_context = ssl.create_default_context()
-    ssl_context.check_hostname = False
-    ssl_context.verify_mode = ssl.CERT_NONE
-    
-    return httpx.AsyncClient(
-        timeout=None,  # No timeout for large documents
-        follow_redirects=True,
-        verify=False,  # Disable SSL verification
-        limits=httpx.Limits(
-            max_keepalive_connections=5,
-            max_connections=10,
-            keepalive_expiry=30.0  # Keep connections alive for 30s
-        )
-    )
+# Formatted summaries keyed by file SHA-256 (LRU in front of MongoDB)
+summary_store = get_summary_store()
+
+# Per-document quiz question banks keyed by file SHA-256
+quiz_bank = get_quiz_bank()
+
+# Answers to repeated (or rephrased) questions per document
+answer_cache = get_answer_cache()
+
+# Coalesces concurrent identical AI calls (uploads, summaries, quiz generation)
+ai_flights = get_single_flight()
+
+# Background jobs for ?async=1 summarize/quiz requests
+job_manager = get_job_manager()
+
+# Fair scheduler: caps concurrent AI calls and takes turns between users
+ai_queue = get_queue_manager()
+
+# Strong references to fire-and-forget tasks so they are not garbage collected
+_background_tasks = set()
+
+# Content fields kept out of GET /content/ (AI session and hashing bookkeeping)
+INTERNAL_CONTENT_FIELDS = {
+    "session_id": 0,
+    "session_backend": 0,
+    "session_created_at": 0,
+    "session_expires_at": 0,
+    "content_hash": 0
+}
 
 
 async def retry_request(request_func, max_retries=3, initial_delay=1.0):
@@ -97,14 +121,22 @@ async def retry_request(request_func, max_retries=3, initial_delay=1.0):
     )
 
 
-async def activate_document_on_ai_server(content_id: str, db: AsyncIOMotorDatabase):
+async def activate_document_on_ai_server(
+    content_id: str,
+    db: AsyncIOMotorDatabase,
+    force_refresh: bool = False
+):
     """
     Upload document to AI server to activate it for processing.
-    Returns the session_id from the AI service.
+    Returns the session_id from the AI service, reusing the cached one
+    while it is younger than AI_SESSION_TTL_SECONDS.
+    Documents with identical files (same SHA-256) share one AI session, and
+    concurrent activations of any of them share a single upload.
     
     Args:
         content_id: MongoDB document ID
         db: Database instance
+        force_refresh: Ignore the cached session_id and re-upload
         
     Returns:
         str: session_id from AI service
@@ -113,8 +145,7 @@ async def activate_document_on_ai_server(content_id: str, db: AsyncIOMotorDataba
         HTTPException: If document not found or AI service unavailable
     """
     # Fetch document metadata
-    content_collection = get_content_collection(db)
-    content = await content_collection.find_one({"_id": ObjectId(content_id)})
+    content = await get_content_collection(db).find_one({"_id": ObjectId(content_id)})
     
     if not content:
         raise HTTPException(
@@ -122,19 +153,51 @@ async def activate_document_on_ai_server(content_id: str, db: AsyncIOMotorDataba
             detail="Document not found"
         )
     
-    # Check if we already have a session_id stored
-    # NOTE: Temporarily disabled session caching due to Kalash's AI service errors
-    # Re-enable this after Kalash fixes the "cannot pickle 'coroutine' object" bug
-    # if "session_id" in content:
-    #     print(f"[DEBUG] Using cached session_id: {content['session_id']}")
-    #     return content["session_id"]
+    content_hash = await get_content_hash(content, db)
+    
+    return await ai_flights.do(
+        ("activate", content_hash, force_refresh),
+        _activate_document,
+        content,
+        content_hash,
+        db,
+        force_refresh
+    )
+
+
+async def _activate_document(content: dict, content_hash: str, db: AsyncIOMotorDatabase, force_refresh: bool):
+    """
+    Activate a document on the AI server (see activate_document_on_ai_server).
+    """
+    content_collection = get_content_collection(db)
+    content_id = str(content["_id"])
+    
+    # Reuse a session_id stored on any document with the same file while it is still
+    # within its TTL and its backend is up. If the AI service has dropped it anyway,
+    # call_with_ai_session re-uploads once.
+    # (Sessions stored before multi-backend routing live on AI_SERVICE_URL.)
+    shared = await content_collection.find_one(
+        {"content_hash": content_hash, "session_expires_at": {"$gt": datetime.utcnow()}},
+        sort=[("session_expires_at", -1)]
+    )
+    session_backend = shared and ai_client.backend_for(shared.get("session_backend", settings.AI_SERVICE_URL))
+    if (
+        not force_refresh
+        and shared
+        and shared.get("session_id")
+        and session_backend is not None
+        and not ai_client.should_rehome(session_backend)
+    ):
+        print(f"[DEBUG] Using cached session_id: {shared['session_id']} on {session_backend.base_url}")
+        ai_client.bind(shared["session_id"], session_backend)
+        return shared["session_id"]
     
     print(f"[DEBUG] No cached session_id, uploading file fresh...")
     
-    # Construct file path
-    file_path = os.path.join(UPLOAD_DIRECTORY, content_id)
+    # Locate the blob in storage (local stat in the thread pool, or a HEAD request)
+    file_size = await file_manager.get_file_size(content_id, content_hash)
     
-    if not os.path.exists(file_path):
+    if file_size is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="File not found on server"
@@ -143,39 +206,32 @@ async def activate_document_on_ai_server(content_id: str, db: AsyncIOMotorDataba
     # Upload to AI service with retry logic
     try:
         print(f"[DEBUG] Uploading file to AI service: {content['filename']}")
-        print(f"[DEBUG] AI Service URL: {AI_SERVICE_URL}/upload")
-        print(f"[DEBUG] File size: {os.path.getsize(file_path)} bytes")
+        print(f"[DEBUG] File size: {file_size} bytes")
+        
+        # Multipart body streamed from storage in chunks (re-read on each retry)
+        body = AsyncMultipartFile(
+            lambda: file_manager.read_file(content_id, content_hash),
+            file_size,
+            content["filename"],
+            content["content_type"]
+        )
+        backend = None
         
         async def upload_request():
-            async with create_http_client() as client:
-                with open(file_path, "rb") as f:
-                    files = {"file": (content["filename"], f, content["content_type"])}
-                    
-                    # Add headers for ngrok - required to bypass browser warning
-                    headers = {
-                        "ngrok-skip-browser-warning": "true",
-                        "User-Agent": "PrepGen-Backend/1.0"
-                    }
-                    
-                    response = await client.post(
-                        f"{AI_SERVICE_URL}/upload",
-                        files=files,
-                        headers=headers
-                    )
-                    
-                    print(f"[DEBUG] Upload response status: {response.status_code}")
-                    print(f"[DEBUG] Upload response body: {response.text[:500]}")
-                    
-                    # Check if we got an ngrok error page (BEFORE raise_for_status!)
-                    if response.status_code != 200:
-                        if "ngrok" in response.text.lower() or "<!DOCTYPE html>" in response.text:
-                            raise HTTPException(
-                                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                                detail="AI service is currently offline (ngrok tunnel not responding)"
-                            )
-                        response.raise_for_status()  # Raise for other non-200 errors
-                    
-                    return response
+            nonlocal backend
+            
+            # New session: least loaded healthy backend (re-picked on each retry)
+            backend = ai_client.pick()
+            print(f"[DEBUG] AI Service URL: {backend.base_url}/upload")
+            response = await backend.post("/upload", operation="upload", content=body, headers=body.headers)
+            
+            print(f"[DEBUG] Upload response status: {response.status_code}")
+            print(f"[DEBUG] Upload response body: {response.text[:500]}")
+            
+            # Check if we got an ngrok error page (BEFORE raise_for_status!)
+            raise_for_ai_status(response)
+            
+            return response
         
         response = await retry_request(upload_request)
         ai_response = response.json()
@@ -191,10 +247,17 @@ async def activate_document_on_ai_server(content_id: str, db: AsyncIOMotorDataba
         
         print(f"[DEBUG] Received session_id: {session_id}")
         
-        # Store session_id in database for future use
+        # Store session_id (and the backend holding it) in database for future use
+        ai_client.bind(session_id, backend)
+        now = datetime.utcnow()
         await content_collection.update_one(
             {"_id": ObjectId(content_id)},
-            {"$set": {"session_id": session_id}}
+            {"$set": {
+                "session_id": session_id,
+                "session_backend": backend.base_url,
+                "session_created_at": now,
+                "session_expires_at": now + timedelta(seconds=settings.AI_SESSION_TTL_SECONDS)
+            }}
         )
         
         return session_id
@@ -211,6 +274,8 @@ async def activate_document_on_ai_server(content_id: str, db: AsyncIOMotorDataba
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=f"AI service unavailable: {str(e)}"
         )
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"[ERROR] Unexpected error during file upload: {str(e)}")
         raise HTTPException(
@@ -219,96 +284,677 @@ async def activate_document_on_ai_server(content_id: str, db: AsyncIOMotorDataba
         )
 
 
-@router.post("/upload")
+async def invalidate_ai_session(session_id: str, db: AsyncIOMotorDatabase):
+    """
+    Forget a cached session_id that the AI service no longer recognises
+    (or whose backend is down). Only clears it if it has not already been
+    replaced by a concurrent request.
+    
+    Args:
+        session_id: The stale session_id
+        db: Database instance
+    """
+    ai_client.forget(session_id)
+    content_collection = get_content_collection(db)
+    await content_collection.update_many(
+        {"session_id": session_id},
+        {"$unset": {"session_id": "", "session_backend": "", "session_created_at": "", "session_expires_at": ""}}
+    )
+
+
+async def call_with_ai_session(content_id: str, db: AsyncIOMotorDatabase, request_func):
+    """
+    Run an AI request that needs the document's session_id.
+    If the AI service reports the session as expired/evicted, re-upload the
+    document once and retry transparently.
+    
+    Args:
+        content_id: MongoDB document ID
+        db: Database instance
+        request_func: Async function taking a session_id and returning the response
+        
+    Returns:
+        Response from the successful request
+    """
+    session_id = await activate_document_on_ai_server(content_id, db)
+    
+    try:
+        return await retry_request(lambda: request_func(session_id))
+    except AISessionExpiredError as e:
+        print(f"[DEBUG] AI session {session_id} expired ({str(e)}), re-uploading document...")
+        await invalidate_ai_session(session_id, db)
+    
+    session_id = await activate_document_on_ai_server(content_id, db, force_refresh=True)
+    return await retry_request(lambda: request_func(session_id))
+
+
+async def get_content_hash(content: dict, db: AsyncIOMotorDatabase) -> str:
+    """
+    Get the SHA-256 of a document's file (recorded at upload; computed and
+    stored on first use for uploads made before deduplication).
+    
+    Args:
+        content: Content document from MongoDB
+        db: Database instance
+        
+    Returns:
+        str: Hex SHA-256 of the stored file
+        
+    Raises:
+        HTTPException: If the file is missing on disk
+    """
+    if content.get("content_hash"):
+        return content["content_hash"]
+    
+    content_hash = await file_manager.calculate_file_hash(str(content["_id"]))
+    if not content_hash:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File not found on server"
+        )
+    
+    await get_content_collection(db).update_one(
+        {"_id": content["_id"]},
+        {"$set": {"content_hash": content_hash}}
+    )
+    content["content_hash"] = content_hash
+    return content_hash
+
+
+async def generate_summary(content_id: str, content_hash: str, db: AsyncIOMotorDatabase) -> dict:
+    """
+    Ask the AI service for a summary, format it and persist it.
+    
+    Args:
+        content_id: MongoDB document ID
+        content_hash: SHA-256 of the document's file
+        db: Database instance
+        
+    Returns:
+        dict: Formatted summary response
+    """
+    # Call AI service for summary over the shared pool, with retry on SSL errors
+    async def summary_request(session_id: str):
+        print(f"[DEBUG] Requesting summary with session_id: {session_id}")
+        
+        resp = await ai_client.post(
+            "/summarize",
+            operation="summarize",
+            session_id=session_id,
+            json={"session_id": session_id}
+        )
+        
+        print(f"[DEBUG] Summary response status: {resp.status_code}")
+        print(f"[DEBUG] Summary response body: {resp.text[:500]}")
+        
+        # Check for ngrok errors (BEFORE raise_for_status!)
+        raise_for_ai_status(resp)
+        
+        return resp
+    
+    response = await call_with_ai_session(content_id, db, summary_request)
+    summary_data = response.json()
+    
+    # Enhance markdown formatting before returning to frontend
+    enhanced_summary = enhance_summary_response(summary_data)
+    
+    # Persist the formatted output for repeat requests
+    await summary_store.put(db, content_hash, enhanced_summary)
+    
+    return enhanced_summary
+
+
+async def answer_question(content_id: str, db: AsyncIOMotorDatabase, question: str) -> dict:
+    """
+    Ask the AI service a question about a document.
+    
+    Args:
+        content_id: MongoDB document ID
+        db: Database instance
+        question: Question text
+        
+    Returns:
+        dict: Raw JSON answer from the AI service
+    """
+    async def ask_request(session_id: str):
+        resp = await ai_client.post(
+            "/ask",
+            operation="ask",
+            session_id=session_id,
+            json={
+                "session_id": session_id,
+                "question": question
+            }
+        )
+        
+        # Check for ngrok errors (BEFORE raise_for_status!)
+        raise_for_ai_status(resp)
+        
+        return resp
+    
+    response = await call_with_ai_session(content_id, db, ask_request)
+    return response.json()
+
+
+def transform_quiz_questions(quiz_questions: list) -> list:
+    """
+    Transform quiz questions from Kalash's API format to the frontend format
+    (correct_answer as an option index instead of the option text).
+    
+    Args:
+        quiz_questions: Questions from the AI service
+        
+    Returns:
+        list: Questions in frontend format
+    """
+    transformed_questions = []
+    
+    for q in quiz_questions:
+        # Find the index of the correct answer
+        correct_answer_index = 0
+        if "correct_answer" in q and "options" in q:
+            try:
+                correct_answer_index = q["options"].index(q["correct_answer"])
+            except ValueError:
+                # If exact match not found, try case-insensitive match
+                correct_answer_lower = q["correct_answer"].lower().strip()
+                for i, opt in enumerate(q["options"]):
+                    if opt.lower().strip() == correct_answer_lower:
+                        correct_answer_index = i
+                        break
+        
+        transformed_questions.append({
+            "question": q.get("question", ""),
+            "options": q.get("options", []),
+            "correct_answer": correct_answer_index,
+            "explanation": q.get("explanation", "")
+        })
+    
+    return transformed_questions
+
+
+async def request_quiz_from_ai(content_id: str, db: AsyncIOMotorDatabase) -> dict:
+    """
+    Ask the AI service to generate quiz questions for a document.
+    
+    Args:
+        content_id: MongoDB document ID
+        db: Database instance
+        
+    Returns:
+        dict: Raw JSON response from the AI service
+    """
+    async def quiz_request(session_id: str):
+        print(f"[DEBUG] Requesting quiz with session_id: {session_id}")
+        
+        resp = await ai_client.post(
+            "/quiz",
+            operation="quiz",
+            session_id=session_id,
+            json={"session_id": session_id}
+        )
+        
+        # Log the response for debugging
+        print(f"[DEBUG] Quiz response status: {resp.status_code}")
+        print(f"[DEBUG] Quiz response body: {resp.text[:500]}")  # First 500 chars
+        
+        # Check for ngrok errors (BEFORE raise_for_status!)
+        raise_for_ai_status(resp)
+        
+        return resp
+    
+    response = await call_with_ai_session(content_id, db, quiz_request)
+    return response.json()
+
+
+async def generate_quiz_questions(content_id: str, bank_key: str, db: AsyncIOMotorDatabase) -> dict:
+    """
+    Generate quiz questions with the AI service and add them to the document's bank.
+    
+    Args:
+        content_id: MongoDB document ID
+        bank_key: Document key (file SHA-256)
+        db: Database instance
+        
+    Returns:
+        dict: {"questions": [...]} in frontend format, or the raw AI response
+    """
+    ai_response = await request_quiz_from_ai(content_id, db)
+    
+    # Transform response format from Kalash's API to frontend format
+    if "quiz" not in ai_response:
+        return ai_response
+    
+    transformed_questions = transform_quiz_questions(ai_response["quiz"])
+    
+    # Keep the questions for later quiz requests
+    added = await quiz_bank.add_questions(db, bank_key, transformed_questions)
+    print(f"[DEBUG] Quiz bank {bank_key[:12]} gained {added} new questions")
+    
+    return {"questions": transformed_questions}
+
+
+def schedule_quiz_bank_refill(content_id: str, bank_key: str, user_id: str, db: AsyncIOMotorDatabase):
+    """
+    Top up a document's question bank in the background.
+    Skipped if a generation for this bank is already in flight.
+    
+    Args:
+        content_id: MongoDB document ID (used to activate the document)
+        bank_key: Document key (file SHA-256)
+        user_id: User whose request triggered the refill (queued as theirs)
+        db: Database instance
+    """
+    key = ("quiz", bank_key)
+    if ai_flights.in_flight(key):
+        return
+    
+    async def refill():
+        try:
+            await run_ai_operation(key, user_id, generate_quiz_questions, content_id, bank_key, db)
+        except Exception as e:
+            print(f"[ERROR] Background quiz bank refill failed: {str(e)}")
+    
+    task = asyncio.create_task(refill())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+def schedule_precompute(content_id: str, user_id: str, db: AsyncIOMotorDatabase):
+    """
+    Prepare a freshly uploaded document in the background: activate its AI
+    session, generate and store the summary and (if PRECOMPUTE_QUIZ) a first
+    quiz batch, so the first click is served from storage.
+    Runs at background priority in the AI scheduler.
+    
+    Args:
+        content_id: MongoDB document ID
+        user_id: Owner of the document
+        db: Database instance
+    """
+    async def precompute():
+        try:
+            content = await get_content_collection(db).find_one({"_id": ObjectId(content_id)})
+            if not content:
+                return
+            content_hash = await get_content_hash(content, db)
+            
+            await run_ai_operation(
+                ("activate", content_hash), user_id, activate_document_on_ai_server, content_id, db,
+                background=True
+            )
+            
+            if not await summary_store.get(db, content_hash):
+                await run_ai_operation(
+                    ("summarize", content_hash), user_id, generate_summary, content_id, content_hash, db,
+                    background=True
+                )
+            
+            if settings.PRECOMPUTE_QUIZ and await quiz_bank.count(db, content_hash) < settings.QUIZ_SAMPLE_SIZE:
+                await run_ai_operation(
+                    ("quiz", content_hash), user_id, generate_quiz_questions, content_id, content_hash, db,
+                    background=True
+                )
+            
+            print(f"[DEBUG] Precompute finished for {content_id}")
+        except Exception as e:
+            print(f"[ERROR] Precompute failed for {content_id}: {str(e)}")
+    
+    task = asyncio.create_task(precompute())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def purge_derived_artifacts(content_hash: str, db: AsyncIOMotorDatabase):
+    """
+    Remove the stored summary and quiz bank for a file hash once no
+    remaining document references it.
+    
+    Args:
+        content_hash: SHA-256 of the deleted document's file
+        db: Database instance
+    """
+    if await get_content_collection(db).find_one({"content_hash": content_hash}):
+        return
+    
+    await summary_store.delete(db, content_hash)
+    await quiz_bank.delete_bank(db, content_hash)
+    answer_cache.invalidate(content_hash)
+
+
+def answer_error(question: str, e: Exception) -> dict:
+    """Describe a failed question of a batch in place of its answer."""
+    if isinstance(e, HTTPException):
+        return {"question": question, "error": e.detail, "status": e.status_code}
+    if isinstance(e, httpx.HTTPError):
+        return {"question": question, "error": f"AI service unavailable: {str(e)}", "status": 503}
+    return {"question": question, "error": f"Failed to get answer: {str(e)}", "status": 500}
+
+
+async def answer_batch(
+    content_id: str,
+    content_hash: str,
+    user_id: str,
+    db: AsyncIOMotorDatabase,
+    questions: List[str]
+) -> AsyncIterator[dict]:
+    """
+    Answer a list of questions about one document, in order.
+    Cached and repeated questions are answered once; the document is activated
+    once and the remaining questions go to the AI service ASK_BATCH_CONCURRENCY
+    at a time (each in the user's fair-share turn). A failed question yields an
+    error entry instead of failing the batch.
+    
+    Args:
+        content_id: MongoDB document ID
+        content_hash: SHA-256 of the document's file (answer cache key)
+        user_id: User the AI calls are queued for
+        db: Database instance
+        questions: Questions in the order they were asked
+        
+    Yields:
+        dict: Answer (or error entry) for each question, in input order
+    """
+    semaphore = asyncio.Semaphore(max(1, min(settings.ASK_BATCH_CONCURRENCY, settings.AI_MAX_QUEUE_PER_USER)))
+    activation: Optional[asyncio.Task] = None
+    
+    async def ask_one(question: str) -> dict:
+        nonlocal activation
+        
+        cached_answer = answer_cache.get(content_hash, question)
+        if cached_answer is not None:
+            return cached_answer
+        
+        try:
+            # Upload the document once for the whole batch
+            if activation is None:
+                activation = asyncio.ensure_future(ai_queue.run(
+                    user_id, run_with_deadline, "ask", activate_document_on_ai_server, content_id, db
+                ))
+            await asyncio.shield(activation)
+            
+            async with semaphore:
+                answer = await ai_queue.run(user_id, run_with_deadline, "ask", answer_question, content_id, db, question)
+            
+            answer_cache.put(content_hash, question, answer)
+            return answer
+        except Exception as e:
+            print(f"[ERROR] Batch question failed: {str(e)}")
+            return answer_error(question, e)
+    
+    # Identical questions (after normalization) share one answer
+    tasks = {}
+    ordered = []
+    for question in questions:
+        key = normalize_question(question)
+        if key not in tasks:
+            tasks[key] = asyncio.ensure_future(ask_one(question))
+        ordered.append((question, tasks[key]))
+    
+    try:
+        for question, task in ordered:
+            answer = dict(await task)
+            if "question" in answer:
+                answer["question"] = question
+            yield answer
+    finally:
+        # Client gone or batch abandoned: stop the remaining AI calls
+        for task in tasks.values():
+            task.cancel()
+        if activation is not None:
+            activation.cancel()
+
+
+async def stream_from_ai(
+    content_id: str,
+    db: AsyncIOMotorDatabase,
+    path: str,
+    operation: str,
+    payload: dict
+) -> AsyncIterator[str]:
+    """
+    Stream generated text from the AI service for a document.
+    Re-uploads once if the session expired before any text was produced.
+    
+    Args:
+        content_id: MongoDB document ID
+        db: Database instance
+        path: AI service path (/summarize or /ask)
+        operation: Operation name used to pick the timeout
+        payload: JSON body (session_id is added)
+        
+    Yields:
+        str: Raw text chunks as they arrive
+    """
+    for attempt in range(2):
+        session_id = await activate_document_on_ai_server(content_id, db, force_refresh=attempt > 0)
+        
+        try:
+            async with ai_client.stream(
+                "POST",
+                path,
+                operation=operation,
+                session_id=session_id,
+                json={**payload, "session_id": session_id, "stream": True},
+                headers={"Accept": "text/event-stream"}
+            ) as resp:
+                if resp.status_code != 200:
+                    await resp.aread()
+                    raise_for_ai_status(resp)
+                
+                async for text in iter_ai_text(resp):
+                    yield text
+                return
+        except AISessionExpiredError:
+            if attempt > 0:
+                raise
+            print(f"[DEBUG] AI session {session_id} expired, re-uploading document...")
+            await invalidate_ai_session(session_id, db)
+
+
+def encoded_json_response(body: bytes, encoding: Optional[str]) -> Response:
+    """
+    Build a response from an already rendered (and possibly compressed) JSON body.
+    The compression middleware leaves it alone since Content-Encoding is set.
+    
+    Args:
+        body: JSON body
+        encoding: Content-Encoding of the body, or None if uncompressed
+        
+    Returns:
+        Response: application/json response
+    """
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def sse_event(data: dict, event: Optional[str] = None) -> str:
+    """
+    Format a Server-Sent Event.
+    
+    Args:
+        data: JSON payload
+        event: Optional event name (default event type if omitted)
+        
+    Returns:
+        str: Encoded SSE frame
+    """
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {json.dumps(data)}\n\n"
+
+
+def sse_error(e: Exception) -> str:
+    """Format an upstream failure as an SSE 'error' event."""
+    if isinstance(e, HTTPException):
+        return sse_event({"detail": e.detail, "status": e.status_code}, event="error")
+    if isinstance(e, httpx.HTTPError):
+        return sse_event({"detail": f"AI service unavailable: {str(e)}", "status": 503}, event="error")
+    return sse_event({"detail": str(e), "status": 500}, event="error")
+
+
+# Headers that stop proxies from buffering the event stream
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+# OpenAPI description of the multipart body that upload_file parses itself
+UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                    "required": ["file"]
+                }
+            }
+        }
+    }
+}
+
+
+@router.post("/upload", openapi_extra=UPLOAD_REQUEST_BODY)
 @limiter.limit(get_rate_limit("upload"))
 async def upload_file(
     request: Request,
     response: Response,
-    file: UploadFile = File(...),
     current_user: dict = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """
-    Upload a study material file (PDF, DOCX, PPTX).
+    Upload a study material file (PDF, DOCX, PPTX) in the 'file' form field.
+    The body is streamed to storage in one pass: oversized uploads are rejected
+    from Content-Length or as soon as they pass MAX_UPLOAD_SIZE, the magic bytes
+    must match the declared type, and the SHA-256 is computed while writing.
+    Metadata is inserted only once the file is stored.
     Thread-safe with proper locking for concurrent uploads.
     
     Args:
-        file: Uploaded file
         current_user: Current authenticated user
         db: Database instance
         
     Returns:
         dict: Created content metadata
     """
-    # Validate file type
-    allowed_types = ["application/pdf", "application/vnd.openxmlformats-officedocument.wordprocessingml.document", 
-                     "application/vnd.openxmlformats-officedocument.presentationml.presentation"]
+    # Reject oversized uploads before reading the body
+    reject_oversized_request(request, settings.MAX_UPLOAD_SIZE)
     
-    if file.content_type not in allowed_types:
+    upload = MultipartFileStream(request)
+    if not await upload.start():
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid file type. Only PDF, DOCX, and PPTX files are allowed."
+            detail="No file uploaded"
         )
     
-    # Validate file size (max 50MB)
-    if file.size and file.size > 50 * 1024 * 1024:
+    # Validate file type
+    if upload.content_type not in ALLOWED_UPLOAD_TYPES:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="File size exceeds 50MB limit"
+            detail="Invalid file type. Only PDF, DOCX, and PPTX files are allowed."
+        )
+    
+    # Save physical file using thread-safe file manager (identical files share one blob)
+    content_oid = ObjectId()
+    content_id = str(content_oid)
+    try:
+        blob_key, file_size, content_hash = await file_manager.save_upload_stream(
+            checked_upload_chunks(upload, upload.content_type, settings.MAX_UPLOAD_SIZE),
+            content_id,
+            db
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to save file: {str(e)}"
         )
     
+    return await register_upload(
+        content_oid, upload.filename, upload.content_type, file_size, content_hash, current_user, db
+    )
+
+
+async def register_upload(
+    content_oid: ObjectId,
+    filename: str,
+    content_type: str,
+    file_size: int,
+    content_hash: str,
+    current_user: dict,
+    db: AsyncIOMotorDatabase
+) -> dict:
+    """
+    Insert the metadata of a stored upload and start its background precompute
+    (shared by direct and resumable uploads).
+    
+    Args:
+        content_oid: Content ID the file's blob reference was stored under
+        filename: Original filename
+        content_type: MIME type
+        file_size: File size in bytes
+        content_hash: SHA-256 of the file
+        current_user: Uploading user
+        db: Database instance
+        
+    Returns:
+        dict: Created content metadata
+    """
+    content_id = str(content_oid)
+    
     # Create content metadata
     content_metadata = {
+        "_id": content_oid,
         "user_id": str(current_user["_id"]),
-        "filename": file.filename,
-        "content_type": file.content_type
+        "filename": filename,
+        "content_type": content_type,
+        "file_size": file_size,
+        "content_hash": content_hash
     }
     
     # Insert metadata into database (atomic operation)
     content_collection = get_content_collection(db)
-    result = await content_collection.insert_one(content_metadata)
-    content_id = str(result.inserted_id)
-    
-    # Save physical file using thread-safe file manager
     try:
-        file_path, file_size = await file_manager.save_upload_file_sync(file, content_id)
-        
-        # Update metadata with file size
-        await content_collection.update_one(
-            {"_id": result.inserted_id},
-            {"$set": {"file_size": file_size}}
-        )
-        
-    except FileExistsError:
-        # This should never happen with ObjectId-based naming, but handle it
-        await content_collection.delete_one({"_id": result.inserted_id})
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="File ID collision detected. Please try again."
-        )
+        await content_collection.insert_one(content_metadata)
     except Exception as e:
-        # Rollback: delete metadata if file save fails
-        await content_collection.delete_one({"_id": result.inserted_id})
+        # Rollback: drop the file's blob reference if metadata can't be stored
+        await file_manager.delete_file(content_id, db, content_hash)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to save file: {str(e)}"
+            detail=f"Failed to save file metadata: {str(e)}"
         )
     
+    # The content listing changed
+    await bump_data_version(db, current_user["_id"])
+    
+    # Summarize in the background unless the user opted out
+    user_id = str(current_user["_id"])
+    preferences = UserPreferences(**current_user.get("preferences", {}))
+    precompute = settings.PRECOMPUTE_ON_UPLOAD and preferences.precompute_on_upload
+    if precompute:
+        schedule_precompute(content_id, user_id, db)
+    
     # Return created content
     content_metadata["_id"] = content_id
-    content_metadata["file_size"] = file_size
-    content_metadata["created_at"] = result.inserted_id.generation_time.isoformat()
+    del content_metadata["content_hash"]
+    content_metadata["created_at"] = content_oid.generation_time.isoformat()
+    content_metadata["precompute"] = precompute
     
     return content_metadata
 
 
 @router.get("/")
 async def get_all_content(
+    request: Request,
+    response: Response,
     current_user: dict = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """
     Get all content uploaded by the current user.
+    Answers If-None-Match with 304 from the user's data version (no content query).
     
     Args:
         current_user: Current authenticated user
@@ -317,10 +963,16 @@ async def get_all_content(
     Returns:
         dict: List of content items
     """
+    etag = user_etag(current_user, "content")
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    
     content_collection = get_content_collection(db)
     
-    # Fetch all content for current user
-    cursor = content_collection.find({"user_id": str(current_user["_id"])})
+    # Fetch all content for current user (AI session bookkeeping is internal and
+    # changes without a data version bump, so it stays out of the listing)
+    cursor = content_collection.find({"user_id": str(current_user["_id"])}, INTERNAL_CONTENT_FIELDS)
     content_list = await cursor.to_list(length=None)
     
     # Convert ObjectId to string
@@ -339,21 +991,26 @@ async def summarize_content(
     request: Request,
     response: Response,
     content_id: str,
+    regenerate: bool = False,
+    async_mode: bool = Query(False, alias="async"),
     current_user: dict = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """
     Generate a summary of the document using AI.
+    Summaries are stored by file SHA-256, so repeat requests (and identical
+    files uploaded by other users) are served from storage without the AI service.
     Rate-limited and queued to ensure fair resource allocation across users.
-    Requests are processed sequentially to prevent loss.
     
     Args:
         content_id: Content ID
+        regenerate: Ignore the stored summary and ask the AI service again
+        async_mode: (?async=1) Return 202 with a job ID instead of waiting for the AI service
         current_user: Current authenticated user
         db: Database instance
         
     Returns:
-        dict: Summary response
+        dict: Summary response (or 202 job record in async mode)
     """
     # Verify content belongs to user (CRITICAL for multi-user safety)
     content_collection = get_content_collection(db)
@@ -368,47 +1025,39 @@ async def summarize_content(
             detail="Content not found or access denied"
         )
     
-    # Activate document on AI server and get session_id
-    session_id = await activate_document_on_ai_server(content_id, db)
+    # Serve a stored summary for identical file contents unless regeneration is requested
+    # (as its pre-rendered, pre-compressed body: no serialization or compression per hit)
+    content_hash = await get_content_hash(content, db)
+    if not regenerate:
+        encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+        stored_body = await summary_store.get_encoded(db, content_hash, encoding)
+        if stored_body:
+            print(f"[DEBUG] Serving stored summary for {content_hash[:12]}")
+            return encoded_json_response(*stored_body)
     
-    print(f"[DEBUG] Requesting summary with session_id: {session_id}")
+    # One AI call per file at a time, scheduled fairly against other users' calls
+    user_id = str(current_user["_id"])
+    key = ("summarize", content_hash)
+    
+    # Job mode: answer right away and generate the summary in the background
+    if async_mode:
+        job = await job_manager.submit(
+            db,
+            user_id,
+            "summarize",
+            lambda: run_ai_operation(key, user_id, generate_summary, content_id, content_hash, db),
+            content_id=content_id,
+            queue_key=key
+        )
+        return job_accepted_response(job)
     
-    # Call AI service for summary - no timeout for large documents, with retry on SSL errors
+    # Call AI service for summary (shared with concurrent requests for the same file).
+    # If the client disconnects the generation keeps running so the summary is stored.
     try:
-        async def summary_request():
-            async with create_http_client() as client:
-                headers = {
-                    "ngrok-skip-browser-warning": "true",
-                    "User-Agent": "PrepGen-Backend/1.0"
-                }
-                
-                resp = await client.post(
-                    f"{AI_SERVICE_URL}/summarize",
-                    json={"session_id": session_id},
-                    headers=headers
-                )
-                
-                print(f"[DEBUG] Summary response status: {resp.status_code}")
-                print(f"[DEBUG] Summary response body: {resp.text[:500]}")
-                
-                # Check for ngrok errors (BEFORE raise_for_status!)
-                if resp.status_code != 200:
-                    if "ngrok" in resp.text.lower() or "<!DOCTYPE html>" in resp.text:
-                        raise HTTPException(
-                            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                            detail="AI service is currently offline (ngrok tunnel not responding)"
-                        )
-                    resp.raise_for_status()  # Raise for other non-200 errors
-                
-                return resp
-        
-        response = await retry_request(summary_request)
-        summary_data = response.json()
-        
-        # Enhance markdown formatting before returning to frontend
-        enhanced_summary = enhance_summary_response(summary_data)
-        
-        return enhanced_summary
+        return await cancel_on_disconnect(
+            request,
+            run_ai_operation(key, user_id, generate_summary, content_id, content_hash, db)
+        )
     except httpx.HTTPError as e:
         print(f"[ERROR] HTTP error during summary: {str(e)}")
         print(f"[ERROR] Response: {e.response.text if hasattr(e, 'response') else 'No response'}")
@@ -416,6 +1065,8 @@ async def summarize_content(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=f"AI service unavailable: {str(e)}"
         )
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"[ERROR] Unexpected error during summary: {str(e)}")
         raise HTTPException(
@@ -424,27 +1075,117 @@ async def summarize_content(
         )
 
 
+@router.post("/{content_id}/summarize/stream")
+@limiter.limit(get_rate_limit("summarize"))
+async def stream_summary(
+    request: Request,
+    response: Response,
+    content_id: str,
+    regenerate: bool = False,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Stream a document summary as Server-Sent Events while the AI service generates it.
+    Emits 'queued' events with the queue position while waiting for a turn,
+    {"text": ...} chunks (markdown cleaned incrementally), then a 'done'
+    event with the full formatted summary, or an 'error' event.
+    
+    Args:
+        content_id: Content ID
+        regenerate: Ignore the stored summary and ask the AI service again
+        current_user: Current authenticated user
+        db: Database instance
+        
+    Returns:
+        StreamingResponse: text/event-stream of summary chunks
+    """
+    # Verify content belongs to user (CRITICAL for multi-user safety)
+    content_collection = get_content_collection(db)
+    content = await content_collection.find_one({
+        "_id": ObjectId(content_id),
+        "user_id": str(current_user["_id"])
+    })
+    
+    if not content:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Content not found or access denied"
+        )
+    
+    user_id = str(current_user["_id"])
+    content_hash = await get_content_hash(content, db)
+    stored_summary = None if regenerate else await summary_store.get(db, content_hash)
+    
+    async def event_stream():
+        # Stored summaries go out in a single chunk
+        if stored_summary:
+            yield sse_event({"text": stored_summary.get("summary", "")})
+            yield sse_event(stored_summary, event="done")
+            return
+        
+        cleaner = IncrementalMarkdownCleaner()
+        raw_chunks = []
+        ticket = None
+        
+        try:
+            # Report the queue position until the scheduler gives us a turn
+            ticket = ai_queue.submit(user_id)
+            async for position in ai_queue.wait(ticket):
+                yield sse_event({"position": position}, event="queued")
+            
+            chunks = stream_from_ai(content_id, db, "/summarize", "summarize", {})
+            async for chunk in stream_with_deadline("summarize", chunks):
+                raw_chunks.append(chunk)
+                text = cleaner.feed(chunk)
+                if text:
+                    yield sse_event({"text": text})
+            
+            text = cleaner.flush()
+            if text:
+                yield sse_event({"text": text})
+            
+            # Persist the same formatted output the non-streaming endpoint stores
+            enhanced_summary = enhance_summary_response({"summary": "".join(raw_chunks)})
+            await summary_store.put(db, content_hash, enhanced_summary)
+            
+            yield sse_event(enhanced_summary, event="done")
+        except Exception as e:
+            print(f"[ERROR] Summary stream failed: {str(e)}")
+            yield sse_error(e)
+        finally:
+            if ticket:
+                ai_queue.release(ticket)
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
 @router.post("/{content_id}/quiz")
 @limiter.limit(get_rate_limit("quiz"))
 async def generate_quiz(
     request: Request,
     response: Response,
     content_id: str,
+    fresh: bool = False,
+    async_mode: bool = Query(False, alias="async"),
     current_user: dict = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """
     Generate quiz questions from the document using AI.
+    Generated questions are kept in a per-document bank; later requests draw a
+    random sample from it and the AI service is only called when the bank runs low.
     Rate-limited and queued to ensure fair resource allocation across users.
-    Requests are processed sequentially to prevent loss.
     
     Args:
         content_id: Content ID
+        fresh: Skip the bank and generate new questions with the AI service
+        async_mode: (?async=1) Return 202 with a job ID instead of waiting for the AI service
         current_user: Current authenticated user
         db: Database instance
         
     Returns:
-        dict: Quiz questions
+        dict: Quiz questions (or 202 job record in async mode)
     """
     # Verify content belongs to user (CRITICAL for multi-user safety)
     content_collection = get_content_collection(db)
@@ -459,74 +1200,40 @@ async def generate_quiz(
             detail="Content not found or access denied"
         )
     
-    # Activate document on AI server and get session_id
-    session_id = await activate_document_on_ai_server(content_id, db)
+    # Serve a random sample from the document's question bank when it has enough questions
+    user_id = str(current_user["_id"])
+    bank_key = await get_content_hash(content, db)
+    if not fresh:
+        bank_size = await quiz_bank.count(db, bank_key)
+        if bank_size >= settings.QUIZ_SAMPLE_SIZE:
+            if bank_size < settings.QUIZ_BANK_MIN_SIZE:
+                schedule_quiz_bank_refill(content_id, bank_key, user_id, db)
+            
+            print(f"[DEBUG] Serving quiz from bank {bank_key[:12]} ({bank_size} questions)")
+            return {"questions": await quiz_bank.sample(db, bank_key, settings.QUIZ_SAMPLE_SIZE)}
     
-    print(f"[DEBUG] Requesting quiz with session_id: {session_id}")
+    # One AI call per bank at a time, scheduled fairly against other users' calls
+    key = ("quiz", bank_key)
+    
+    # Job mode: answer right away and generate the questions in the background
+    if async_mode:
+        job = await job_manager.submit(
+            db,
+            user_id,
+            "quiz",
+            lambda: run_ai_operation(key, user_id, generate_quiz_questions, content_id, bank_key, db),
+            content_id=content_id,
+            queue_key=key
+        )
+        return job_accepted_response(job)
     
-    # Call AI service for quiz - no timeout (quiz generation can take several minutes), with retry on SSL errors
+    # Call AI service for quiz (generation can take several minutes, shared with concurrent requests).
+    # If the client disconnects the generation keeps running so the questions reach the bank.
     try:
-        async def quiz_request():
-            async with create_http_client() as client:
-                # Add ngrok headers to skip browser warning page
-                headers = {
-                    "ngrok-skip-browser-warning": "true",
-                    "User-Agent": "PrepGen-Backend/1.0"
-                }
-                
-                resp = await client.post(
-                    f"{AI_SERVICE_URL}/quiz",
-                    json={"session_id": session_id},
-                    headers=headers
-                )
-                
-                # Log the response for debugging
-                print(f"[DEBUG] Quiz response status: {resp.status_code}")
-                print(f"[DEBUG] Quiz response body: {resp.text[:500]}")  # First 500 chars
-                
-                # Check for ngrok errors (BEFORE raise_for_status!)
-                if resp.status_code != 200:
-                    if "ngrok" in resp.text.lower() or "<!DOCTYPE html>" in resp.text:
-                        raise HTTPException(
-                            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                            detail="AI service is currently offline (ngrok tunnel not responding)"
-                        )
-                    resp.raise_for_status()  # Raise for other non-200 errors
-                
-                return resp
-        
-        response = await retry_request(quiz_request)
-        ai_response = response.json()
-        
-        # Transform response format from Kalash's API to frontend format
-        if "quiz" in ai_response:
-            quiz_questions = ai_response["quiz"]
-            transformed_questions = []
-            
-            for q in quiz_questions:
-                # Find the index of the correct answer
-                correct_answer_index = 0
-                if "correct_answer" in q and "options" in q:
-                    try:
-                        correct_answer_index = q["options"].index(q["correct_answer"])
-                    except ValueError:
-                        # If exact match not found, try case-insensitive match
-                        correct_answer_lower = q["correct_answer"].lower().strip()
-                        for i, opt in enumerate(q["options"]):
-                            if opt.lower().strip() == correct_answer_lower:
-                                correct_answer_index = i
-                                break
-                
-                transformed_questions.append({
-                    "question": q.get("question", ""),
-                    "options": q.get("options", []),
-                    "correct_answer": correct_answer_index,
-                    "explanation": q.get("explanation", "")
-                })
-            
-            return {"questions": transformed_questions}
-        else:
-            return ai_response
+        return await cancel_on_disconnect(
+            request,
+            run_ai_operation(key, user_id, generate_quiz_questions, content_id, bank_key, db)
+        )
     except httpx.HTTPError as e:
         print(f"[ERROR] HTTP error during quiz generation: {str(e)}")
         print(f"[ERROR] Error type: {type(e).__name__}")
@@ -539,6 +1246,8 @@ async def generate_quiz(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=f"AI service unavailable: {str(e)}"
         )
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"[ERROR] Unexpected error during quiz generation: {str(e)}")
         raise HTTPException(
@@ -559,6 +1268,7 @@ async def ask_question(
 ):
     """
     Ask a question about the document using AI.
+    Repeated or rephrased questions are answered from the per-document answer cache.
     Rate-limited and queued to ensure fair resource allocation across users.
     
     Args:
@@ -583,45 +1293,40 @@ async def ask_question(
             detail="Content not found or access denied"
         )
     
-    # Activate document on AI server and get session_id
-    session_id = await activate_document_on_ai_server(content_id, db)
+    # Answer repeated or rephrased questions from the cache
+    content_hash = await get_content_hash(content, db)
+    cached_answer = answer_cache.get(content_hash, request_body.question)
+    if cached_answer is not None:
+        if "question" in cached_answer:
+            cached_answer["question"] = request_body.question
+        return cached_answer
     
-    # Call AI service for question answering - no timeout for large documents, with retry on SSL errors
+    # Call AI service for question answering over the shared pool, with retry on SSL errors
     try:
-        async def ask_request():
-            async with create_http_client() as client:
-                headers = {
-                    "ngrok-skip-browser-warning": "true",
-                    "User-Agent": "PrepGen-Backend/1.0"
-                }
-                
-                resp = await client.post(
-                    f"{AI_SERVICE_URL}/ask",
-                    json={
-                        "session_id": session_id,
-                        "question": request_body.question
-                    },
-                    headers=headers
-                )
-                
-                # Check for ngrok errors (BEFORE raise_for_status!)
-                if resp.status_code != 200:
-                    if "ngrok" in resp.text.lower() or "<!DOCTYPE html>" in resp.text:
-                        raise HTTPException(
-                            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                            detail="AI service is currently offline (ngrok tunnel not responding)"
-                        )
-                    resp.raise_for_status()  # Raise for other non-200 errors
-                
-                return resp
+        # Cancelled (queue place, upload and AI call) if the client disconnects
+        answer = await cancel_on_disconnect(
+            request,
+            ai_queue.run(
+                str(current_user["_id"]),
+                run_with_deadline,
+                "ask",
+                answer_question,
+                content_id,
+                db,
+                request_body.question
+            )
+        )
         
-        response = await retry_request(ask_request)
-        return response.json()
+        answer_cache.put(content_hash, request_body.question, answer)
+        
+        return answer
     except httpx.HTTPError as e:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=f"AI service unavailable: {str(e)}"
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -629,6 +1334,158 @@ async def ask_question(
         )
 
 
+@router.post("/{content_id}/ask/stream")
+@limiter.limit(get_rate_limit("ask"))
+async def stream_answer(
+    request: Request,
+    response: Response,
+    content_id: str,
+    request_body: AskRequest,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Stream the answer to a question as Server-Sent Events.
+    Emits 'queued' events with the queue position while waiting for a turn,
+    {"text": ...} chunks as the AI service generates them, then a 'done'
+    event with the full answer, or an 'error' event.
+    
+    Args:
+        content_id: Content ID
+        request_body: Question request
+        current_user: Current authenticated user
+        db: Database instance
+        
+    Returns:
+        StreamingResponse: text/event-stream of answer chunks
+    """
+    # Verify content belongs to user (CRITICAL for multi-user safety)
+    content_collection = get_content_collection(db)
+    content = await content_collection.find_one({
+        "_id": ObjectId(content_id),
+        "user_id": str(current_user["_id"])
+    })
+    
+    if not content:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Content not found or access denied"
+        )
+    
+    user_id = str(current_user["_id"])
+    content_hash = await get_content_hash(content, db)
+    question = request_body.question
+    cached_answer = answer_cache.get(content_hash, question)
+    
+    async def event_stream():
+        # Cached answers go out in a single chunk
+        if cached_answer is not None:
+            answer = cached_answer.get("answer", "")
+            yield sse_event({"text": answer})
+            yield sse_event({"question": question, "answer": answer}, event="done")
+            return
+        
+        cleaner = IncrementalMarkdownCleaner()
+        raw_chunks = []
+        ticket = None
+        
+        try:
+            # Report the queue position until the scheduler gives us a turn
+            ticket = ai_queue.submit(user_id)
+            async for position in ai_queue.wait(ticket):
+                yield sse_event({"position": position}, event="queued")
+            
+            chunks = stream_from_ai(content_id, db, "/ask", "ask", {"question": question})
+            async for chunk in stream_with_deadline("ask", chunks):
+                raw_chunks.append(chunk)
+                text = cleaner.feed(chunk)
+                if text:
+                    yield sse_event({"text": text})
+            
+            text = cleaner.flush()
+            if text:
+                yield sse_event({"text": text})
+            
+            answer = {"question": question, "answer": "".join(raw_chunks)}
+            answer_cache.put(content_hash, question, answer)
+            
+            yield sse_event(answer, event="done")
+        except Exception as e:
+            print(f"[ERROR] Answer stream failed: {str(e)}")
+            yield sse_error(e)
+        finally:
+            if ticket:
+                ai_queue.release(ticket)
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@router.post("/{content_id}/ask/batch")
+@limiter.limit(get_rate_limit("ask_batch"))
+async def ask_questions_batch(
+    request: Request,
+    response: Response,
+    content_id: str,
+    request_body: AskBatchRequest,
+    stream: bool = False,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Ask several questions about the document in one round trip.
+    The document is checked and activated once; questions are answered with
+    bounded concurrency and returned in the order they were asked.
+    
+    Args:
+        content_id: Content ID
+        request_body: List of questions
+        stream: Return Server-Sent Events ('answer' per question in order, then 'done')
+        current_user: Current authenticated user
+        db: Database instance
+        
+    Returns:
+        dict: {"answers": [...]} (or a text/event-stream when stream=true)
+    """
+    questions = request_body.questions
+    if len(questions) > settings.ASK_BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many questions (max {settings.ASK_BATCH_MAX_QUESTIONS} per batch)"
+        )
+    
+    # Verify content belongs to user (CRITICAL for multi-user safety)
+    content_collection = get_content_collection(db)
+    content = await content_collection.find_one({
+        "_id": ObjectId(content_id),
+        "user_id": str(current_user["_id"])
+    })
+    
+    if not content:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Content not found or access denied"
+        )
+    
+    user_id = str(current_user["_id"])
+    content_hash = await get_content_hash(content, db)
+    
+    if stream:
+        async def event_stream():
+            index = 0
+            async for answer in answer_batch(content_id, content_hash, user_id, db, questions):
+                yield sse_event({"index": index, **answer}, event="answer")
+                index += 1
+            yield sse_event({"count": index}, event="done")
+        
+        return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+    
+    async def collect_answers():
+        return [answer async for answer in answer_batch(content_id, content_hash, user_id, db, questions)]
+    
+    # Cancelled (remaining questions included) if the client disconnects
+    return {"answers": await cancel_on_disconnect(request, collect_answers())}
+
+
 @router.delete("/{content_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_content(
     content_id: str,
@@ -669,11 +1526,18 @@ async def delete_content(
             detail="Failed to delete content"
         )
     
+    # The content listing changed
+    await bump_data_version(db, current_user["_id"])
+    
     # Delete physical file using thread-safe file manager
     try:
-        await file_manager.delete_file(content_id)
+        await file_manager.delete_file(content_id, db, content.get("content_hash"))
     except Exception as e:
         # Log error but don't fail the request since metadata is already deleted
         print(f"Warning: Failed to delete file {content_id}: {str(e)}")
     
+    # Drop the stored summary and quiz bank if no other document shares this file
+    if content.get("content_hash"):
+        await purge_derived_artifacts(content["content_hash"], db)
+    
     return None
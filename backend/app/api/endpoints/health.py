@@ -1,14 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Query, status
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from pydantic import BaseModel, HttpUrl
 import httpx
 
-from app.core.config import settings
+from app.core.security import get_current_user
+from app.db.database import get_db
 from app.schemas.user_schema import SummaryResponse
+from app.utils.ai_client import get_ai_client, raise_for_ai_status
+from app.utils.answer_cache import get_answer_cache
+from app.utils.request_queue import get_queue_manager
+from app.utils.deadlines import cancel_on_disconnect
+from app.utils.job_manager import get_job_manager, job_accepted_response
+from app.utils.ai_operations import run_ai_operation
+from app.utils.youtube import extract_video_id, canonical_video_url, get_youtube_store
+from app.middleware.rate_limiter import limiter, get_rate_limit
 
 router = APIRouter()
 
-# AI Service URL
-AI_SERVICE_URL = settings.AI_SERVICE_URL
+# Shared AI gateway (pooled connections, opened in the app lifespan)
+ai_client = get_ai_client()
+
+# Fair scheduler shared with the content endpoints
+ai_queue = get_queue_manager()
+
+# Background jobs (?async=1), shared with the content endpoints
+job_manager = get_job_manager()
+
+# Video summaries keyed by canonical video ID
+youtube_store = get_youtube_store()
 
 
 class AIStatusResponse(BaseModel):
@@ -39,84 +58,155 @@ class YouTubeRequest(BaseModel):
 async def check_ai_service_status():
     """
     Check if Kalash's AI service is online and accessible.
-    Makes a GET request to the /health endpoint.
+    Served from the state kept by the background health poller and the
+    circuit breakers; probes the AI service only if no check has run yet.
     
     Returns:
-        dict: AI service status (online or offline)
+        dict: AI service status (online if any backend is), plus per-backend
+        probe results, circuit state and in-flight requests
     """
-    try:
-        async with httpx.AsyncClient(timeout=5.0, follow_redirects=True) as client:
-            headers = {
-                "ngrok-skip-browser-warning": "true",
-                "User-Agent": "PrepGen-Backend/1.0"
-            }
-            
-            # Make a GET request to Kalash's /health endpoint
-            response = await client.get(
-                f"{AI_SERVICE_URL}/health",
-                headers=headers
-            )
-            
-            # Check if response is successful (200-299 range)
-            if response.status_code >= 200 and response.status_code < 300:
-                return {"ai_service_status": "online"}
-            
-            # Server errors (500+) mean service is having issues
-            if response.status_code >= 500:
-                return {"ai_service_status": "offline"}
-            
-            # 404 or other client errors still mean the tunnel is reachable
-            # but we'll consider it offline since the health endpoint should exist
-            return {"ai_service_status": "offline"}
-            
-    except httpx.TimeoutException:
-        return {"ai_service_status": "offline"}
-    except httpx.ConnectError:
-        return {"ai_service_status": "offline"}
-    except Exception as e:
-        return {"ai_service_status": "offline"}
+    if any(backend.breaker.last_probe is None for backend in ai_client.backends):
+        await ai_client.probe_health()
+    
+    backends = []
+    for backend in ai_client.backends:
+        probe = backend.breaker.last_probe
+        circuit = backend.breaker.snapshot()
+        backends.append({
+            "url": backend.base_url,
+            "status": "online" if probe["online"] and circuit["state"] != "open" else "offline",
+            "checked_at": probe["checked_at"].isoformat(),
+            "latency_ms": probe["latency_ms"],
+            "outstanding": backend.outstanding,
+            "circuit": circuit
+        })
+    
+    online = [backend for backend in backends if backend["status"] == "online"]
+    
+    return {
+        "ai_service_status": "online" if online else "offline",
+        "checked_at": min(backend["checked_at"] for backend in backends),
+        "latency_ms": min(backend["latency_ms"] for backend in online) if online else None,
+        "backends": backends
+    }
+
+
+@router.get("/health/caches")
+async def get_cache_stats():
+    """
+    Get hit/miss counters for the in-process caches.
+    
+    Returns:
+        dict: Cache statistics for this worker process
+    """
+    return {"answer_cache": get_answer_cache().stats()}
+
+
+@router.get("/health/queue")
+async def get_queue_stats():
+    """
+    Get the AI scheduler's load (running and waiting requests).
+    
+    Returns:
+        dict: Scheduler statistics for this worker process
+    """
+    return ai_queue.stats()
+
+
+async def generate_youtube_summary(video_id: str, db: AsyncIOMotorDatabase) -> dict:
+    """
+    Call the AI service to summarize a video and store the result.
+    
+    Args:
+        video_id: Canonical video ID
+        db: Database instance
+        
+    Returns:
+        dict: Video summary from the AI service
+    """
+    response = await ai_client.post(
+        "/summarize-youtube",
+        operation="youtube",
+        json={"url": canonical_video_url(video_id)}
+    )
+    
+    # Check for ngrok errors (BEFORE raise_for_status!)
+    raise_for_ai_status(response)
+    
+    summary = response.json()
+    await youtube_store.put(db, video_id, summary)
+    return summary
 
 
 @router.post("/youtube/summarize")
-async def summarize_youtube(request: YouTubeRequest):
+@limiter.limit(get_rate_limit("youtube"))
+async def summarize_youtube(
+    request: Request,
+    response: Response,
+    request_body: YouTubeRequest,
+    regenerate: bool = False,
+    async_mode: bool = Query(False, alias="async"),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
     """
     Summarize a YouTube video using the AI service.
+    Summaries are stored by canonical video ID (any URL form of the same video
+    hits the same entry) until YOUTUBE_SUMMARY_TTL_SECONDS expires, and
+    concurrent requests for one video share a single AI call.
     
     Args:
-        request: YouTube video URL
+        request_body: YouTube video URL
+        regenerate: Ignore the stored summary and ask the AI service again
+        async_mode: (?async=1) Return 202 with a job ID instead of waiting for the AI service
+        current_user: Current authenticated user
+        db: Database instance
         
     Returns:
-        dict: Video summary
+        dict: Video summary (or 202 job record in async mode)
     """
+    video_id = extract_video_id(request_body.url)
+    if not video_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Not a valid YouTube video URL"
+        )
+    
+    if not regenerate:
+        stored = await youtube_store.get(db, video_id)
+        if stored:
+            print(f"[DEBUG] Serving stored YouTube summary for {video_id}")
+            return stored
+    
+    # One AI call per video at a time, scheduled fairly against other users' calls
+    user_id = str(current_user["_id"])
+    key = ("youtube", video_id)
+    
+    # Job mode: answer right away and summarize the video in the background
+    if async_mode:
+        job = await job_manager.submit(
+            db,
+            user_id,
+            "youtube",
+            lambda: run_ai_operation(key, user_id, generate_youtube_summary, video_id, db),
+            content_id=video_id,
+            queue_key=key
+        )
+        return job_accepted_response(job)
+    
+    # If the client disconnects the summary keeps generating so it is stored
     try:
-        async with httpx.AsyncClient(timeout=None, follow_redirects=True) as client:
-            headers = {
-                "ngrok-skip-browser-warning": "true",
-                "User-Agent": "PrepGen-Backend/1.0"
-            }
-            
-            response = await client.post(
-                f"{AI_SERVICE_URL}/summarize-youtube",
-                json={"url": request.url},
-                headers=headers
-            )
-            
-            # Check for ngrok errors (BEFORE raise_for_status!)
-            if response.status_code != 200:
-                if "ngrok" in response.text.lower() or "<!DOCTYPE html>" in response.text:
-                    raise HTTPException(
-                        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                        detail="AI service is currently offline (ngrok tunnel not responding)"
-                    )
-                response.raise_for_status()  # Raise for other non-200 errors
-            
-            return response.json()
-            
+        return await cancel_on_disconnect(
+            request,
+            run_ai_operation(key, user_id, generate_youtube_summary, video_id, db)
+        )
     except httpx.HTTPError as e:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=f"AI service unavailable: {str(e)}"
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
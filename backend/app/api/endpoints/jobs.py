@@ -0,0 +1,111 @@
+import asyncio
+import json
+import time
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.core.security import get_current_user
+from app.db.database import get_db
+from app.utils.job_manager import get_job_manager, serialize_job, ACTIVE_STATES
+
+router = APIRouter()
+
+# Get job manager instance
+job_manager = get_job_manager()
+
+# Seconds between job state checks on the SSE stream
+EVENT_POLL_INTERVAL = 1.0
+
+# Longest an SSE stream follows a job (beyond the longest AI deadline plus queueing)
+EVENT_STREAM_TIMEOUT = 30 * 60
+
+
+@router.get("/{job_id}")
+async def get_job_status(
+    job_id: str,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Get the status of a background job, including its result once done.
+    
+    Args:
+        job_id: Job ID returned by an async (?async=1) request
+        current_user: Current authenticated user
+        db: Database instance
+        
+    Returns:
+        dict: Job status, result or error
+    """
+    job = await job_manager.get_job(db, job_id, str(current_user["_id"]))
+    
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found or access denied"
+        )
+    
+    return serialize_job(job)
+
+
+@router.get("/{job_id}/events")
+async def stream_job_events(
+    request: Request,
+    job_id: str,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Server-Sent Events stream of a job's status changes.
+    Emits a 'status' event on every state (or queue position) change and closes
+    once the job is done or failed. A job still active after EVENT_STREAM_TIMEOUT
+    gets a final 'timeout' event (the client can keep polling GET /jobs/{id}).
+    
+    Args:
+        job_id: Job ID
+        current_user: Current authenticated user
+        db: Database instance
+        
+    Returns:
+        StreamingResponse: text/event-stream of job updates
+    """
+    user_id = str(current_user["_id"])
+    job = await job_manager.get_job(db, job_id, user_id)
+    
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found or access denied"
+        )
+    
+    async def event_stream():
+        last_state = None
+        current = job
+        deadline = time.monotonic() + EVENT_STREAM_TIMEOUT
+        
+        while True:
+            data = serialize_job(current)
+            state = (data["status"], data.get("queue_position"))
+            if state != last_state:
+                last_state = state
+                yield f"event: status\ndata: {json.dumps(data)}\n\n"
+            
+            if current["status"] not in ACTIVE_STATES or await request.is_disconnected():
+                break
+            
+            if time.monotonic() >= deadline:
+                yield f"event: timeout\ndata: {json.dumps(data)}\n\n"
+                break
+            
+            await asyncio.sleep(EVENT_POLL_INTERVAL)
+            current = await job_manager.get_job(db, job_id, user_id)
+            if not current:
+                break
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
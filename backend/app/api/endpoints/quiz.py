@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from typing import List
 from datetime import datetime
@@ -7,6 +7,7 @@ from bson import ObjectId
 from app.core.security import get_current_user
 from app.db.database import get_db, get_quiz_results_collection
 from app.schemas.quiz_schema import QuizResultCreate, QuizResult
+from app.utils.etags import bump_data_version, user_etag, etag_matches, not_modified, set_etag
 
 router = APIRouter()
 
@@ -40,6 +41,7 @@ async def save_quiz_result(
     # Insert into database
     quiz_results_collection = get_quiz_results_collection(db)
     result = await quiz_results_collection.insert_one(quiz_result)
+    await bump_data_version(db, current_user["_id"])
     
     # Fetch the created document
     created_quiz = await quiz_results_collection.find_one({"_id": result.inserted_id})
@@ -59,11 +61,14 @@ async def save_quiz_result(
 
 @router.get("/results")
 async def get_quiz_results(
+    request: Request,
+    response: Response,
     current_user: dict = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """
     Get all quiz results for the current user.
+    Answers If-None-Match with 304 from the user's data version (no results query).
     
     Args:
         current_user: Current authenticated user
@@ -72,6 +77,11 @@ async def get_quiz_results(
     Returns:
         dict: List of quiz results
     """
+    etag = user_etag(current_user, "quiz-results")
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    
     quiz_results_collection = get_quiz_results_collection(db)
     
     # Fetch all quiz results for current user, sorted by date (newest first)
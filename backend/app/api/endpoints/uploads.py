@@ -0,0 +1,354 @@
+from fastapi import APIRouter, HTTPException, Depends, status, Request, Response
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from starlette.requests import ClientDisconnect
+from bson import ObjectId
+from datetime import datetime, timedelta
+
+from app.core.security import get_current_user
+from app.db.database import get_db, get_uploads_collection
+from app.core.config import settings
+from app.schemas.content_schema import ResumableUploadCreate
+from app.middleware.rate_limiter import limiter, get_rate_limit
+from app.utils.upload_stream import ALLOWED_UPLOAD_TYPES, SNIFF_SIZE, check_file_signature, limit_chunks
+from app.api.endpoints.content import file_manager, register_upload
+
+router = APIRouter()
+
+# Content type of PATCH bodies (tus)
+OFFSET_CONTENT_TYPE = "application/offset+octet-stream"
+
+
+def serialize_upload(upload: dict, offset: int) -> dict:
+    """
+    Convert an upload record to its API representation.
+
+    Args:
+        upload: Upload record from MongoDB
+        offset: Bytes received so far
+
+    Returns:
+        dict: Upload status
+    """
+    upload_id = str(upload["_id"])
+    return {
+        "upload_id": upload_id,
+        "filename": upload["filename"],
+        "content_type": upload["content_type"],
+        "size": upload["size"],
+        "offset": offset,
+        "expires_at": upload["expires_at"].isoformat(),
+        "upload_url": f"/uploads/{upload_id}"
+    }
+
+
+def upload_headers(upload: dict, offset: int) -> dict:
+    """tus headers describing an upload's progress."""
+    return {
+        "Upload-Offset": str(offset),
+        "Upload-Length": str(upload["size"]),
+        "Cache-Control": "no-store"
+    }
+
+
+async def get_user_upload(upload_id: str, current_user: dict, db: AsyncIOMotorDatabase) -> dict:
+    """
+    Fetch an unexpired upload record owned by the current user.
+
+    Args:
+        upload_id: Resumable upload ID
+        current_user: Current authenticated user
+        db: Database instance
+
+    Returns:
+        dict: Upload record
+
+    Raises:
+        HTTPException: 404 if the upload doesn't exist, expired or belongs to someone else
+    """
+    upload = None
+    if ObjectId.is_valid(upload_id):
+        upload = await get_uploads_collection(db).find_one({
+            "_id": ObjectId(upload_id),
+            "user_id": str(current_user["_id"]),
+            "expires_at": {"$gt": datetime.utcnow()}
+        })
+
+    if not upload:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload not found or expired"
+        )
+
+    return upload
+
+
+async def get_upload_offset(upload_id: str) -> int:
+    """Bytes received so far (404 if the temporary file is gone)."""
+    offset = await file_manager.get_partial_size(upload_id)
+    if offset is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload not found or expired"
+        )
+    return offset
+
+
+async def release_failed_upload(upload: dict, db: AsyncIOMotorDatabase):
+    """
+    Hand back an upload whose finalize failed on our side: if its file is
+    still complete, restore the record (claimed by finalize) so the client
+    can retry finalize or abort; otherwise delete the file.
+    
+    Args:
+        upload: Upload record as it was claimed
+        db: Database instance
+    """
+    upload_id = str(upload["_id"])
+    try:
+        if await file_manager.get_partial_size(upload_id) == upload["size"]:
+            upload["expires_at"] = datetime.utcnow() + timedelta(seconds=settings.RESUMABLE_UPLOAD_TTL_SECONDS)
+            await get_uploads_collection(db).insert_one(upload)
+            return
+    except Exception as e:
+        print(f"[ERROR] Could not restore upload {upload_id}: {str(e)}")
+    
+    await file_manager.discard_partial(upload_id)
+
+
+@router.post("/", status_code=status.HTTP_201_CREATED)
+@limiter.limit(get_rate_limit("upload"))
+async def create_upload(
+    request: Request,
+    response: Response,
+    request_body: ResumableUploadCreate,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Start a resumable upload (tus-style: create, PATCH chunks at offsets, finalize).
+
+    Args:
+        request_body: Filename, MIME type, total size and optional SHA-256 of the file
+        current_user: Current authenticated user
+        db: Database instance
+
+    Returns:
+        dict: Upload status with its upload_url (also in the Location header)
+    """
+    if request_body.content_type not in ALLOWED_UPLOAD_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid file type. Only PDF, DOCX, and PPTX files are allowed."
+        )
+
+    if request_body.size > settings.MAX_UPLOAD_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File size exceeds {settings.MAX_UPLOAD_SIZE // (1024 * 1024)}MB limit"
+        )
+
+    # Temporary files of uploads whose records have expired
+    await file_manager.cleanup_partials(settings.RESUMABLE_UPLOAD_TTL_SECONDS)
+
+    now = datetime.utcnow()
+    upload = {
+        "_id": ObjectId(),
+        "user_id": str(current_user["_id"]),
+        "filename": request_body.filename,
+        "content_type": request_body.content_type,
+        "size": request_body.size,
+        "sha256": request_body.sha256,
+        "created_at": now,
+        "expires_at": now + timedelta(seconds=settings.RESUMABLE_UPLOAD_TTL_SECONDS)
+    }
+    upload_id = str(upload["_id"])
+
+    await file_manager.create_partial(upload_id)
+    await get_uploads_collection(db).insert_one(upload)
+
+    response.headers.update(upload_headers(upload, 0))
+    response.headers["Location"] = f"/uploads/{upload_id}"
+
+    return serialize_upload(upload, 0)
+
+
+@router.head("/{upload_id}")
+async def get_upload_offset_headers(
+    upload_id: str,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Get an upload's offset in the Upload-Offset header (where to resume).
+
+    Args:
+        upload_id: Resumable upload ID
+        current_user: Current authenticated user
+        db: Database instance
+
+    Returns:
+        Response: Empty 200 with Upload-Offset and Upload-Length
+    """
+    upload = await get_user_upload(upload_id, current_user, db)
+    offset = await get_upload_offset(upload_id)
+    return Response(status_code=status.HTTP_200_OK, headers=upload_headers(upload, offset))
+
+
+@router.get("/{upload_id}")
+async def get_upload_status(
+    upload_id: str,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Get an upload's status, including its offset (where to resume).
+
+    Args:
+        upload_id: Resumable upload ID
+        current_user: Current authenticated user
+        db: Database instance
+
+    Returns:
+        dict: Upload status
+    """
+    upload = await get_user_upload(upload_id, current_user, db)
+    offset = await get_upload_offset(upload_id)
+    return serialize_upload(upload, offset)
+
+
+@router.patch("/{upload_id}")
+async def append_upload_chunk(
+    request: Request,
+    upload_id: str,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Append a chunk (the raw request body) at the offset in the Upload-Offset header.
+    The chunk is written as it arrives; if the connection drops, the bytes
+    received so far are kept and the client resumes from the new offset.
+
+    Args:
+        upload_id: Resumable upload ID
+        current_user: Current authenticated user
+        db: Database instance
+
+    Returns:
+        Response: 204 with the new Upload-Offset (409 with the current one if the offset is wrong)
+    """
+    upload = await get_user_upload(upload_id, current_user, db)
+
+    if request.headers.get("content-type", "").split(";")[0].strip() != OFFSET_CONTENT_TYPE:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Chunks must be sent as {OFFSET_CONTENT_TYPE}"
+        )
+
+    offset_header = request.headers.get("upload-offset", "")
+    if not offset_header.isdigit():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Missing or invalid Upload-Offset header"
+        )
+    offset = int(offset_header)
+
+    # Reject a chunk that cannot fit before reading it
+    remaining = upload["size"] - offset
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > remaining:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="Chunk goes past the declared upload size"
+        )
+
+    try:
+        offset = await file_manager.append_partial(upload_id, offset, limit_chunks(request.stream(), remaining))
+    except ClientDisconnect:
+        # Keep what arrived; the client resumes from HEAD/GET
+        offset = await get_upload_offset(upload_id)
+        print(f"[DEBUG] Upload {upload_id} interrupted at offset {offset}")
+
+    # Active uploads don't expire
+    await get_uploads_collection(db).update_one(
+        {"_id": upload["_id"]},
+        {"$set": {"expires_at": datetime.utcnow() + timedelta(seconds=settings.RESUMABLE_UPLOAD_TTL_SECONDS)}}
+    )
+
+    return Response(status_code=status.HTTP_204_NO_CONTENT, headers=upload_headers(upload, offset))
+
+
+@router.post("/{upload_id}/finalize")
+async def finalize_upload(
+    upload_id: str,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Finish a fully received upload: check its type and SHA-256, move it into
+    storage and create the content document (same result as POST /content/upload).
+
+    Args:
+        upload_id: Resumable upload ID (becomes the content ID)
+        current_user: Current authenticated user
+        db: Database instance
+
+    Returns:
+        dict: Created content metadata
+    """
+    upload = await get_user_upload(upload_id, current_user, db)
+    offset = await get_upload_offset(upload_id)
+
+    if offset != upload["size"]:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Upload incomplete: {offset} of {upload['size']} bytes received",
+            headers={"Upload-Offset": str(offset)}
+        )
+
+    # Claim the upload so a repeated finalize can't store it twice
+    claimed = await get_uploads_collection(db).delete_one({"_id": upload["_id"]})
+    if claimed.deleted_count == 0:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload not found or expired"
+        )
+
+    try:
+        check_file_signature(await file_manager.read_partial_head(upload_id, SNIFF_SIZE), upload["content_type"])
+        blob_key, file_size, content_hash = await file_manager.finalize_partial(
+            upload_id, db, expected_hash=upload.get("sha256")
+        )
+    except HTTPException:
+        await file_manager.discard_partial(upload_id)
+        raise
+    except Exception as e:
+        print(f"[ERROR] Failed to finalize upload {upload_id}: {str(e)}")
+        await release_failed_upload(upload, db)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to save file: {str(e)}"
+        )
+
+    return await register_upload(
+        upload["_id"], upload["filename"], upload["content_type"], file_size, content_hash, current_user, db
+    )
+
+
+@router.delete("/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def abort_upload(
+    upload_id: str,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Abandon a resumable upload and delete what was received.
+
+    Args:
+        upload_id: Resumable upload ID
+        current_user: Current authenticated user
+        db: Database instance
+    """
+    upload = await get_user_upload(upload_id, current_user, db)
+    await get_uploads_collection(db).delete_one({"_id": upload["_id"]})
+    await file_manager.discard_partial(upload_id)
+    return None
@@ -1,19 +1,23 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
 from app.core.security import get_current_user
 from app.db.database import get_db, get_user_collection
-from app.schemas.user_schema import User
+from app.schemas.user_schema import User, UserPreferences
+from app.utils.etags import user_etag, etag_matches, not_modified, set_etag
 
 router = APIRouter()
 
 
 @router.get("/me", response_model=dict)
 async def get_current_user_info(
+    request: Request,
+    response: Response,
     current_user: dict = Depends(get_current_user)
 ):
     """
     Get current authenticated user information.
+    Answers If-None-Match with 304 from the user's data version.
     
     Args:
         current_user: Current authenticated user from JWT token
@@ -21,13 +25,45 @@ async def get_current_user_info(
     Returns:
         dict: User information with _id converted to string
     """
+    etag = user_etag(current_user, "me")
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    
     # Convert ObjectId to string for JSON serialization
     user_data = {
         "_id": str(current_user["_id"]),
         "email": current_user["email"],
         "full_name": current_user["full_name"],
         "picture": current_user.get("picture"),
-        "google_id": current_user.get("google_id")
+        "google_id": current_user.get("google_id"),
+        "preferences": UserPreferences(**current_user.get("preferences", {})).model_dump()
     }
     
     return user_data
+
+
+@router.put("/me/preferences", response_model=UserPreferences)
+async def update_preferences(
+    preferences: UserPreferences,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Update the current user's preferences.
+    
+    Args:
+        preferences: New preference values
+        current_user: Current authenticated user from JWT token
+        db: Database instance
+        
+    Returns:
+        UserPreferences: Stored preferences
+    """
+    user_collection = get_user_collection(db)
+    await user_collection.update_one(
+        {"_id": current_user["_id"]},
+        {"$set": {"preferences": preferences.model_dump()}, "$inc": {"data_version": 1}}  # Invalidates /users/me ETags
+    )
+    
+    return preferences
@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 
@@ -10,6 +11,7 @@ class Settings(BaseSettings):
     GOOGLE_CLIENT_SECRET: str
     SECRET_KEY: str
     AI_SERVICE_URL: str = "https://your-ngrok-url.ngrok-free.app"
+    AI_SERVICE_URLS: str = ""  # Comma-separated AI service instances (overrides AI_SERVICE_URL)
     FRONTEND_URL: str = "http://127.0.0.1:8080"
     
     # OAuth Settings
@@ -19,6 +21,88 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 10080  # 7 days
     
+    # AI Gateway Settings (one pooled client per process)
+    AI_POOL_MAX_CONNECTIONS: int = 20
+    AI_POOL_MAX_KEEPALIVE: int = 10
+    AI_POOL_KEEPALIVE_EXPIRY: float = 30.0  # seconds
+    AI_HTTP2: bool = False  # Requires the optional 'h2' package
+    AI_CONNECT_TIMEOUT: float = 10.0
+    
+    # Circuit breaker and background health poller for the AI service
+    AI_BREAKER_FAILURE_THRESHOLD: int = 3  # Consecutive failures that open the circuit
+    AI_BREAKER_RECOVERY_SECONDS: float = 30.0  # Fail fast this long before a trial call
+    AI_BREAKER_SLOW_CALL_SECONDS: float = 5.0  # Slower health probes count as failures
+    AI_HEALTH_POLL_INTERVAL: float = 15.0  # Seconds between probes (0 = disabled)
+    
+    # Fair scheduler for AI calls (shared round-robin across users)
+    AI_MAX_CONCURRENCY: int = 4  # Requests running against the AI service at once (all backends together)
+    AI_MAX_QUEUE_PER_USER: int = 5  # Waiting requests per user before 429
+    
+    # Largest accepted upload in bytes (checked from Content-Length, then while streaming)
+    MAX_UPLOAD_SIZE: int = 52428800  # 50MB
+    RESUMABLE_UPLOAD_TTL_SECONDS: int = 86400  # Resumable uploads not written to for this long are discarded
+    UPLOAD_TEMP_DIRECTORY: str = ""  # Uploads in progress ("" = inside the upload directory; elsewhere means a copy per upload)
+    
+    # Where stored files live: "local" (sharded upload directory) or "s3" (S3-compatible bucket, e.g. MinIO)
+    STORAGE_BACKEND: str = "local"
+    S3_ENDPOINT_URL: str = ""  # e.g. https://s3.us-east-1.amazonaws.com or http://localhost:9000
+    S3_BUCKET: str = ""
+    S3_ACCESS_KEY_ID: str = ""
+    S3_SECRET_ACCESS_KEY: str = ""
+    S3_REGION: str = "us-east-1"
+    S3_PREFIX: str = ""  # Prepended to every object key
+    
+    # FileManager locks: "process" (asyncio, one worker) or "file" (fcntl lock files shared by all workers on the host)
+    FILE_LOCK_MODE: str = "process"
+    FILE_LOCK_DIRECTORY: str = ""  # Lock files for "file" mode ("" = <upload directory>/.locks; must be a local file system)
+    
+    # Background precompute after upload (users can opt out in their preferences)
+    PRECOMPUTE_ON_UPLOAD: bool = True  # Activate the AI session and generate the summary
+    PRECOMPUTE_QUIZ: bool = False  # Also generate a first batch of quiz questions
+    AI_PRECOMPUTE_CONCURRENCY: int = 1  # AI slots background work may hold (below interactive requests)
+    
+    # Per-operation read timeouts in seconds (None = no limit for large documents)
+    AI_TIMEOUT_UPLOAD: Optional[float] = None
+    AI_TIMEOUT_SUMMARIZE: Optional[float] = None
+    AI_TIMEOUT_QUIZ: Optional[float] = None
+    AI_TIMEOUT_ASK: Optional[float] = None
+    AI_TIMEOUT_YOUTUBE: Optional[float] = None
+    AI_TIMEOUT_HEALTH: Optional[float] = 5.0
+    
+    # Deadline budgets in seconds for a whole AI operation: upload, AI compute and retries (0 = no limit)
+    AI_DEADLINE_SUMMARIZE: float = 600.0
+    AI_DEADLINE_QUIZ: float = 900.0
+    AI_DEADLINE_ASK: float = 180.0
+    AI_DEADLINE_YOUTUBE: float = 600.0
+    
+    # How long an AI session_id is reused before the document is re-uploaded (0 = never reuse)
+    AI_SESSION_TTL_SECONDS: int = 3600
+    
+    # Summary store (in-process LRU in front of MongoDB)
+    SUMMARY_CACHE_SIZE: int = 128
+    
+    # Response compression (brotli requires the optional 'brotli' package, gzip otherwise)
+    COMPRESSION_MINIMUM_SIZE: int = 1024  # Smaller responses are sent uncompressed (0 = compress everything)
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4  # Dynamic responses; stored summaries use the maximum once
+    
+    # YouTube video summaries (keyed by video ID)
+    YOUTUBE_SUMMARY_TTL_SECONDS: int = 604800  # 7 days
+    
+    # Quiz question bank
+    QUIZ_SAMPLE_SIZE: int = 10  # Questions drawn per quiz request
+    QUIZ_BANK_MIN_SIZE: int = 30  # Refill from the AI service below this many questions
+    
+    # Answer cache for /ask (near-duplicate questions per document)
+    ANSWER_CACHE_TTL_SECONDS: int = 3600
+    ANSWER_CACHE_MAX_DOCUMENTS: int = 500
+    ANSWER_CACHE_MAX_ENTRIES_PER_DOCUMENT: int = 100
+    ANSWER_CACHE_SIMILARITY: float = 0.8  # Word-bigram Jaccard threshold for a rephrased repeat (content words must match)
+    
+    # Batch ask (POST /content/{id}/ask/batch)
+    ASK_BATCH_MAX_QUESTIONS: int = 20
+    ASK_BATCH_CONCURRENCY: int = 3  # Questions of one batch sent to the AI service at once
+    
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -56,3 +56,81 @@ def get_quiz_results_collection(db: AsyncIOMotorDatabase) -> AsyncIOMotorCollect
         AsyncIOMotorCollection: Quiz results collection
     """
     return db.quiz_results
+
+
+def get_summaries_collection(db: AsyncIOMotorDatabase) -> AsyncIOMotorCollection:
+    """
+    Get the summaries collection (formatted summaries keyed by file SHA-256).
+    
+    Args:
+        db: Database instance
+        
+    Returns:
+        AsyncIOMotorCollection: Summaries collection
+    """
+    return db.summaries
+
+
+def get_quiz_questions_collection(db: AsyncIOMotorDatabase) -> AsyncIOMotorCollection:
+    """
+    Get the quiz questions collection (per-document question banks).
+    
+    Args:
+        db: Database instance
+        
+    Returns:
+        AsyncIOMotorCollection: Quiz questions collection
+    """
+    return db.quiz_questions
+
+
+def get_jobs_collection(db: AsyncIOMotorDatabase) -> AsyncIOMotorCollection:
+    """
+    Get the jobs collection (background summarize/quiz jobs).
+    
+    Args:
+        db: Database instance
+        
+    Returns:
+        AsyncIOMotorCollection: Jobs collection
+    """
+    return db.jobs
+
+
+def get_blobs_collection(db: AsyncIOMotorDatabase) -> AsyncIOMotorCollection:
+    """
+    Get the blobs collection (content-addressed upload files and their references).
+    
+    Args:
+        db: Database instance
+        
+    Returns:
+        AsyncIOMotorCollection: Blobs collection
+    """
+    return db.blobs
+
+
+def get_uploads_collection(db: AsyncIOMotorDatabase) -> AsyncIOMotorCollection:
+    """
+    Get the uploads collection (resumable uploads in progress).
+    
+    Args:
+        db: Database instance
+        
+    Returns:
+        AsyncIOMotorCollection: Uploads collection
+    """
+    return db.uploads
+
+
+def get_youtube_summaries_collection(db: AsyncIOMotorDatabase) -> AsyncIOMotorCollection:
+    """
+    Get the YouTube summaries collection (video summaries keyed by video ID).
+    
+    Args:
+        db: Database instance
+        
+    Returns:
+        AsyncIOMotorCollection: YouTube summaries collection
+    """
+    return db.youtube_summaries
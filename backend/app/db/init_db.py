@@ -99,6 +99,12 @@ async def create_indexes(db: AsyncIOMotorDatabase):
     except Exception as e:
         handle_index_creation(e, "idx_filename")
     
+    # Index on content_hash for finding identical files across users
+    try:
+        await db.content.create_index("content_hash", sparse=True, name="idx_content_hash")
+    except Exception as e:
+        handle_index_creation(e, "idx_content_hash")
+    
     print("    ✓ Content indexes created (or already exist)")
     
     
@@ -144,6 +150,91 @@ async def create_indexes(db: AsyncIOMotorDatabase):
     print("    ✓ Quiz results indexes created (or already exist)")
     
     
+    # ==================== QUIZ QUESTIONS Collection ====================
+    print("  - Creating indexes for 'quiz_questions' collection...")
+    
+    # Unique question per bank (deduplication by normalized text)
+    try:
+        await db.quiz_questions.create_index(
+            [("bank_key", 1), ("normalized", 1)],
+            unique=True,
+            name="idx_bank_question_unique"
+        )
+    except Exception as e:
+        handle_index_creation(e, "idx_bank_question_unique")
+    
+    print("    ✓ Quiz questions indexes created (or already exist)")
+    
+    
+    # ==================== JOBS Collection ====================
+    print("  - Creating indexes for 'jobs' collection...")
+    
+    # Lookup of a user's active job for the same operation
+    try:
+        await db.jobs.create_index(
+            [("user_id", 1), ("kind", 1), ("content_id", 1), ("status", 1)],
+            name="idx_job_lookup"
+        )
+    except Exception as e:
+        handle_index_creation(e, "idx_job_lookup")
+    
+    # At most one active (queued/running) job per user, operation and content,
+    # so concurrent submissions can't both create one
+    try:
+        await db.jobs.create_index(
+            [("user_id", 1), ("kind", 1), ("content_id", 1)],
+            unique=True,
+            partialFilterExpression={"active": True},
+            name="idx_job_active_unique"
+        )
+    except Exception as e:
+        handle_index_creation(e, "idx_job_active_unique")
+    
+    # TTL index - finished job records are removed after 24 hours
+    try:
+        await db.jobs.create_index(
+            "created_at",
+            expireAfterSeconds=86400,  # 24 hours
+            name="idx_job_ttl"
+        )
+    except Exception as e:
+        handle_index_creation(e, "idx_job_ttl")
+    
+    print("    ✓ Jobs indexes created (or already exist)")
+    
+    
+    # ==================== YOUTUBE SUMMARIES Collection ====================
+    print("  - Creating indexes for 'youtube_summaries' collection...")
+    
+    # TTL index - each video summary is removed at its own expires_at
+    try:
+        await db.youtube_summaries.create_index(
+            "expires_at",
+            expireAfterSeconds=0,
+            name="idx_youtube_summary_ttl"
+        )
+    except Exception as e:
+        handle_index_creation(e, "idx_youtube_summary_ttl")
+    
+    print("    ✓ YouTube summaries indexes created (or already exist)")
+    
+    
+    # ==================== UPLOADS Collection ====================
+    print("  - Creating indexes for 'uploads' collection...")
+    
+    # TTL index - abandoned resumable uploads expire (their temp files are cleaned up separately)
+    try:
+        await db.uploads.create_index(
+            "expires_at",
+            expireAfterSeconds=0,
+            name="idx_upload_ttl"
+        )
+    except Exception as e:
+        handle_index_creation(e, "idx_upload_ttl")
+    
+    print("    ✓ Uploads indexes created (or already exist)")
+    
+    
     # ==================== SESSION MANAGEMENT Collection ====================
     print("  - Creating indexes for 'sessions' collection (if needed)...")
     
@@ -175,8 +266,12 @@ async def create_indexes(db: AsyncIOMotorDatabase):
     print("\n✅ All indexes created successfully!")
     print("\nIndex Summary:")
     print("  - Users: 2 indexes (email unique, created_at)")
-    print("  - Content: 5 indexes (user isolation, session lookup, filename search)")
+    print("  - Content: 6 indexes (user isolation, session lookup, filename search, content hash)")
     print("  - Quiz Results: 5 indexes (user isolation, performance analytics)")
+    print("  - Quiz Questions: 1 index (unique question per bank)")
+    print("  - Jobs: 2 indexes (active job lookup, TTL cleanup)")
+    print("  - YouTube Summaries: 1 index (TTL cleanup)")
+    print("  - Uploads: 1 index (TTL cleanup)")
     print("  - Sessions: 3 indexes (TTL cleanup, session lookup, user sessions)")
     print("\n🔒 Multi-user data isolation is now enforced at the database level!")
 
@@ -189,7 +284,7 @@ async def verify_indexes(db: AsyncIOMotorDatabase):
     print("VERIFYING INDEXES")
     print("="*60 + "\n")
     
-    collections = ["users", "content", "quiz_results", "sessions"]
+    collections = ["users", "content", "quiz_results", "quiz_questions", "jobs", "youtube_summaries", "blobs", "uploads", "sessions"]
     
     for collection_name in collections:
         print(f"📊 {collection_name.upper()} Collection:")
@@ -1,15 +1,47 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 from app.core.config import settings
-from app.api.endpoints import auth, users, content, quiz, youtube, health
+from app.api.endpoints import auth, users, content, quiz, youtube, health, jobs, uploads
 from app.middleware.rate_limiter import limiter, custom_rate_limit_handler
+from app.middleware.compression import CompressionMiddleware
+from app.utils.ai_client import get_ai_client
+from app.utils.request_queue import get_queue_manager
+from app.utils.file_manager import get_file_manager
+from app.utils.job_manager import get_job_manager
+from app.db.database import database
 from slowapi.errors import RateLimitExceeded
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Application lifespan: open shared resources on startup, close them on shutdown.
+    """
+    # One pooled AI gateway client per process
+    ai_client = get_ai_client()
+    await ai_client.start()
+    
+    # Jobs a previous (crashed or restarted) process left queued/running
+    try:
+        await get_job_manager().fail_orphaned_jobs(database)
+    except Exception as e:
+        print(f"[ERROR] Could not check for orphaned jobs: {str(e)}")
+    
+    yield
+    
+    await get_job_manager().shutdown(database)
+    await get_queue_manager().shutdown()
+    await ai_client.close()
+    await get_file_manager().close()
+
+
 app = FastAPI(
     title="PrepGen API",
     description="AI-Powered Personalized Learning Platform - Multi-User Safe",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
 # Rate limiting middleware (MUST be added before other routes)
@@ -42,13 +74,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Location", "Upload-Offset", "Upload-Length"],  # Resumable uploads
 )
 
+# Response compression (outermost, so every JSON/text response is eligible)
+app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MINIMUM_SIZE)
+
 # Include routers
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(users.router, prefix="/users", tags=["Users"])
 app.include_router(content.router, prefix="/content", tags=["Content"])
 app.include_router(quiz.router, prefix="/quiz", tags=["Quiz"])
+app.include_router(jobs.router, prefix="/jobs", tags=["Jobs"])
+app.include_router(uploads.router, prefix="/uploads", tags=["Uploads"])
 app.include_router(youtube.router, prefix="/api", tags=["YouTube"])
 app.include_router(health.router, tags=["Health"])
 
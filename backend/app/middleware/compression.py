@@ -0,0 +1,120 @@
+"""
+Response compression middleware.
+Negotiates brotli or gzip from Accept-Encoding for JSON and text responses
+above a size threshold, so summaries, quizzes and content lists cross slow
+mobile connections in a fraction of the bytes while tiny responses skip the
+CPU cost. Responses that already carry a Content-Encoding (pre-compressed
+stored summaries) and Server-Sent Events pass through untouched.
+"""
+
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils.compression import StreamCompressor, compress, is_compressible, negotiate_encoding
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing eligible responses with the client's preferred encoding.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024):
+        """
+        Args:
+            app: Wrapped ASGI application
+            minimum_size: Bodies smaller than this many bytes are sent uncompressed
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = CompressionResponder(self.app, encoding, self.minimum_size)
+        await responder(scope, receive, send)
+
+
+class CompressionResponder:
+    """
+    Wraps one response: decides from its headers and first body chunk whether to
+    compress, then compresses in one shot (complete body) or incrementally (streamed body).
+    """
+
+    def __init__(self, app: ASGIApp, encoding: str, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send: Optional[Send] = None
+        self.start_message: Optional[Message] = None
+        self.started = False
+        self.compressor: Optional[StreamCompressor] = None
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        self.send = send
+        await self.app(scope, receive, self.send_with_compression)
+
+    async def send_with_compression(self, message: Message):
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            # Hold the headers until the first body chunk shows the body size
+            self.start_message = message
+            return
+
+        if message_type != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if not self.started:
+            self.started = True
+            headers = MutableHeaders(raw=self.start_message["headers"])
+
+            if "content-encoding" in headers or not is_compressible(headers.get("content-type", "")):
+                self.passthrough = True
+            elif not more_body and len(body) < self.minimum_size:
+                headers.add_vary_header("Accept-Encoding")
+                self.passthrough = True
+
+            if self.passthrough:
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+
+            if not more_body:
+                # Complete body: compress in one shot
+                body = compress(body, self.encoding)
+                headers["Content-Length"] = str(len(body))
+                await self.send(self.start_message)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+
+            # Streamed body: length unknown, compress chunk by chunk
+            del headers["Content-Length"]
+            self.compressor = StreamCompressor(self.encoding)
+            await self.send(self.start_message)
+
+        if self.passthrough:
+            await self.send(message)
+            return
+
+        await self.send({
+            "type": "http.response.body",
+            "body": self.compressor.feed(body, final=not more_body),
+            "more_body": more_body
+        })
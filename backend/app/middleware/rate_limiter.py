@@ -54,6 +54,8 @@ RATE_LIMITS = {
     "summarize": "30/hour",
     "quiz": "30/hour",
     "ask": "100/hour",
+    "ask_batch": "10/hour",
+    "youtube": "20/hour",
     
     # General API endpoints
     "api": "100/minute",
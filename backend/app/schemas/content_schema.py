@@ -63,6 +63,23 @@ class ContentCreate(BaseModel):
         }
 
 
+class ResumableUploadCreate(BaseModel):
+    """Request model for starting a resumable upload."""
+    filename: str = Field(..., min_length=1)
+    content_type: str
+    size: int = Field(..., gt=0)
+    sha256: Optional[str] = Field(None, pattern="^[0-9a-f]{64}$")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "filename": "lecture_slides.pdf",
+                "content_type": "application/pdf",
+                "size": 52428800
+            }
+        }
+
+
 class ContentResponse(BaseModel):
     """Response model for content."""
     _id: str
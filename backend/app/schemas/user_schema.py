@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, EmailStr
-from typing import Optional
+from typing import List, Optional
 from bson import ObjectId
 
 
@@ -42,6 +42,18 @@ class User(BaseModel):
         }
 
 
+class UserPreferences(BaseModel):
+    """Per-user settings."""
+    precompute_on_upload: bool = True  # Generate summaries in the background after upload
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "precompute_on_upload": False
+            }
+        }
+
+
 class UserCreate(BaseModel):
     """Schema for creating a new user."""
     email: EmailStr
@@ -95,6 +107,21 @@ class AskRequest(BaseModel):
         }
 
 
+class AskBatchRequest(BaseModel):
+    """Request model for asking several questions about a document at once."""
+    questions: List[str] = Field(..., min_length=1)
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "questions": [
+                    "What are the main topics discussed in this document?",
+                    "Summarize chapter 2 in three sentences."
+                ]
+            }
+        }
+
+
 class AskResponse(BaseModel):
     """Response model for document Q&A."""
     question: str
@@ -0,0 +1,612 @@
+"""
+Shared HTTP gateway for Kalash's AI service.
+One pooled httpx client per AI backend per process, opened and closed by the
+FastAPI lifespan, so summarize/quiz/ask calls (and their retries) reuse warm
+TCP/TLS connections instead of paying a fresh handshake through the ngrok
+tunnel every time. Every call passes through its backend's circuit breaker,
+which a background health poller keeps up to date.
+With several AI service instances configured, new sessions go to the healthy
+backend with the fewest in-flight requests and a document's calls stick to
+the backend holding its session_id.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional
+
+import httpx
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+from app.utils.circuit_breaker import CircuitBreaker, create_circuit_breaker
+
+logger = logging.getLogger(__name__)
+
+
+# Headers required by ngrok to bypass the browser warning page
+DEFAULT_HEADERS = {
+    "ngrok-skip-browser-warning": "true",
+    "User-Agent": "PrepGen-Backend/1.0"
+}
+
+
+# Phrases the AI service uses when a session_id was evicted or has expired
+SESSION_EXPIRED_MARKERS = ("not found", "expired", "invalid", "unknown", "no such", "does not exist")
+
+
+# Fields that may carry generated text in a streamed (SSE) or JSON AI response
+STREAM_TEXT_FIELDS = ("token", "text", "delta", "content", "chunk", "answer", "summary")
+
+
+# session_id -> backend bindings remembered per process (older ones are re-read from MongoDB)
+MAX_TRACKED_SESSIONS = 10000
+
+
+class AISessionExpiredError(Exception):
+    """Raised when the AI service no longer recognises a session_id."""
+    pass
+
+
+def _http2_available() -> bool:
+    """Check whether the optional 'h2' package needed for HTTP/2 is installed."""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def is_upstream_down_response(response: httpx.Response) -> bool:
+    """
+    Check whether a response means the AI service itself is unreachable
+    (gateway errors or an ngrok tunnel error page) rather than a request error.
+
+    Args:
+        response: Response from the AI service (body need not be read)
+
+    Returns:
+        bool: True if the failure should count against the circuit breaker
+    """
+    return response.status_code in (502, 503, 504) or "ngrok-error-code" in response.headers
+
+
+def is_session_expired_response(response: httpx.Response) -> bool:
+    """
+    Check whether an AI service error means the session_id is gone
+    (evicted or expired on their side) rather than a real failure.
+
+    Args:
+        response: Response from the AI service
+
+    Returns:
+        bool: True if the document must be re-uploaded
+    """
+    if response.status_code not in (400, 404, 410, 422):
+        return False
+    
+    text = response.text.lower()
+    return "session" in text and any(marker in text for marker in SESSION_EXPIRED_MARKERS)
+
+
+def raise_for_ai_status(response: httpx.Response):
+    """
+    Raise for a non-200 AI service response.
+    Detects the ngrok offline page BEFORE raise_for_status so users get a clear 503.
+
+    Args:
+        response: Response from the AI service
+
+    Raises:
+        HTTPException: If the ngrok tunnel is not responding
+        AISessionExpiredError: If the AI service no longer knows the session_id
+        httpx.HTTPStatusError: For other non-200 responses
+    """
+    if response.status_code != 200:
+        if "ngrok" in response.text.lower() or "<!DOCTYPE html>" in response.text:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="AI service is currently offline (ngrok tunnel not responding)"
+            )
+        if is_session_expired_response(response):
+            raise AISessionExpiredError(response.text[:200])
+        response.raise_for_status()
+
+
+def _extract_text(payload) -> str:
+    """Pull the generated text out of a decoded AI response payload."""
+    if isinstance(payload, str):
+        return payload
+    if isinstance(payload, dict):
+        for field in STREAM_TEXT_FIELDS:
+            if isinstance(payload.get(field), str):
+                return payload[field]
+    return ""
+
+
+async def iter_ai_text(response: httpx.Response) -> AsyncIterator[str]:
+    """
+    Yield generated text from a streaming AI response as it arrives.
+    Handles Server-Sent Events, plain chunked text, and a regular JSON body
+    (AI service versions without streaming support) as a single chunk.
+    
+    Args:
+        response: Open streaming response from the AI service
+        
+    Yields:
+        str: Text chunks in arrival order
+    """
+    content_type = response.headers.get("content-type", "")
+    
+    if "text/event-stream" in content_type:
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            
+            try:
+                text = _extract_text(json.loads(data))
+            except ValueError:
+                text = data
+            
+            if text:
+                yield text
+    
+    elif "application/json" in content_type:
+        text = _extract_text(json.loads(await response.aread()))
+        if text:
+            yield text
+    
+    else:
+        async for chunk in response.aiter_text():
+            if chunk:
+                yield chunk
+
+
+class AIServiceClient:
+    """
+    Process-wide pooled client for one AI service instance.
+    Holds a single httpx.AsyncClient with configurable pool limits,
+    optional HTTP/2 and per-operation read timeouts.
+    """
+
+    def __init__(self, base_url: str, breaker: Optional[CircuitBreaker] = None):
+        """
+        Initialize the gateway (the underlying client is created on start()).
+
+        Args:
+            base_url: Base URL of the AI service
+            breaker: Circuit breaker to use (defaults to a new one configured from settings)
+        """
+        self.base_url = base_url.rstrip("/")
+        self.breaker = breaker or create_circuit_breaker()
+        self.outstanding = 0  # Requests in flight (used for least-outstanding routing)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._health_task: Optional[asyncio.Task] = None
+
+    @property
+    def available(self) -> bool:
+        """Whether the circuit breaker would let a call through right now."""
+        return self.breaker.allows_call()
+
+    def _build_client(self) -> httpx.AsyncClient:
+        """Create the pooled httpx client from settings."""
+        http2 = settings.AI_HTTP2
+        if http2 and not _http2_available():
+            logger.warning("AI_HTTP2 is enabled but 'h2' is not installed - falling back to HTTP/1.1")
+            http2 = False
+
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=DEFAULT_HEADERS,
+            timeout=httpx.Timeout(None, connect=settings.AI_CONNECT_TIMEOUT),
+            follow_redirects=True,
+            verify=False,  # Disable SSL verification for ngrok tunnels
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.AI_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.AI_POOL_MAX_KEEPALIVE,
+                keepalive_expiry=settings.AI_POOL_KEEPALIVE_EXPIRY
+            )
+        )
+
+    async def start(self):
+        """
+        Open the connection pool and start the health poller.
+        Called once from the application lifespan.
+        """
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+            logger.info(f"AI gateway client started for {self.base_url}")
+
+        if settings.AI_HEALTH_POLL_INTERVAL > 0 and self._health_task is None:
+            self._health_task = asyncio.create_task(self._poll_health())
+
+    async def close(self):
+        """Stop the health poller and close the connection pool. Called once on application shutdown."""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+            logger.info("AI gateway client closed")
+        self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """
+        Get the pooled client, creating it lazily if the lifespan has not run
+        (e.g. scripts or tests that import the endpoints directly).
+        """
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+        return self._client
+
+    @staticmethod
+    def timeout_for(operation: str) -> httpx.Timeout:
+        """
+        Build the timeout for an AI operation.
+
+        Args:
+            operation: Operation name (upload, summarize, quiz, ask, youtube, health)
+
+        Returns:
+            httpx.Timeout: Read/write/pool timeout for the operation (None = no limit)
+        """
+        timeouts = {
+            "upload": settings.AI_TIMEOUT_UPLOAD,
+            "summarize": settings.AI_TIMEOUT_SUMMARIZE,
+            "quiz": settings.AI_TIMEOUT_QUIZ,
+            "ask": settings.AI_TIMEOUT_ASK,
+            "youtube": settings.AI_TIMEOUT_YOUTUBE,
+            "health": settings.AI_TIMEOUT_HEALTH,
+        }
+        return httpx.Timeout(timeouts.get(operation), connect=settings.AI_CONNECT_TIMEOUT)
+
+    def _record_response(self, response: httpx.Response):
+        """Feed a response's outcome to the circuit breaker."""
+        if is_upstream_down_response(response):
+            self.breaker.record_failure(f"AI service returned {response.status_code}")
+        else:
+            self.breaker.record_success()
+
+    async def request(self, method: str, path: str, operation: str, **kwargs) -> httpx.Response:
+        """
+        Send a request to the AI service over the shared pool.
+
+        Args:
+            method: HTTP method
+            path: Path on the AI service (e.g. "/summarize")
+            operation: Operation name used to pick the timeout
+            **kwargs: Extra arguments forwarded to httpx
+
+        Returns:
+            httpx.Response: Response from the AI service
+
+        Raises:
+            HTTPException: 503 with Retry-After if the circuit is open
+        """
+        self.breaker.before_call()
+        kwargs.setdefault("timeout", self.timeout_for(operation))
+
+        self.outstanding += 1
+        try:
+            response = await self.client.request(method, path, **kwargs)
+        except httpx.TransportError as e:
+            self.breaker.record_failure(f"{type(e).__name__}: {str(e) or 'connection failed'}")
+            raise
+        finally:
+            self.outstanding -= 1
+
+        self._record_response(response)
+        return response
+
+    @asynccontextmanager
+    async def stream(self, method: str, path: str, operation: str, **kwargs):
+        """
+        Open a streaming request to the AI service over the shared pool.
+        Use as: async with ai_client.stream(...) as response.
+        
+        Args:
+            method: HTTP method
+            path: Path on the AI service
+            operation: Operation name used to pick the timeout
+            **kwargs: Extra arguments forwarded to httpx
+        
+        Yields:
+            httpx.Response: Response with an unread body
+
+        Raises:
+            HTTPException: 503 with Retry-After if the circuit is open
+        """
+        self.breaker.before_call()
+        kwargs.setdefault("timeout", self.timeout_for(operation))
+
+        self.outstanding += 1
+        try:
+            async with self.client.stream(method, path, **kwargs) as response:
+                self._record_response(response)
+                yield response
+        except httpx.TransportError as e:
+            self.breaker.record_failure(f"{type(e).__name__}: {str(e) or 'connection failed'}")
+            raise
+        finally:
+            self.outstanding -= 1
+
+    async def probe_health(self) -> bool:
+        """
+        Probe the AI service's /health endpoint and feed the result to the breaker.
+        Bypasses the breaker so the probe can detect recovery while it is open.
+
+        Returns:
+            bool: True if the AI service is online
+        """
+        started = time.monotonic()
+        try:
+            response = await self.client.get("/health", timeout=self.timeout_for("health"))
+        except httpx.HTTPError as e:
+            self.breaker.record_probe(False, None, f"{type(e).__name__}: {str(e) or 'connection failed'}")
+            return False
+
+        online = 200 <= response.status_code < 300 and not is_upstream_down_response(response)
+        error = None if online else f"health check returned {response.status_code}"
+        self.breaker.record_probe(online, time.monotonic() - started, error)
+        return online
+
+    async def _poll_health(self):
+        """Background loop: probe the AI service every AI_HEALTH_POLL_INTERVAL seconds."""
+        while True:
+            try:
+                await self.probe_health()
+            except Exception as e:
+                logger.error(f"AI health probe failed unexpectedly: {str(e)}")
+            await asyncio.sleep(settings.AI_HEALTH_POLL_INTERVAL)
+
+    async def get(self, path: str, operation: str, **kwargs) -> httpx.Response:
+        """Send a GET request to the AI service."""
+        return await self.request("GET", path, operation, **kwargs)
+
+    async def post(self, path: str, operation: str, **kwargs) -> httpx.Response:
+        """Send a POST request to the AI service."""
+        return await self.request("POST", path, operation, **kwargs)
+
+
+class AIBackendPool:
+    """
+    Routes AI calls across the configured AI service instances.
+    Session-less calls (uploads, YouTube) go to the available backend with the
+    fewest in-flight requests. Calls for a session go to the backend that holds
+    it; if that backend is down while another one is up, the session is
+    reported as expired so the caller re-uploads (re-homes) the document.
+    """
+
+    def __init__(self, base_urls: List[str]):
+        """
+        Initialize the pool (connections are opened on start()).
+
+        Args:
+            base_urls: Base URLs of the AI service instances
+        """
+        self.backends = [AIServiceClient(url) for url in base_urls]
+        self._sessions: "OrderedDict[str, AIServiceClient]" = OrderedDict()  # session_id -> backend
+        self._next = 0  # Rotates ties between equally loaded backends
+
+    @property
+    def base_url(self) -> str:
+        """Base URL of the first backend (for logging)."""
+        return self.backends[0].base_url
+
+    async def start(self):
+        """Open every backend's connection pool and health poller."""
+        for backend in self.backends:
+            await backend.start()
+
+    async def close(self):
+        """Close every backend's connection pool and health poller."""
+        for backend in self.backends:
+            await backend.close()
+
+    def backend_for(self, base_url: Optional[str]) -> Optional[AIServiceClient]:
+        """
+        Look up a configured backend by base URL.
+
+        Returns:
+            Optional[AIServiceClient]: The backend, or None if it is no longer configured
+        """
+        if not base_url:
+            return None
+        base_url = base_url.rstrip("/")
+        for backend in self.backends:
+            if backend.base_url == base_url:
+                return backend
+        return None
+
+    def pick(self) -> AIServiceClient:
+        """
+        Choose a backend for a new session or a session-less call:
+        the available one with the fewest in-flight requests.
+
+        Returns:
+            AIServiceClient: The chosen backend
+
+        Raises:
+            HTTPException: 503 with Retry-After if every backend is failing fast
+        """
+        available = [backend for backend in self.backends if backend.available]
+
+        if not available:
+            # Surface the 503 of the backend that will recover first
+            soonest = min(self.backends, key=lambda backend: backend.breaker.retry_after())
+            soonest.breaker.before_call()
+            return soonest
+
+        count = len(self.backends)
+        start = self._next
+        self._next = (self._next + 1) % count
+
+        return min(
+            available,
+            key=lambda backend: (backend.outstanding, (self.backends.index(backend) - start) % count)
+        )
+
+    def should_rehome(self, backend: AIServiceClient) -> bool:
+        """Whether a session on this backend should move (it is down and another backend is up)."""
+        return not backend.available and any(
+            other.available for other in self.backends if other is not backend
+        )
+
+    def bind(self, session_id: str, backend: AIServiceClient):
+        """
+        Remember which backend holds a session.
+
+        Args:
+            session_id: session_id returned by the backend's /upload
+            backend: Backend that created the session
+        """
+        self._sessions[session_id] = backend
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > MAX_TRACKED_SESSIONS:
+            self._sessions.popitem(last=False)
+
+    def forget(self, session_id: str):
+        """Drop a session binding (session expired or re-homed)."""
+        self._sessions.pop(session_id, None)
+
+    def _route(self, session_id: Optional[str]) -> AIServiceClient:
+        """
+        Choose the backend for a call.
+
+        Raises:
+            AISessionExpiredError: If the session's backend is unknown or should be left
+            HTTPException: 503 with Retry-After if no backend can take the call
+        """
+        if session_id is None:
+            return self.pick()
+
+        backend = self._sessions.get(session_id)
+        if backend is None:
+            raise AISessionExpiredError(f"session {session_id} is not bound to an AI backend")
+        if self.should_rehome(backend):
+            raise AISessionExpiredError(f"AI backend {backend.base_url} is unavailable")
+        return backend
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        operation: str,
+        session_id: Optional[str] = None,
+        **kwargs
+    ) -> httpx.Response:
+        """
+        Send a request to the backend holding the session (or the least loaded one).
+
+        Args:
+            method: HTTP method
+            path: Path on the AI service (e.g. "/summarize")
+            operation: Operation name used to pick the timeout
+            session_id: Session the call belongs to (routes to its backend)
+            **kwargs: Extra arguments forwarded to httpx
+
+        Returns:
+            httpx.Response: Response from the AI service
+
+        Raises:
+            AISessionExpiredError: If the session must be re-homed to another backend
+            HTTPException: 503 with Retry-After if no backend can take the call
+        """
+        backend = self._route(session_id)
+
+        try:
+            return await backend.request(method, path, operation, **kwargs)
+        except httpx.TransportError:
+            # The failure that opened this backend's circuit: move the document now
+            if session_id is not None and self.should_rehome(backend):
+                raise AISessionExpiredError(f"AI backend {backend.base_url} is unavailable")
+            raise
+
+    @asynccontextmanager
+    async def stream(
+        self,
+        method: str,
+        path: str,
+        operation: str,
+        session_id: Optional[str] = None,
+        **kwargs
+    ):
+        """
+        Open a streaming request to the backend holding the session (or the least loaded one).
+        Use as: async with ai_client.stream(...) as response.
+
+        Args:
+            method: HTTP method
+            path: Path on the AI service
+            operation: Operation name used to pick the timeout
+            session_id: Session the call belongs to (routes to its backend)
+            **kwargs: Extra arguments forwarded to httpx
+
+        Yields:
+            httpx.Response: Response with an unread body
+
+        Raises:
+            AISessionExpiredError: If the session must be re-homed to another backend
+            HTTPException: 503 with Retry-After if no backend can take the call
+        """
+        backend = self._route(session_id)
+        opened = False
+
+        try:
+            async with backend.stream(method, path, operation, **kwargs) as response:
+                opened = True
+                yield response
+        except httpx.TransportError:
+            if not opened and session_id is not None and self.should_rehome(backend):
+                raise AISessionExpiredError(f"AI backend {backend.base_url} is unavailable")
+            raise
+
+    async def get(self, path: str, operation: str, **kwargs) -> httpx.Response:
+        """Send a GET request to the AI service."""
+        return await self.request("GET", path, operation, **kwargs)
+
+    async def post(self, path: str, operation: str, **kwargs) -> httpx.Response:
+        """Send a POST request to the AI service."""
+        return await self.request("POST", path, operation, **kwargs)
+
+    async def probe_health(self) -> bool:
+        """
+        Probe every backend's /health endpoint.
+
+        Returns:
+            bool: True if at least one backend is online
+        """
+        results = await asyncio.gather(*(backend.probe_health() for backend in self.backends))
+        return any(results)
+
+
+def configured_ai_urls() -> List[str]:
+    """Get the AI backend URLs: AI_SERVICE_URLS (comma-separated) or the single AI_SERVICE_URL."""
+    urls = [url.strip() for url in settings.AI_SERVICE_URLS.split(",") if url.strip()]
+    return urls or [settings.AI_SERVICE_URL]
+
+
+# Global AI gateway instance
+_ai_client: Optional[AIBackendPool] = None
+
+
+def get_ai_client() -> AIBackendPool:
+    """Get the global AI gateway instance."""
+    global _ai_client
+    if _ai_client is None:
+        _ai_client = AIBackendPool(configured_ai_urls())
+    return _ai_client
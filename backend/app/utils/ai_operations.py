@@ -0,0 +1,37 @@
+"""
+Shared entry point for AI operations started by the API routers.
+Summaries, quizzes and YouTube summaries all go through the same three
+layers: single-flight coalescing (one call per key among concurrent
+callers), the fair-share AI request queue, and the operation's deadline.
+"""
+
+from app.utils.deadlines import run_with_deadline
+from app.utils.request_queue import get_queue_manager
+from app.utils.single_flight import get_single_flight
+
+
+def run_ai_operation(key: tuple, user_id: str, func, *args, background: bool = False):
+    """
+    Run a shareable AI operation: once per key among concurrent callers,
+    in the user's fair-share turn, within the operation's deadline budget.
+    An interactive caller joining queued background work moves it up to
+    interactive priority.
+    
+    Args:
+        key: Single-flight key, e.g. ("summarize", content_hash); key[0] names the operation
+        user_id: User the work is queued for
+        func: Async function performing the whole operation
+        *args: Arguments for func
+        background: Queue below interactive requests (precompute)
+        
+    Returns:
+        Awaitable result of the shared operation
+    """
+    ai_queue = get_queue_manager()
+    if not background:
+        ai_queue.promote(key)
+    
+    return get_single_flight().do(
+        key, ai_queue.run, user_id, run_with_deadline, key[0], func, *args,
+        queue_key=key, background=background
+    )
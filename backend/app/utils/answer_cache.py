@@ -0,0 +1,231 @@
+"""
+Per-document answer cache for /content/{id}/ask.
+Students keep asking the same things about the same handout, often reworded.
+A rephrased question only counts as a repeat if it has exactly the same
+content words (everything but filler like "what", "the", "please") in
+nearly the same order, compared with word-bigram Jaccard similarity. So
+"What are the main topics?" / "main topics please" share an answer, while
+"advantages" / "disadvantages", "TCP" / "UDP", "chapter one" / "chapter two"
+and "is" / "isn't" never do: a wrong cached answer is worse than an AI call.
+"""
+
+import copy
+import re
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from app.core.config import settings
+from app.utils.quiz_bank import normalize_question
+
+
+# Words that don't change what a question asks about. Negations, numbers
+# and number words are deliberately absent: they always have to match.
+FILLER_WORDS = frozenset("""
+    a an the this that these those of in on at to for from by with about as and or
+    what which who whom whose when where why how is are was were be been being
+    do does did can could would should will shall may might must
+    i me my we our you your it its they their there here
+    please kindly tell explain describe give list show briefly quickly
+    document handout text pdf file covered discussed mentioned
+""".split())
+
+# Negations; contractions arrive from normalize_question as "doesn t", "can t"
+NEGATION_WORDS = frozenset(["not", "no", "never", "none", "nor", "without", "cannot", "nothing", "neither"])
+CONTRACTED_NEGATION = re.compile(r"\b(?:can|won|\w+n) t\b")
+
+
+def content_words(normalized: str) -> Tuple[str, ...]:
+    """
+    Get the words of a normalized question that decide what it asks.
+    
+    Args:
+        normalized: Normalized question text
+        
+    Returns:
+        Tuple[str, ...]: Non-filler words in order, every negation as "not"
+    """
+    text = CONTRACTED_NEGATION.sub("not", normalized)
+    return tuple(
+        "not" if word in NEGATION_WORDS else word
+        for word in text.split()
+        if word not in FILLER_WORDS
+    )
+
+
+def word_shingles(words: Tuple[str, ...]) -> frozenset:
+    """Word bigrams of a question's content words (the word itself for one-word questions)."""
+    if len(words) < 2:
+        return frozenset(words)
+    return frozenset(zip(words, words[1:]))
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    """Jaccard similarity of two shingle sets."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class AnswerCache:
+    """
+    In-process answer cache with TTL and size-bounded LRU eviction,
+    both per document and across documents.
+    """
+    
+    def __init__(
+        self,
+        ttl_seconds: int = 3600,
+        max_documents: int = 500,
+        max_entries_per_document: int = 100,
+        similarity_threshold: float = 0.8
+    ):
+        """
+        Initialize the cache.
+        
+        Args:
+            ttl_seconds: How long an answer stays valid
+            max_documents: Maximum number of documents with cached answers
+            max_entries_per_document: Maximum cached answers per document
+            similarity_threshold: Minimum word-bigram Jaccard similarity for a rephrased
+                repeat (content words must match exactly regardless)
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_documents = max_documents
+        self.max_entries_per_document = max_entries_per_document
+        self.similarity_threshold = similarity_threshold
+        
+        # doc_key -> (normalized question -> entry)
+        self._documents: "OrderedDict[str, OrderedDict[str, dict]]" = OrderedDict()
+        
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def _purge_expired(self, entries: "OrderedDict[str, dict]", now: float):
+        """Drop expired answers for one document."""
+        expired = [key for key, entry in entries.items() if entry["expires_at"] <= now]
+        for key in expired:
+            del entries[key]
+            self.evictions += 1
+    
+    def get(self, doc_key: str, question: str) -> Optional[dict]:
+        """
+        Look up a cached answer for a question or a near-duplicate of it.
+        
+        Args:
+            doc_key: Document key (file SHA-256)
+            question: Question as asked by the user
+            
+        Returns:
+            Optional[dict]: Cached AI response or None on miss
+        """
+        entries = self._documents.get(doc_key)
+        if entries is None:
+            self.misses += 1
+            return None
+        
+        self._documents.move_to_end(doc_key)
+        self._purge_expired(entries, time.monotonic())
+        
+        normalized = normalize_question(question)
+        
+        # Fast path: exact match on normalized text
+        entry = entries.get(normalized)
+        if entry is not None:
+            entries.move_to_end(normalized)
+            self.hits += 1
+            return copy.deepcopy(entry["answer"])
+        
+        # Rephrased repeat: same content words, best word-bigram match above the threshold
+        words = content_words(normalized)
+        question_words = frozenset(words)
+        question_shingles = word_shingles(words)
+        best_key, best_score = None, 0.0
+        for key, candidate in entries.items():
+            if not question_words or candidate["words"] != question_words:
+                continue
+            score = jaccard(question_shingles, candidate["shingles"])
+            if score > best_score:
+                best_key, best_score = key, score
+        
+        if best_key is not None and best_score >= self.similarity_threshold:
+            entries.move_to_end(best_key)
+            self.near_hits += 1
+            return copy.deepcopy(entries[best_key]["answer"])
+        
+        self.misses += 1
+        return None
+    
+    def put(self, doc_key: str, question: str, answer: dict):
+        """
+        Cache an answer for a question.
+        
+        Args:
+            doc_key: Document key (file SHA-256)
+            question: Question as asked by the user
+            answer: AI service response to cache
+        """
+        normalized = normalize_question(question)
+        if not normalized:
+            return
+        
+        entries = self._documents.setdefault(doc_key, OrderedDict())
+        self._documents.move_to_end(doc_key)
+        
+        words = content_words(normalized)
+        entries[normalized] = {
+            "words": frozenset(words),
+            "shingles": word_shingles(words),
+            "answer": copy.deepcopy(answer),
+            "expires_at": time.monotonic() + self.ttl_seconds
+        }
+        entries.move_to_end(normalized)
+        
+        while len(entries) > self.max_entries_per_document:
+            entries.popitem(last=False)
+            self.evictions += 1
+        
+        while len(self._documents) > self.max_documents:
+            _, dropped = self._documents.popitem(last=False)
+            self.evictions += len(dropped)
+    
+    def invalidate(self, doc_key: str):
+        """Drop all cached answers for a document."""
+        self._documents.pop(doc_key, None)
+    
+    def stats(self) -> dict:
+        """
+        Get cache counters.
+        
+        Returns:
+            dict: Hit/miss counters and current size
+        """
+        lookups = self.hits + self.near_hits + self.misses
+        return {
+            "hits": self.hits,
+            "near_duplicate_hits": self.near_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.near_hits) / lookups, 3) if lookups else 0.0,
+            "documents": len(self._documents),
+            "entries": sum(len(entries) for entries in self._documents.values())
+        }
+
+
+# Global answer cache instance
+_answer_cache: Optional[AnswerCache] = None
+
+
+def get_answer_cache() -> AnswerCache:
+    """Get the global answer cache instance."""
+    global _answer_cache
+    if _answer_cache is None:
+        _answer_cache = AnswerCache(
+            ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+            max_documents=settings.ANSWER_CACHE_MAX_DOCUMENTS,
+            max_entries_per_document=settings.ANSWER_CACHE_MAX_ENTRIES_PER_DOCUMENT,
+            similarity_threshold=settings.ANSWER_CACHE_SIMILARITY
+        )
+    return _answer_cache
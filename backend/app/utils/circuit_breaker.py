@@ -0,0 +1,182 @@
+"""
+Circuit breakers for Kalash's AI service (one per backend instance).
+When a backend's ngrok tunnel is down, requests fail fast with 503 + Retry-After
+instead of each one burning through connection retries and backoff.
+Fed by every gateway call and by the background health poller.
+"""
+
+import logging
+import math
+import time
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Breaker states
+STATE_CLOSED = "closed"  # Upstream healthy, calls pass through
+STATE_OPEN = "open"  # Upstream known dead, calls fail fast
+STATE_HALF_OPEN = "half_open"  # Recovery timeout elapsed, one trial call allowed
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open breaker around the AI service.
+    Opens after consecutive failures (connection errors, timeouts, tunnel
+    error pages, slow health probes) and lets a single trial call through
+    once the recovery timeout has elapsed.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        recovery_timeout: float = 30.0,
+        slow_call_threshold: float = 5.0
+    ):
+        """
+        Initialize the breaker.
+
+        Args:
+            failure_threshold: Consecutive failures that open the circuit
+            recovery_timeout: Seconds to stay open before allowing a trial call
+            slow_call_threshold: Health probes slower than this count as failures
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.slow_call_threshold = slow_call_threshold
+
+        self._state = STATE_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_started_at: Optional[float] = None
+        self._last_error: Optional[str] = None
+
+        # Result of the latest health probe (served by GET /health)
+        self.last_probe: Optional[dict] = None
+
+    @property
+    def state(self) -> str:
+        """Current state (open turns half-open once the recovery timeout elapses)."""
+        if self._state == STATE_OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = STATE_HALF_OPEN
+            self._trial_started_at = None
+            logger.info("AI circuit half-open: allowing a trial call")
+        return self._state
+
+    def retry_after(self) -> int:
+        """Seconds until the circuit will let a call through again."""
+        remaining = self.recovery_timeout - (time.monotonic() - self._opened_at)
+        return max(1, math.ceil(remaining))
+
+    def _open(self, reason: str):
+        """Trip the circuit."""
+        if self._state != STATE_OPEN:
+            logger.warning(f"AI circuit open: {reason}")
+        self._state = STATE_OPEN
+        self._opened_at = time.monotonic()
+        self._trial_started_at = None
+
+    def allows_call(self) -> bool:
+        """Check whether a call would be let through right now (without claiming the half-open trial)."""
+        state = self.state
+
+        if state == STATE_CLOSED:
+            return True
+
+        # Half-open: one trial at a time (a trial that never reports expires after the recovery timeout)
+        return state == STATE_HALF_OPEN and (
+            self._trial_started_at is None or time.monotonic() - self._trial_started_at >= self.recovery_timeout
+        )
+
+    def before_call(self):
+        """
+        Check that a call to the AI service may proceed.
+
+        Raises:
+            HTTPException: 503 with Retry-After while the circuit is open
+        """
+        if self.allows_call():
+            if self._state == STATE_HALF_OPEN:
+                self._trial_started_at = time.monotonic()
+            return
+
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"AI service is currently unavailable ({self._last_error or 'upstream not responding'}). Please try again later.",
+            headers={"Retry-After": str(self.retry_after())}
+        )
+
+    def record_success(self):
+        """Record a call that reached a healthy AI service."""
+        if self._state != STATE_CLOSED:
+            logger.info("AI circuit closed: upstream recovered")
+        self._state = STATE_CLOSED
+        self._failures = 0
+        self._trial_started_at = None
+
+    def record_failure(self, reason: str):
+        """
+        Record a call that failed because the AI service is unreachable.
+
+        Args:
+            reason: Short description of the failure
+        """
+        self._last_error = reason
+        self._failures += 1
+
+        if self._state == STATE_HALF_OPEN or self._failures >= self.failure_threshold:
+            self._open(reason)
+
+    def record_probe(self, online: bool, latency: Optional[float], error: Optional[str] = None):
+        """
+        Record a health probe. A failed or slow probe opens the circuit right
+        away (the probe is authoritative); a healthy one closes it.
+
+        Args:
+            online: Whether the AI service answered its /health endpoint
+            latency: Probe round-trip time in seconds (None if it failed)
+            error: Failure description if the probe failed
+        """
+        slow = latency is not None and latency > self.slow_call_threshold
+        if online and slow:
+            error = f"health probe took {latency:.1f}s"
+
+        self.last_probe = {
+            "online": online and not slow,
+            "latency_ms": round(latency * 1000) if latency is not None else None,
+            "checked_at": datetime.utcnow(),
+            "error": error
+        }
+
+        if online and not slow:
+            self.record_success()
+        else:
+            self._last_error = error
+            self._failures = max(self._failures + 1, self.failure_threshold)
+            self._open(error or "health probe failed")
+
+    def snapshot(self) -> dict:
+        """Get the breaker state for diagnostics."""
+        state = self.state
+        data = {
+            "state": state,
+            "consecutive_failures": self._failures,
+            "last_error": self._last_error
+        }
+        if state == STATE_OPEN:
+            data["retry_after"] = self.retry_after()
+        return data
+
+
+def create_circuit_breaker() -> CircuitBreaker:
+    """Create a circuit breaker for one AI backend, configured from settings."""
+    return CircuitBreaker(
+        failure_threshold=settings.AI_BREAKER_FAILURE_THRESHOLD,
+        recovery_timeout=settings.AI_BREAKER_RECOVERY_SECONDS,
+        slow_call_threshold=settings.AI_BREAKER_SLOW_CALL_SECONDS
+    )
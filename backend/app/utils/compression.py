@@ -0,0 +1,151 @@
+"""
+Content-encoding helpers shared by the compression middleware and the summary store.
+gzip is always available; brotli is used when the optional 'brotli' package is installed.
+"""
+
+import gzip
+import io
+from typing import Dict, Optional
+
+from app.core.config import settings
+
+try:
+    import brotli
+except ImportError:  # Optional dependency
+    brotli = None
+
+
+# Encodings in server preference order (smallest output first)
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+# Content types worth compressing (images, PDFs and archives are already compressed)
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "text/",
+)
+
+
+def is_compressible(content_type: str) -> bool:
+    """Check whether a response content type benefits from compression (SSE excluded: it must flush per event)."""
+    content_type = content_type.lower()
+    if content_type.startswith("text/event-stream"):
+        return False
+    return any(content_type.startswith(prefix) for prefix in COMPRESSIBLE_TYPES)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Pick the response encoding from an Accept-Encoding header.
+
+    Args:
+        accept_encoding: Accept-Encoding request header (may be empty)
+
+    Returns:
+        Optional[str]: "br" or "gzip", or None to send the body uncompressed
+    """
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name:
+            accepted[name] = quality
+
+    wildcard = accepted.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        quality = accepted.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    """
+    Compress a whole body.
+
+    Args:
+        body: Uncompressed bytes
+        encoding: "br" or "gzip"
+        level: Compression level (defaults to the dynamic-response setting)
+
+    Returns:
+        bytes: Encoded body
+    """
+    if encoding == "br":
+        quality = settings.COMPRESSION_BROTLI_QUALITY if level is None else level
+        return brotli.compress(body, quality=quality)
+    if encoding == "gzip":
+        compresslevel = settings.COMPRESSION_GZIP_LEVEL if level is None else level
+        return gzip.compress(body, compresslevel=compresslevel, mtime=0)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+# Levels for payloads compressed once and served many times (stored summaries)
+MAX_LEVELS = {"br": 11, "gzip": 9}
+
+
+def compress_all(body: bytes) -> Dict[str, bytes]:
+    """
+    Encode a body once in every supported encoding at the highest level
+    (for payloads stored and served many times).
+
+    Args:
+        body: Uncompressed bytes
+
+    Returns:
+        Dict[str, bytes]: Encoding name -> encoded body
+    """
+    return {encoding: compress(body, encoding, MAX_LEVELS[encoding]) for encoding in SUPPORTED_ENCODINGS}
+
+
+class StreamCompressor:
+    """Incremental compressor for bodies sent in several ASGI messages."""
+
+    def __init__(self, encoding: str):
+        """
+        Args:
+            encoding: "br" or "gzip"
+        """
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+        else:
+            self._buffer = io.BytesIO()
+            self._compressor = gzip.GzipFile(
+                mode="wb", fileobj=self._buffer,
+                compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0
+            )
+
+    def feed(self, data: bytes, final: bool = False) -> bytes:
+        """
+        Compress the next part of the body.
+
+        Args:
+            data: Next uncompressed bytes
+            final: Whether this is the last part
+
+        Returns:
+            bytes: Encoded bytes ready to send
+        """
+        if self.encoding == "br":
+            out = self._compressor.process(data)
+            return out + (self._compressor.finish() if final else self._compressor.flush())
+
+        self._compressor.write(data)
+        if final:
+            self._compressor.close()
+        else:
+            self._compressor.flush()
+        out = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return out
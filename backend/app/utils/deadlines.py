@@ -0,0 +1,146 @@
+"""
+Deadline budgets and client-disconnect cancellation for AI operations.
+A budget covers the whole operation (document upload, AI compute and
+retries together), so a dead or stalled upstream cannot hold a request,
+a scheduler slot and a pooled connection open indefinitely.
+"""
+
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+from fastapi import HTTPException, Request, status
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Seconds between client connection checks
+DISCONNECT_POLL_INTERVAL = 1.0
+
+# Non-standard status (nginx convention) for requests abandoned by the client
+CLIENT_CLOSED_REQUEST = 499
+
+
+def deadline_for(operation: str) -> Optional[float]:
+    """
+    Get the deadline budget for an AI operation.
+
+    Args:
+        operation: Operation name (summarize, quiz, ask, youtube)
+
+    Returns:
+        Optional[float]: Budget in seconds, or None for no limit
+    """
+    budgets = {
+        "summarize": settings.AI_DEADLINE_SUMMARIZE,
+        "quiz": settings.AI_DEADLINE_QUIZ,
+        "ask": settings.AI_DEADLINE_ASK,
+        "youtube": settings.AI_DEADLINE_YOUTUBE,
+    }
+    budget = budgets.get(operation)
+    return budget if budget and budget > 0 else None
+
+
+def deadline_exceeded(operation: str, budget: float) -> HTTPException:
+    """Build the 504 raised when an operation runs out of budget."""
+    return HTTPException(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        detail=f"AI service did not finish the {operation} request within {budget:g} seconds. Please try again later."
+    )
+
+
+async def run_with_deadline(operation: str, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+    """
+    Run an AI operation within its deadline budget, cancelling it when the budget runs out.
+
+    Args:
+        operation: Operation name used to pick the budget
+        func: Async function performing the whole operation
+        *args: Positional arguments for func
+        **kwargs: Keyword arguments for func
+
+    Returns:
+        Result of func
+
+    Raises:
+        HTTPException: 504 if the budget is exceeded
+    """
+    budget = deadline_for(operation)
+
+    try:
+        return await asyncio.wait_for(func(*args, **kwargs), timeout=budget)
+    except asyncio.TimeoutError:
+        logger.warning(f"AI {operation} exceeded its {budget}s deadline")
+        raise deadline_exceeded(operation, budget)
+
+
+async def stream_with_deadline(operation: str, chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    """
+    Relay a streamed AI response, cancelling it when the operation's budget runs out.
+
+    Args:
+        operation: Operation name used to pick the budget
+        chunks: Async generator of text chunks
+
+    Yields:
+        str: Text chunks in arrival order
+
+    Raises:
+        HTTPException: 504 if the budget is exceeded
+    """
+    budget = deadline_for(operation)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + budget if budget else None
+
+    try:
+        while True:
+            remaining = None if deadline is None else max(deadline - loop.time(), 0)
+            try:
+                chunk = await asyncio.wait_for(chunks.__anext__(), timeout=remaining)
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError:
+                logger.warning(f"AI {operation} stream exceeded its {budget}s deadline")
+                raise deadline_exceeded(operation, budget)
+            yield chunk
+    finally:
+        await chunks.aclose()
+
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable[Any]) -> Any:
+    """
+    Await an upstream call, cancelling it if the client disconnects first.
+    Work shared through single-flight is shielded there, so cancelling one
+    waiter leaves it running for the cache; only this caller stops waiting.
+
+    Args:
+        request: Incoming request whose connection is watched
+        awaitable: Upstream call (coroutine or future)
+
+    Returns:
+        Result of the upstream call
+
+    Raises:
+        HTTPException: 499 if the client went away (nobody receives it)
+    """
+    task = asyncio.ensure_future(awaitable)
+
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+
+            if await request.is_disconnected():
+                logger.info(f"Client disconnected from {request.url.path}, cancelling upstream call")
+                task.cancel()
+                raise HTTPException(
+                    status_code=CLIENT_CLOSED_REQUEST,
+                    detail="Client closed request"
+                )
+    finally:
+        # Also covers this handler itself being cancelled
+        if not task.done():
+            task.cancel()
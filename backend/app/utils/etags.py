@@ -0,0 +1,78 @@
+"""
+Weak ETags for per-user read endpoints.
+Each user document carries a 'data_version' counter that is bumped whenever
+something those endpoints return changes (upload, delete, quiz save, profile
+or preference update). The counter arrives with the user document that
+authentication already loads, so a matching If-None-Match is answered with
+304 without querying MongoDB for the listing itself.
+"""
+
+from fastapi import Request, Response, status
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.db.database import get_user_collection
+
+
+# Browsers must revalidate (If-None-Match) before reusing a cached copy
+CACHE_CONTROL = "private, no-cache"
+
+
+async def bump_data_version(db: AsyncIOMotorDatabase, user_id) -> None:
+    """
+    Invalidate the user's ETags after a change to their data.
+
+    Args:
+        db: Database instance
+        user_id: User _id (ObjectId)
+    """
+    await get_user_collection(db).update_one({"_id": user_id}, {"$inc": {"data_version": 1}})
+
+
+def user_etag(current_user: dict, resource: str) -> str:
+    """
+    Build the weak ETag for one of the user's resources.
+    Includes the user id so a browser shared between accounts never gets a false 304.
+
+    Args:
+        current_user: Authenticated user document
+        resource: Resource name (e.g. "content", "quiz-results", "me")
+
+    Returns:
+        str: Weak ETag header value
+    """
+    return f'W/"{resource}-{current_user["_id"]}-{current_user.get("data_version", 0)}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Check If-None-Match against an ETag (weak comparison).
+
+    Args:
+        request: Incoming request
+        etag: Current ETag of the resource
+
+    Returns:
+        bool: True if the client's cached copy is current
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    """Build the 304 response for a matching If-None-Match."""
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    )
+
+
+def set_etag(response: Response, etag: str) -> None:
+    """Attach the ETag and revalidation policy to a 200 response."""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
@@ -1,16 +1,66 @@
 """
 Thread-safe file manager for handling concurrent file operations.
-Prevents race conditions when multiple users upload/delete files simultaneously.
+Prevents race conditions when multiple users upload/delete files simultaneously
+(across worker processes too with FILE_LOCK_MODE=file, see app.utils.keyed_lock).
+
+Uploads are stored content-addressed: one blob per distinct file under the
+storage key blobs/<sha256>, with the content documents referencing it
+recorded in the 'blobs' collection. Identical uploads share one blob, which
+is deleted when its last reference goes. Blobs live in a storage backend
+(app.utils.storage: sharded local directory or S3-compatible bucket); files
+uploaded before deduplication remain at <upload_directory>/<content_id> and
+are still found and deleted.
+
+Uploads are written to a local temporary file (hashed as they arrive) and
+then handed to the backend: with local storage that is a rename, or a kernel
+copy (copy_file_range/sendfile) when the staging directory is on another
+file system. Every upload path (streamed, spooled UploadFile, resumable)
+ends in the same _add_blob_reference.
 """
 
 import os
+import re
 import asyncio
 import aiofiles
+import aiofiles.os
 import hashlib
 from pathlib import Path
-from typing import Optional
-from fastapi import UploadFile
+from typing import AsyncIterator, Optional, Tuple, Union
+from fastapi import HTTPException, UploadFile, status
 from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.db.database import get_blobs_collection
+from app.utils.keyed_lock import FileKeyedLock, KeyedLock, create_keyed_lock
+from app.utils.storage import (
+    COPY_CHUNK_SIZE,
+    READ_CHUNK_SIZE,
+    LocalStorage,
+    StorageBackend,
+    create_storage_backend,
+)
+
+
+# Blob names are hex SHA-256 digests
+BLOB_NAME_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+def hash_fd(fd: int) -> tuple[int, str]:
+    """
+    Size and SHA-256 of an open file, read by offset from the start.
+    
+    Args:
+        fd: File descriptor
+        
+    Returns:
+        tuple[int, str]: (size, hex SHA-256)
+    """
+    sha256_hash = hashlib.sha256()
+    offset = 0
+    while data := os.pread(fd, COPY_CHUNK_SIZE, offset):
+        sha256_hash.update(data)
+        offset += len(data)
+    return offset, sha256_hash.hexdigest()
 
 
 class FileManager:
@@ -19,35 +69,38 @@ class FileManager:
     Ensures data safety during concurrent multi-user access.
     """
     
-    def __init__(self, upload_directory: str):
+    def __init__(
+        self,
+        upload_directory: str,
+        temp_directory: Optional[str] = None,
+        storage: Optional[StorageBackend] = None,
+        locks: Optional[Union[KeyedLock, FileKeyedLock]] = None
+    ):
         """
         Initialize file manager with upload directory.
         
         Args:
             upload_directory: Base directory for file uploads
+            temp_directory: Where uploads are written before they are complete
+                (default: the upload directory, so finishing is a rename)
+            storage: Where blobs are stored (default: sharded local storage
+                in the upload directory)
+            locks: Per-file lock table (default: in-process asyncio locks;
+                FileKeyedLock when several worker processes share the files)
         """
         self.upload_directory = Path(upload_directory)
         self.upload_directory.mkdir(parents=True, exist_ok=True)
+        self.storage = storage or LocalStorage(upload_directory)
+        # Per-content files from before deduplication (flat, always local)
+        self.legacy_storage = LocalStorage(upload_directory, shard_depth=0)
+        self.temp_directory = Path(temp_directory) if temp_directory else self.upload_directory
+        self.temp_directory.mkdir(parents=True, exist_ok=True)
+        self.partial_directory = self.temp_directory / "partial"
+        self.partial_directory.mkdir(exist_ok=True)
         
-        # Lock for each file (identified by content_id)
-        self._file_locks = {}
-        self._locks_lock = asyncio.Lock()  # Lock for the locks dict itself
-    
-    
-    async def _get_file_lock(self, file_id: str) -> asyncio.Lock:
-        """
-        Get or create a lock for a specific file.
-        
-        Args:
-            file_id: Unique identifier for the file
-            
-        Returns:
-            asyncio.Lock: Lock object for the file
-        """
-        async with self._locks_lock:
-            if file_id not in self._file_locks:
-                self._file_locks[file_id] = asyncio.Lock()
-            return self._file_locks[file_id]
+        # Lock for each file (identified by content_id, or by SHA-256 for blobs),
+        # kept only while held or awaited
+        self._locks = locks if locks is not None else KeyedLock()
     
     
     def _sanitize_filename(self, filename: str) -> str:
@@ -71,66 +124,191 @@ class FileManager:
         return filename
     
     
-    def get_file_path(self, content_id: str) -> Path:
+    def get_legacy_key(self, content_id: str) -> str:
         """
-        Get the full path for a file.
+        Get the key of a file stored before deduplication (per content ID,
+        directly in the upload directory).
         
         Args:
             content_id: Content ID (used as filename)
             
         Returns:
-            Path: Full file path
+            str: Key in legacy_storage
         """
         # Validate content_id to prevent path traversal
         if '..' in content_id or '/' in content_id or '\\' in content_id:
             raise ValueError("Invalid content_id: contains path traversal characters")
         
-        return self.upload_directory / content_id
+        return content_id
     
     
-    async def save_upload_file(
+    def get_blob_key(self, content_hash: str) -> str:
+        """
+        Get the storage key of a content-addressed blob.
+        
+        Args:
+            content_hash: Hex SHA-256 of the file
+            
+        Returns:
+            str: Blob key
+        """
+        if not BLOB_NAME_PATTERN.match(content_hash):
+            raise ValueError("Invalid content_hash: not a hex SHA-256 digest")
+        
+        return f"blobs/{content_hash}"
+    
+    
+    async def _locate(
         self,
-        file: UploadFile,
-        content_id: str
-    ) -> tuple[str, int]:
+        content_id: str,
+        content_hash: Optional[str] = None
+    ) -> Optional[Tuple[StorageBackend, str, int]]:
         """
-        Safely save an uploaded file with locking.
+        Find where a document's bytes are: its blob, or the per-content
+        file of an upload stored before deduplication.
         
         Args:
-            file: Uploaded file object
-            content_id: Unique content ID for the file
+            content_id: Content ID
+            content_hash: Hex SHA-256 of the file, if known
             
         Returns:
-            tuple[str, int]: (file_path, file_size)
+            Optional[Tuple[StorageBackend, str, int]]: (storage, key, size) or None if neither exists
+        """
+        candidates = [(self.storage, self.get_blob_key(content_hash))] if content_hash else []
+        candidates.append((self.legacy_storage, self.get_legacy_key(content_id)))
+        
+        for storage, key in candidates:
+            size = await storage.size(key)
+            if size is not None:
+                return storage, key, size
+        return None
+    
+    
+    async def read_file(
+        self,
+        content_id: str,
+        content_hash: Optional[str] = None,
+        chunk_size: int = READ_CHUNK_SIZE
+    ) -> AsyncIterator[bytes]:
+        """
+        Stream a document's file from storage.
+        
+        Args:
+            content_id: Content ID
+            content_hash: Hex SHA-256 of the file, if known
+            chunk_size: Bytes per chunk
+            
+        Yields:
+            bytes: File contents in order
             
         Raises:
-            Exception: If file save fails
+            FileNotFoundError: If the document has no stored file
+        """
+        located = await self._locate(content_id, content_hash)
+        if located is None:
+            raise FileNotFoundError(content_id)
+        
+        storage, key, _ = located
+        async for chunk in storage.read(key, chunk_size):
+            yield chunk
+    
+    
+    async def _add_blob_reference(
+        self,
+        db: AsyncIOMotorDatabase,
+        content_id: str,
+        content_hash: str,
+        temp_path: Path,
+        file_size: int
+    ) -> str:
+        """
+        Record content_id as a reference to the blob and hand the freshly
+        written file to storage, or discard it if an identical blob exists.
+        
+        Args:
+            db: Database instance
+            content_id: Content ID referencing the blob
+            content_hash: Hex SHA-256 of the file
+            temp_path: Fully written temporary file
+            file_size: File size in bytes
+            
+        Returns:
+            str: Blob key
+        """
+        blobs = get_blobs_collection(db)
+        
+        async with self._locks.acquire(content_hash):
+            blob_key = self.get_blob_key(content_hash)
+            
+            await blobs.update_one(
+                {"_id": content_hash},
+                {
+                    "$addToSet": {"refs": content_id},
+                    "$setOnInsert": {"size": file_size, "created_at": datetime.utcnow()}
+                },
+                upsert=True
+            )
+            
+            try:
+                if await self.storage.exists(blob_key):
+                    # Identical file already stored: keep one copy
+                    temp_path.unlink()
+                else:
+                    await self.storage.put_file(blob_key, temp_path, file_size)
+            except Exception:
+                await blobs.update_one({"_id": content_hash}, {"$pull": {"refs": content_id}})
+                raise
+        
+        return blob_key
+    
+    
+    async def save_upload_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        content_id: str,
+        db: AsyncIOMotorDatabase
+    ) -> tuple[str, int, str]:
         """
-        file_lock = await self._get_file_lock(content_id)
+        Safely save a file from a stream of chunks with locking, in one pass:
+        each chunk is hashed (SHA-256) and written as it arrives, then the file
+        is moved into its blob (or dropped if an identical blob exists).
         
-        async with file_lock:
-            file_path = self.get_file_path(content_id)
+        Args:
+            chunks: File bytes (may raise HTTPException to reject the upload mid-stream)
+            content_id: Unique content ID for the file
+            db: Database instance (blob references)
             
-            # Ensure file doesn't already exist
-            if file_path.exists():
-                raise FileExistsError(f"File {content_id} already exists")
+        Returns:
+            tuple[str, int, str]: (blob_key, file_size, content_hash)
             
+        Raises:
+            HTTPException: If the stream rejected the upload
+            Exception: If file save fails
+        """
+        async with self._locks.acquire(content_id):
             # Write file atomically using temporary file
-            temp_path = file_path.with_suffix('.tmp')
+            temp_path = self.temp_directory / f"{content_id}.tmp"
             file_size = 0
+            sha256_hash = hashlib.sha256()
             
             try:
-                # Read and write in chunks to handle large files
+                # Writes run in the thread pool, not on the event loop
                 async with aiofiles.open(temp_path, 'wb') as f:
-                    while chunk := await file.read(1024 * 1024):  # 1MB chunks
+                    async for chunk in chunks:
                         await f.write(chunk)
+                        sha256_hash.update(chunk)
                         file_size += len(chunk)
                 
-                # Atomic rename (replaces if exists on most systems)
-                temp_path.rename(file_path)
+                content_hash = sha256_hash.hexdigest()
+                blob_key = await self._add_blob_reference(db, content_id, content_hash, temp_path, file_size)
                 
-                return str(file_path), file_size
+                return blob_key, file_size, content_hash
                 
+            except HTTPException:
+                # Rejected while streaming (too large, wrong file type)
+                if temp_path.exists():
+                    temp_path.unlink()
+                raise
             except Exception as e:
                 # Cleanup on failure
                 if temp_path.exists():
@@ -138,114 +316,314 @@ class FileManager:
                 raise Exception(f"Failed to save file: {str(e)}")
     
     
+    async def save_upload_file(
+        self,
+        file: UploadFile,
+        content_id: str,
+        db: AsyncIOMotorDatabase
+    ) -> tuple[str, int, str]:
+        """
+        Safely save an uploaded file with locking (a spooled UploadFile read
+        back through save_upload_stream).
+        
+        Args:
+            file: Uploaded file object
+            content_id: Unique content ID for the file
+            db: Database instance (blob references)
+            
+        Returns:
+            tuple[str, int, str]: (blob_key, file_size, content_hash)
+        """
+        async def read_chunks():
+            # Reset file pointer, then read in 1MB chunks to handle large files
+            await file.seek(0)
+            while chunk := await file.read(1024 * 1024):
+                yield chunk
+        
+        return await self.save_upload_stream(read_chunks(), content_id, db)
+    
+    
     async def save_upload_file_sync(
         self,
         file: UploadFile,
-        content_id: str
-    ) -> tuple[str, int]:
+        content_id: str,
+        db: AsyncIOMotorDatabase
+    ) -> tuple[str, int, str]:
         """
-        Save uploaded file using synchronous operations (for compatibility).
-        Still uses locking for safety.
+        Save uploaded file (kept for compatibility; same as save_upload_file).
         
         Args:
             file: Uploaded file object
             content_id: Unique content ID
+            db: Database instance (blob references)
             
         Returns:
-            tuple[str, int]: (file_path, file_size)
+            tuple[str, int, str]: (blob_key, file_size, content_hash)
+        """
+        return await self.save_upload_file(file, content_id, db)
+    
+    
+    def get_partial_path(self, upload_id: str) -> Path:
         """
-        file_lock = await self._get_file_lock(content_id)
+        Get the temporary file of a resumable upload.
         
-        async with file_lock:
-            file_path = self.get_file_path(content_id)
+        Args:
+            upload_id: Resumable upload ID
             
-            if file_path.exists():
-                raise FileExistsError(f"File {content_id} already exists")
+        Returns:
+            Path: Partial file path
+        """
+        if '..' in upload_id or '/' in upload_id or '\\' in upload_id:
+            raise ValueError("Invalid upload_id: contains path traversal characters")
+        
+        return self.partial_directory / f"{upload_id}.part"
+    
+    
+    async def create_partial(self, upload_id: str):
+        """
+        Create the empty temporary file of a resumable upload.
+        
+        Args:
+            upload_id: Resumable upload ID
+        """
+        async with aiofiles.open(self.get_partial_path(upload_id), 'xb'):
+            pass
+    
+    
+    async def get_partial_size(self, upload_id: str) -> Optional[int]:
+        """
+        Get the bytes received so far by a resumable upload (its current offset).
+        
+        Args:
+            upload_id: Resumable upload ID
             
-            temp_path = file_path.with_suffix('.tmp')
-            file_size = 0
+        Returns:
+            Optional[int]: Offset or None if the upload doesn't exist
+        """
+        try:
+            stat_result = await aiofiles.os.stat(self.get_partial_path(upload_id))
+        except FileNotFoundError:
+            return None
+        
+        return stat_result.st_size
+    
+    
+    async def append_partial(self, upload_id: str, offset: int, chunks: AsyncIterator[bytes]) -> int:
+        """
+        Append a chunk of a resumable upload at the given offset.
+        Bytes are written as they arrive, so a connection dropped mid-chunk
+        keeps everything received before it.
+        
+        Args:
+            upload_id: Resumable upload ID
+            offset: Offset the client is writing at (must equal the bytes received so far)
+            chunks: Chunk bytes (may raise HTTPException to stop the append)
             
-            try:
-                with open(temp_path, 'wb') as f:
-                    # Reset file pointer
-                    await file.seek(0)
-                    
-                    # Read in chunks
-                    while chunk := await file.read(1024 * 1024):
-                        f.write(chunk)
-                        file_size += len(chunk)
-                
-                # Atomic rename
-                os.replace(str(temp_path), str(file_path))
-                
-                return str(file_path), file_size
-                
-            except Exception as e:
-                if temp_path.exists():
-                    temp_path.unlink()
-                raise Exception(f"Failed to save file: {str(e)}")
+        Returns:
+            int: New offset
+            
+        Raises:
+            HTTPException: 404 if the upload doesn't exist, 409 (with the current
+            Upload-Offset) if offset doesn't match
+        """
+        async with self._locks.acquire(upload_id):
+            current = await self.get_partial_size(upload_id)
+            if current is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Upload not found"
+                )
+            if current != offset:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"Upload-Offset {offset} does not match the {current} bytes received",
+                    headers={"Upload-Offset": str(current)}
+                )
+            
+            async with aiofiles.open(self.get_partial_path(upload_id), 'ab') as f:
+                async for chunk in chunks:
+                    await f.write(chunk)
+                    offset += len(chunk)
+            
+            return offset
     
     
-    async def delete_file(self, content_id: str) -> bool:
+    async def read_partial_head(self, upload_id: str, size: int) -> bytes:
         """
-        Safely delete a file with locking.
+        Read the first bytes of a resumable upload (file type check).
         
         Args:
-            content_id: Content ID
+            upload_id: Resumable upload ID
+            size: Bytes to read
             
         Returns:
-            bool: True if deleted, False if file didn't exist
+            bytes: Up to size bytes from the start of the file
+        """
+        async with aiofiles.open(self.get_partial_path(upload_id), 'rb') as f:
+            return await f.read(size)
+    
+    
+    async def finalize_partial(
+        self,
+        upload_id: str,
+        db: AsyncIOMotorDatabase,
+        expected_hash: Optional[str] = None
+    ) -> tuple[str, int, str]:
         """
-        file_lock = await self._get_file_lock(content_id)
+        Turn a completed resumable upload into stored content: hash it and move
+        it into its blob (or drop it if an identical blob exists), with upload_id
+        as the content ID referencing the blob.
         
-        async with file_lock:
-            file_path = self.get_file_path(content_id)
+        Args:
+            upload_id: Resumable upload ID (becomes the content ID)
+            db: Database instance (blob references)
+            expected_hash: SHA-256 the client declared, checked before storing
             
-            if not file_path.exists():
-                return False
+        Returns:
+            tuple[str, int, str]: (blob_key, file_size, content_hash)
+            
+        Raises:
+            HTTPException: 400 if the file doesn't match expected_hash
+        """
+        async with self._locks.acquire(upload_id):
+            partial_path = self.get_partial_path(upload_id)
             
+            def hash_partial() -> tuple[int, str]:
+                with open(partial_path, 'rb') as f:
+                    return hash_fd(f.fileno())
+            
+            file_size, content_hash = await asyncio.to_thread(hash_partial)
+            if expected_hash and content_hash != expected_hash:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Uploaded file does not match its declared SHA-256"
+                )
+            
+            blob_key = await self._add_blob_reference(db, upload_id, content_hash, partial_path, file_size)
+            
+            return blob_key, file_size, content_hash
+    
+    
+    async def discard_partial(self, upload_id: str) -> bool:
+        """
+        Delete the temporary file of an abandoned resumable upload.
+        
+        Args:
+            upload_id: Resumable upload ID
+            
+        Returns:
+            bool: True if deleted, False if it didn't exist
+        """
+        async with self._locks.acquire(upload_id):
             try:
-                file_path.unlink()
+                await aiofiles.os.remove(self.get_partial_path(upload_id))
                 return True
-            except Exception as e:
-                raise Exception(f"Failed to delete file: {str(e)}")
+            except FileNotFoundError:
+                return False
+    
+    
+    async def cleanup_partials(self, max_age_seconds: float) -> int:
+        """
+        Delete resumable uploads not written to for max_age_seconds
+        (their upload records have expired).
+        
+        Args:
+            max_age_seconds: Age after which a partial file is abandoned
+            
+        Returns:
+            int: Number of files deleted
+        """
+        def remove_stale() -> int:
+            cutoff = datetime.now().timestamp() - max_age_seconds
+            removed = 0
+            for entry in os.scandir(self.partial_directory):
+                try:
+                    if entry.stat().st_mtime < cutoff:
+                        os.unlink(entry.path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+            return removed
+        
+        return await asyncio.to_thread(remove_stale)
     
     
-    async def file_exists(self, content_id: str) -> bool:
+    async def delete_file(
+        self,
+        content_id: str,
+        db: AsyncIOMotorDatabase,
+        content_hash: Optional[str] = None
+    ) -> bool:
+        """
+        Safely delete a document's file with locking.
+        Drops the document's reference to its blob; the blob itself is
+        deleted with its last reference.
+        
+        Args:
+            content_id: Content ID
+            db: Database instance (blob references)
+            content_hash: Hex SHA-256 of the file (None for uploads stored before deduplication)
+            
+        Returns:
+            bool: True if deleted, False if the document had no file
+        """
+        deleted = False
+        
+        try:
+            # Upload stored before deduplication
+            async with self._locks.acquire(content_id):
+                deleted = await self.legacy_storage.delete(self.get_legacy_key(content_id))
+            
+            if content_hash:
+                blobs = get_blobs_collection(db)
+                
+                async with self._locks.acquire(content_hash):
+                    result = await blobs.update_one({"_id": content_hash}, {"$pull": {"refs": content_id}})
+                    deleted = deleted or result.modified_count > 0
+                    
+                    # Last reference gone: delete the blob
+                    orphan = await blobs.delete_one({"_id": content_hash, "refs": {"$size": 0}})
+                    if orphan.deleted_count:
+                        await self.storage.delete(self.get_blob_key(content_hash))
+            
+            return deleted
+        except Exception as e:
+            raise Exception(f"Failed to delete file: {str(e)}")
+    
+    
+    async def file_exists(self, content_id: str, content_hash: Optional[str] = None) -> bool:
         """
         Check if a file exists.
         
         Args:
             content_id: Content ID
+            content_hash: Hex SHA-256 of the file, if known
             
         Returns:
             bool: True if file exists
         """
-        file_path = self.get_file_path(content_id)
-        return file_path.exists()
+        return await self._locate(content_id, content_hash) is not None
     
     
-    async def get_file_size(self, content_id: str) -> Optional[int]:
+    async def get_file_size(self, content_id: str, content_hash: Optional[str] = None) -> Optional[int]:
         """
         Get file size in bytes.
         
         Args:
             content_id: Content ID
+            content_hash: Hex SHA-256 of the file, if known
             
         Returns:
             Optional[int]: File size or None if doesn't exist
         """
-        file_path = self.get_file_path(content_id)
-        
-        if not file_path.exists():
-            return None
-        
-        return file_path.stat().st_size
+        located = await self._locate(content_id, content_hash)
+        return located[2] if located else None
     
     
     async def calculate_file_hash(self, content_id: str) -> Optional[str]:
         """
-        Calculate SHA-256 hash of file for integrity verification.
+        Calculate SHA-256 hash of a file stored before deduplication
+        (blobs are named by their hash).
         
         Args:
             content_id: Content ID
@@ -253,46 +631,41 @@ class FileManager:
         Returns:
             Optional[str]: SHA-256 hash or None if file doesn't exist
         """
-        file_path = self.get_file_path(content_id)
-        
-        if not file_path.exists():
-            return None
-        
         sha256_hash = hashlib.sha256()
         
-        async with aiofiles.open(file_path, 'rb') as f:
-            while chunk := await f.read(8192):
+        try:
+            async for chunk in self.legacy_storage.read(self.get_legacy_key(content_id)):
                 sha256_hash.update(chunk)
+        except FileNotFoundError:
+            return None
         
         return sha256_hash.hexdigest()
     
     
     async def cleanup_locks(self):
         """
-        Clean up unused file locks to prevent memory leaks.
-        Should be called periodically.
+        Clean up unused file locks (kept for compatibility; locks are
+        removed when released, so there is nothing left to clean up).
         """
-        async with self._locks_lock:
-            # Remove locks that are not currently acquired
-            to_remove = []
-            for file_id, lock in self._file_locks.items():
-                if not lock.locked():
-                    to_remove.append(file_id)
-            
-            for file_id in to_remove:
-                del self._file_locks[file_id]
+        pass
+    
+    
+    async def close(self):
+        """Close the storage backend's connections (called on shutdown)."""
+        await self.storage.close()
 
 
 # Global file manager instance
 _file_manager: Optional[FileManager] = None
 
 
-def get_file_manager(upload_directory: str = "./uploads") -> FileManager:
+def get_file_manager(upload_directory: str = "./uploads", temp_directory: Optional[str] = None) -> FileManager:
     """
-    Get the global file manager instance.
+    Get the global file manager instance (storage backend and lock mode from settings).
     
     Args:
         upload_directory: Upload directory path
+        temp_directory: Directory for uploads in progress (default: upload directory)
         
     Returns:
         FileManager: Global file manager instance
@@ -300,6 +673,11 @@ def get_file_manager(upload_directory: str = "./uploads") -> FileManager:
     global _file_manager
     
     if _file_manager is None:
-        _file_manager = FileManager(upload_directory)
+        _file_manager = FileManager(
+            upload_directory,
+            temp_directory,
+            create_storage_backend(upload_directory),
+            create_keyed_lock(upload_directory)
+        )
     
     return _file_manager
@@ -0,0 +1,364 @@
+"""
+Asynchronous job manager for long-running AI operations.
+Summaries and quizzes can take minutes; instead of holding the HTTP request
+open, the endpoint records a job in MongoDB, runs the work in the background
+and the frontend polls the job (or follows its SSE stream) for the result.
+
+Jobs run as tasks of the process that accepted them. That process records
+itself as the job's owner and refreshes updated_at while the job is active,
+so a job left queued/running by a process that restarted or crashed is
+recognised (no heartbeat for JOB_STALE_AFTER seconds, or owned by this
+process but not running in it) and marked failed instead of blocking
+resubmission and keeping pollers waiting.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Hashable, Optional, Set
+
+import httpx
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.db.database import get_jobs_collection
+from app.utils.request_queue import get_queue_manager
+
+logger = logging.getLogger(__name__)
+
+
+# Job states
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+ACTIVE_STATES = (JOB_QUEUED, JOB_RUNNING)
+
+# Seconds between heartbeats of this process's active jobs, and without one
+# before another process's active job counts as orphaned
+JOB_HEARTBEAT_INTERVAL = 15.0
+JOB_STALE_AFTER = 60.0
+
+# Error recorded on orphaned jobs
+JOB_INTERRUPTED_ERROR = "Job was interrupted by a server restart. Please try again."
+
+
+def serialize_job(job: dict) -> dict:
+    """
+    Convert a job document into a JSON-safe response.
+    
+    Args:
+        job: Job document from MongoDB
+        
+    Returns:
+        dict: Job status (queue position while waiting for the AI scheduler,
+        result or error once finished)
+    """
+    data = {
+        "job_id": str(job["_id"]),
+        "kind": job["kind"],
+        "content_id": job.get("content_id"),
+        "status": job["status"],
+        "created_at": job["created_at"].isoformat(),
+        "updated_at": job["updated_at"].isoformat()
+    }
+    
+    # Still waiting for a turn in this process's AI scheduler
+    if job["status"] in ACTIVE_STATES and job.get("queue_key"):
+        position = get_queue_manager().position_for_key(tuple(job["queue_key"]))
+        if position:
+            data["status"] = JOB_QUEUED
+            data["queue_position"] = position
+    
+    if job["status"] == JOB_DONE:
+        data["result"] = job.get("result")
+    elif job["status"] == JOB_FAILED:
+        data["error"] = job.get("error")
+        data["error_status"] = job.get("error_status", 500)
+    
+    return data
+
+
+def job_accepted_response(job: dict) -> JSONResponse:
+    """
+    Build the 202 Accepted response for a background job.
+    
+    Args:
+        job: Serialized job record
+        
+    Returns:
+        JSONResponse: 202 with the job record and its status URL
+    """
+    status_url = f"/jobs/{job['job_id']}"
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={**job, "status_url": status_url, "events_url": f"{status_url}/events"},
+        headers={"Location": status_url}
+    )
+
+
+class JobManager:
+    """
+    Runs background jobs in this process and tracks their state in MongoDB.
+    """
+    
+    def __init__(self):
+        # Strong references so running jobs are not garbage collected
+        self._tasks = set()
+        
+        # This process, as recorded on its jobs, and the jobs it is running
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{ObjectId()}"
+        self._job_ids: Set[ObjectId] = set()
+        self._heartbeat_task: Optional[asyncio.Task] = None
+    
+    async def _set_status(self, db: AsyncIOMotorDatabase, job_id: ObjectId, status: str, **fields):
+        """Update a job's state (a finished job leaves the active-job unique index)."""
+        update = {"$set": {"status": status, "updated_at": datetime.utcnow(), **fields}}
+        if status not in ACTIVE_STATES:
+            update["$unset"] = {"active": ""}
+        await get_jobs_collection(db).update_one({"_id": job_id}, update)
+    
+    async def _heartbeat(self, db: AsyncIOMotorDatabase):
+        """Refresh updated_at of this process's active jobs until none are left."""
+        try:
+            while self._job_ids:
+                await asyncio.sleep(JOB_HEARTBEAT_INTERVAL)
+                if not self._job_ids:
+                    break
+                try:
+                    await get_jobs_collection(db).update_many(
+                        {"_id": {"$in": list(self._job_ids)}, "status": {"$in": list(ACTIVE_STATES)}},
+                        {"$set": {"updated_at": datetime.utcnow()}}
+                    )
+                except Exception as e:
+                    logger.warning(f"Job heartbeat failed: {str(e)}")
+        finally:
+            self._heartbeat_task = None
+    
+    def is_orphaned(self, job: dict) -> bool:
+        """
+        Check whether an active job has no process running it anymore.
+        
+        Args:
+            job: Job document from MongoDB
+            
+        Returns:
+            bool: True if the job is queued/running but owned by this process
+            without running here, or its owner stopped heartbeating
+        """
+        if job["status"] not in ACTIVE_STATES:
+            return False
+        if job.get("owner") == self.owner:
+            return job["_id"] not in self._job_ids
+        return job["updated_at"] < datetime.utcnow() - timedelta(seconds=JOB_STALE_AFTER)
+    
+    async def _fail_orphan(self, db: AsyncIOMotorDatabase, job: dict) -> dict:
+        """Mark an orphaned job failed (unless it changed meanwhile) and return it as stored."""
+        now = datetime.utcnow()
+        failed = {
+            "status": JOB_FAILED,
+            "updated_at": now,
+            "error": JOB_INTERRUPTED_ERROR,
+            "error_status": status.HTTP_503_SERVICE_UNAVAILABLE
+        }
+        jobs_collection = get_jobs_collection(db)
+        await jobs_collection.update_one(
+            {"_id": job["_id"], "status": job["status"], "updated_at": job["updated_at"]},
+            {"$set": failed, "$unset": {"active": ""}}
+        )
+        logger.warning(f"Job {job['_id']} orphaned (owner {job.get('owner')}), marked failed")
+        return await jobs_collection.find_one({"_id": job["_id"]}) or {**job, **failed}
+    
+    async def fail_orphaned_jobs(self, db: AsyncIOMotorDatabase) -> int:
+        """
+        Mark jobs left active by stopped processes as failed (run at startup).
+        Jobs of other live workers keep heartbeating and are left alone.
+        
+        Args:
+            db: Database instance
+            
+        Returns:
+            int: Number of jobs marked failed
+        """
+        result = await get_jobs_collection(db).update_many(
+            {
+                "status": {"$in": list(ACTIVE_STATES)},
+                "owner": {"$ne": self.owner},
+                "updated_at": {"$lt": datetime.utcnow() - timedelta(seconds=JOB_STALE_AFTER)}
+            },
+            {
+                "$set": {
+                    "status": JOB_FAILED,
+                    "updated_at": datetime.utcnow(),
+                    "error": JOB_INTERRUPTED_ERROR,
+                    "error_status": status.HTTP_503_SERVICE_UNAVAILABLE
+                },
+                "$unset": {"active": ""}
+            }
+        )
+        if result.modified_count:
+            logger.warning(f"Marked {result.modified_count} orphaned job(s) failed")
+        return result.modified_count
+    
+    async def shutdown(self, db: AsyncIOMotorDatabase):
+        """
+        Cancel this process's jobs and mark them failed (they can't outlive it).
+        
+        Args:
+            db: Database instance
+        """
+        tasks = list(self._tasks)
+        if self._heartbeat_task is not None:
+            tasks.append(self._heartbeat_task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def _run(self, db: AsyncIOMotorDatabase, job_id: ObjectId, work: Callable[[], Awaitable[dict]]):
+        """Execute a job and record its outcome."""
+        try:
+            await self._set_status(db, job_id, JOB_RUNNING)
+            await self._execute(db, job_id, work)
+        except asyncio.CancelledError:
+            await self._set_status(
+                db, job_id, JOB_FAILED,
+                error=JOB_INTERRUPTED_ERROR,
+                error_status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+            logger.warning(f"Job {job_id} cancelled")
+            raise
+        finally:
+            self._job_ids.discard(job_id)
+    
+    async def _execute(self, db: AsyncIOMotorDatabase, job_id: ObjectId, work: Callable[[], Awaitable[dict]]):
+        """Run a job's work and record its result or error."""
+        try:
+            result = await work()
+            await self._set_status(db, job_id, JOB_DONE, result=result)
+            logger.info(f"Job {job_id} finished")
+        except HTTPException as e:
+            await self._set_status(db, job_id, JOB_FAILED, error=str(e.detail), error_status=e.status_code)
+            logger.error(f"Job {job_id} failed: {e.detail}")
+        except httpx.HTTPError as e:
+            await self._set_status(
+                db, job_id, JOB_FAILED,
+                error=f"AI service unavailable: {str(e)}",
+                error_status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+            logger.error(f"Job {job_id} failed: {str(e)}")
+        except Exception as e:
+            await self._set_status(db, job_id, JOB_FAILED, error=str(e), error_status=500)
+            logger.error(f"Job {job_id} failed: {str(e)}")
+    
+    async def submit(
+        self,
+        db: AsyncIOMotorDatabase,
+        user_id: str,
+        kind: str,
+        work: Callable[[], Awaitable[dict]],
+        content_id: Optional[str] = None,
+        queue_key: Optional[Hashable] = None
+    ) -> dict:
+        """
+        Start a background job, or return the user's already active job for
+        the same operation on the same content (an orphaned one is marked
+        failed and replaced). Active jobs carry active=True, which the unique
+        index idx_job_active_unique (app.db.init_db) makes one per user,
+        operation and content, so concurrent submissions get the same job.
+        
+        Args:
+            db: Database instance
+            user_id: Owner of the job
+            kind: Operation name (summarize, quiz, ...)
+            work: Async function producing the JSON result
+            content_id: Content the job operates on
+            queue_key: Key the work is scheduled under in the AI request queue
+            
+        Returns:
+            dict: Serialized job record
+        """
+        jobs_collection = get_jobs_collection(db)
+        
+        while True:
+            existing = await jobs_collection.find_one({
+                "user_id": user_id,
+                "kind": kind,
+                "content_id": content_id,
+                "status": {"$in": list(ACTIVE_STATES)}
+            })
+            if existing and not self.is_orphaned(existing):
+                return serialize_job(existing)
+            if existing:
+                await self._fail_orphan(db, existing)
+            
+            now = datetime.utcnow()
+            job = {
+                "_id": ObjectId(),
+                "user_id": user_id,
+                "kind": kind,
+                "content_id": content_id,
+                "queue_key": list(queue_key) if queue_key else None,
+                "status": JOB_QUEUED,
+                "active": True,
+                "owner": self.owner,
+                "created_at": now,
+                "updated_at": now
+            }
+            # Registered before the insert, so a concurrent lookup never sees it as orphaned
+            self._job_ids.add(job["_id"])
+            try:
+                await jobs_collection.insert_one(job)
+                break
+            except DuplicateKeyError:
+                # A concurrent request created the active job first: look it up again
+                self._job_ids.discard(job["_id"])
+            except BaseException:
+                self._job_ids.discard(job["_id"])
+                raise
+        
+        task = asyncio.create_task(self._run(db, job["_id"], work))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        
+        if self._heartbeat_task is None:
+            self._heartbeat_task = asyncio.create_task(self._heartbeat(db))
+        
+        return serialize_job(job)
+    
+    async def get_job(self, db: AsyncIOMotorDatabase, job_id: str, user_id: str) -> Optional[dict]:
+        """
+        Fetch a job owned by a user (an orphaned job comes back failed).
+        
+        Args:
+            db: Database instance
+            job_id: Job ID
+            user_id: Requesting user
+            
+        Returns:
+            Optional[dict]: Job document or None if not found / not owned
+        """
+        if not ObjectId.is_valid(job_id):
+            return None
+        
+        job = await get_jobs_collection(db).find_one({"_id": ObjectId(job_id), "user_id": user_id})
+        if job and self.is_orphaned(job):
+            job = await self._fail_orphan(db, job)
+        return job
+
+
+# Global job manager instance
+_job_manager: Optional[JobManager] = None
+
+
+def get_job_manager() -> JobManager:
+    """Get the global job manager instance."""
+    global _job_manager
+    if _job_manager is None:
+        _job_manager = JobManager()
+    return _job_manager
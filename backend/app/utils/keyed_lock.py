@@ -0,0 +1,261 @@
+"""
+Per-key asyncio locks that only exist while they are in use.
+Each key gets an entry holding a lock and a count of the tasks holding or
+waiting for it; the last task out removes the entry. Memory therefore
+tracks the keys in use right now, not every key ever seen, and no global
+lock is needed: lookup and bookkeeping never await, so they can't
+interleave on the event loop.
+
+Locks are exact per key (unlike a striped array, unrelated keys never
+contend), so code holding one key's lock may safely take another's.
+
+asyncio locks only exclude tasks of one process. With several workers
+(uvicorn --workers N, gunicorn) FileKeyedLock adds an fcntl advisory lock
+on a per-key lock file that every worker on the host sees; lock files are
+removed on release, so they don't accumulate either.
+Select with FILE_LOCK_MODE ("process" or "file").
+"""
+
+import os
+import re
+import asyncio
+import hashlib
+from pathlib import Path
+from typing import Dict, Hashable, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from app.core.config import settings
+
+
+# Keys usable as lock file names as they are (content IDs, SHA-256 digests)
+SAFE_KEY_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+
+# Backoff between attempts on a lock file held by another process (seconds)
+FILE_LOCK_POLL_INITIAL = 0.001
+FILE_LOCK_POLL_MAX = 0.05
+
+
+class _Entry:
+    """A key's lock and the number of tasks holding or waiting for it."""
+
+    __slots__ = ("lock", "refs")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.refs = 0
+
+
+class _Held:
+    """Async context manager returned by KeyedLock.acquire."""
+
+    __slots__ = ("_table", "_key", "_entry")
+
+    def __init__(self, table: "KeyedLock", key: Hashable):
+        self._table = table
+        self._key = key
+
+    async def __aenter__(self):
+        entries = self._table._entries
+        entry = entries.get(self._key)
+        if entry is None:
+            entry = entries[self._key] = _Entry()
+        entry.refs += 1
+        self._entry = entry
+
+        try:
+            await entry.lock.acquire()
+        except BaseException:
+            # Cancelled while waiting: give up the entry's reference
+            self._release_entry()
+            raise
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._entry.lock.release()
+        self._release_entry()
+
+    def _release_entry(self):
+        """Drop this task's reference; the last one out removes the entry."""
+        self._entry.refs -= 1
+        if self._entry.refs == 0:
+            del self._table._entries[self._key]
+
+
+class KeyedLock:
+    """
+    A table of per-key locks with refcounted entries.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Hashable, _Entry] = {}
+
+    def acquire(self, key: Hashable) -> _Held:
+        """
+        Lock key for the duration of an 'async with' block.
+
+        Args:
+            key: What to lock (e.g. a content ID or a blob's SHA-256)
+
+        Returns:
+            _Held: Async context manager holding the lock
+        """
+        return _Held(self, key)
+
+    def locked(self, key: Hashable) -> bool:
+        """Check whether a task currently holds the lock for key."""
+        entry = self._entries.get(key)
+        return entry is not None and entry.lock.locked()
+
+    def __len__(self) -> int:
+        """Number of keys currently held or waited for."""
+        return len(self._entries)
+
+
+class _FileHeld:
+    """Async context manager returned by FileKeyedLock.acquire."""
+
+    __slots__ = ("_table", "_key", "_inner", "_fd")
+
+    def __init__(self, table: "FileKeyedLock", key: Hashable):
+        self._table = table
+        self._key = key
+        self._inner = table._local.acquire(key)
+
+    async def __aenter__(self):
+        # One task per key per process, then one process per key
+        await self._inner.__aenter__()
+        try:
+            self._fd = await self._table._lock_file(self._key)
+        except BaseException:
+            await self._inner.__aexit__(None, None, None)
+            raise
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            self._table._unlock_file(self._key, self._fd)
+        finally:
+            await self._inner.__aexit__(exc_type, exc, tb)
+
+
+class FileKeyedLock:
+    """
+    Per-key locks shared by every process on the host: an in-process
+    KeyedLock plus flock() on <lock_directory>/<key>.lock. The holder
+    deletes the lock file before unlocking it; a process that locked a file
+    which has since been deleted notices (different inode) and retries.
+    The lock directory must be on a local file system.
+    """
+
+    def __init__(self, lock_directory: Union[str, Path]):
+        """
+        Initialize the lock table.
+
+        Args:
+            lock_directory: Directory for lock files (the same for every worker)
+
+        Raises:
+            RuntimeError: If fcntl is unavailable (not a POSIX system)
+        """
+        if fcntl is None:
+            raise RuntimeError("FILE_LOCK_MODE=file needs fcntl (POSIX only)")
+
+        self.lock_directory = Path(lock_directory)
+        self.lock_directory.mkdir(parents=True, exist_ok=True)
+        self._local = KeyedLock()
+
+    def path_for(self, key: Hashable) -> Path:
+        """
+        Get the lock file of a key.
+
+        Args:
+            key: Locked key
+
+        Returns:
+            Path: Lock file path (hashed name for keys that aren't plain names)
+        """
+        name = str(key)
+        if not SAFE_KEY_PATTERN.match(name):
+            name = hashlib.sha256(name.encode("utf-8")).hexdigest()
+        return self.lock_directory / f"{name}.lock"
+
+    async def _lock_file(self, key: Hashable) -> int:
+        """Take the key's lock file, polling while another process holds it."""
+        path = self.path_for(key)
+        delay = FILE_LOCK_POLL_INITIAL
+
+        while True:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, FILE_LOCK_POLL_MAX)
+                continue
+            except BaseException:
+                os.close(fd)
+                raise
+
+            # The previous holder may have deleted the file after we opened it
+            try:
+                if os.fstat(fd).st_ino == os.stat(path).st_ino:
+                    return fd
+            except FileNotFoundError:
+                pass
+            os.close(fd)
+
+    def _unlock_file(self, key: Hashable, fd: int):
+        """Delete the key's lock file, then release it (closing unlocks)."""
+        try:
+            os.unlink(self.path_for(key))
+        except FileNotFoundError:
+            pass
+        finally:
+            os.close(fd)
+
+    def acquire(self, key: Hashable) -> _FileHeld:
+        """
+        Lock key across processes for the duration of an 'async with' block.
+
+        Args:
+            key: What to lock (e.g. a content ID or a blob's SHA-256)
+
+        Returns:
+            _FileHeld: Async context manager holding the lock
+        """
+        return _FileHeld(self, key)
+
+    def locked(self, key: Hashable) -> bool:
+        """Check whether a task of this process currently holds the lock for key."""
+        return self._local.locked(key)
+
+    def __len__(self) -> int:
+        """Number of keys this process currently holds or waits for."""
+        return len(self._local)
+
+
+def create_keyed_lock(upload_directory: str) -> Union[KeyedLock, FileKeyedLock]:
+    """
+    Build the lock table selected in settings.
+
+    Args:
+        upload_directory: Upload directory (lock files default to <upload_directory>/.locks)
+
+    Returns:
+        Union[KeyedLock, FileKeyedLock]: Configured lock table
+
+    Raises:
+        ValueError: If FILE_LOCK_MODE is unknown
+    """
+    mode = settings.FILE_LOCK_MODE.lower()
+
+    if mode == "process":
+        return KeyedLock()
+
+    if mode == "file":
+        return FileKeyedLock(settings.FILE_LOCK_DIRECTORY or Path(upload_directory) / ".locks")
+
+    raise ValueError(f"Unknown FILE_LOCK_MODE: {settings.FILE_LOCK_MODE!r} (use 'process' or 'file')")
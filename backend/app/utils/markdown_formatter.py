@@ -66,6 +66,130 @@ def format_summary_markdown(text: str) -> str:
     return text.strip()
 
 
+TOC_LINE_PATTERN = re.compile(r'^\s*[\-\*]\s*\*?\*?\[.+\]\(#.+\)\*?\*?\s*$')
+FENCE_LINE_PATTERN = re.compile(r'^\s*```')
+META_LINE_PATTERN = re.compile(r'^(here is the summary:?|summary:?)\s*$', re.IGNORECASE)
+INLINE_FENCE_PATTERN = re.compile(r'```(?:markdown|md)?')
+
+
+class IncrementalMarkdownCleaner:
+    """
+    Streaming counterpart of format_summary_markdown.
+    
+    Applies the same cleanup (code fences, anchor-link TOC blocks, runs of
+    blank lines, leading meta commentary) chunk by chunk, so text can be
+    forwarded to the browser as the AI service generates it. Only lines that
+    might need removing are held back until their newline arrives.
+    """
+    
+    def __init__(self):
+        self._line = ""              # Unemitted text of the current line
+        self._line_emitted = False   # Part of the current line was already sent
+        self._toc_lines = []         # Consecutive anchor-link lines on hold
+        self._blank_run = 0
+        self._started = False        # Any content emitted yet
+    
+    def _flush_toc(self) -> str:
+        """Release held anchor-link lines (dropped if they form a TOC block)."""
+        lines, self._toc_lines = self._toc_lines, []
+        if len(lines) >= 3:
+            return ""
+        self._started = self._started or bool(lines)
+        return "".join(line + "\n" for line in lines)
+    
+    def _may_need_removal(self, text: str) -> bool:
+        """Check whether a partial line could still turn out to be removable."""
+        stripped = text.lstrip()
+        if not stripped:
+            return True
+        if stripped[0] in "`-*":
+            return True
+        if not self._started and ("here is the summary:".startswith(stripped.lower()[:20])
+                                  or "summary:".startswith(stripped.lower()[:8])):
+            return True
+        return False
+    
+    def _finish_line(self, line: str) -> str:
+        """Process a complete line and return the text to emit for it."""
+        if self._line_emitted:
+            self._line_emitted = False
+            return INLINE_FENCE_PATTERN.sub('', line) + "\n"
+        
+        if FENCE_LINE_PATTERN.match(line):
+            return ""
+        
+        if TOC_LINE_PATTERN.match(line):
+            self._toc_lines.append(line)
+            return ""
+        
+        if not line.strip():
+            # Blank lines inside a TOC block are dropped with it
+            if self._toc_lines:
+                return ""
+            self._blank_run += 1
+            if not self._started or self._blank_run > 2:
+                return ""
+            return "\n"
+        
+        out = self._flush_toc()
+        self._blank_run = 0
+        
+        if not self._started and META_LINE_PATTERN.match(line.strip()):
+            return out
+        
+        self._started = True
+        return out + INLINE_FENCE_PATTERN.sub('', line) + "\n"
+    
+    def feed(self, chunk: str) -> str:
+        """
+        Add a chunk of raw markdown.
+        
+        Args:
+            chunk: Raw text from the AI service
+            
+        Returns:
+            str: Cleaned text that is safe to emit now (may be empty)
+        """
+        out = []
+        self._line += chunk
+        
+        while "\n" in self._line:
+            line, self._line = self._line.split("\n", 1)
+            out.append(self._finish_line(line))
+        
+        # Emit the partial line early unless it could still be removed.
+        # Text from the first backtick on is held until the line completes,
+        # so split fences ("``" + "`markdown") are still stripped.
+        if self._line and (self._line_emitted or not self._may_need_removal(self._line)):
+            safe, backtick, rest = self._line.partition("`")
+            if safe:
+                if not self._line_emitted:
+                    out.append(self._flush_toc())
+                    self._blank_run = 0
+                    self._started = True
+                    self._line_emitted = True
+                out.append(safe)
+                self._line = backtick + rest
+        
+        return "".join(out)
+    
+    def flush(self) -> str:
+        """
+        Finish the stream and return any remaining cleaned text.
+        
+        Returns:
+            str: Remaining text
+        """
+        out = ""
+        if self._line:
+            out = self._finish_line(self._line)
+            self._line = ""
+            out = out[:-1] if out.endswith("\n") else out
+        elif self._line_emitted:
+            self._line_emitted = False
+        return out + self._flush_toc()
+
+
 def enhance_summary_response(summary_data: dict) -> dict:
     """
     Clean the summary response for frontend rendering.
@@ -0,0 +1,111 @@
+"""
+Streamed multipart/form-data bodies for uploading stored files to the AI service.
+The file is read in fixed-size chunks (through aiofiles for local paths, or
+from a storage backend's stream), so a 50MB PDF never blocks the event loop
+and never sits in memory as a whole.
+"""
+
+import secrets
+from typing import AsyncIterator, Callable, Dict, Union
+from pathlib import Path
+
+import aiofiles
+
+# Bytes read from disk per chunk (bounds memory per in-flight upload)
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def _quote_param(value: str) -> str:
+    """Escape a multipart header parameter the way browsers and httpx do."""
+    return value.replace("\\", "\\\\").replace('"', "%22").replace("\r", "%0D").replace("\n", "%0A")
+
+
+class AsyncMultipartFile:
+    """
+    A multipart/form-data body holding one file field, produced chunk by chunk.
+    Re-iterable, so retries can send it again. The length is known up front,
+    so the request carries Content-Length instead of chunked encoding.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path, Callable[[], AsyncIterator[bytes]]],
+        size: int,
+        filename: str,
+        content_type: str,
+        field_name: str = "file",
+        chunk_size: int = UPLOAD_CHUNK_SIZE
+    ):
+        """
+        Initialize the body.
+
+        Args:
+            path: File on disk, or a callable opening a fresh stream of the
+                file's bytes (called once per send, e.g. FileManager.read_file)
+            size: File size in bytes (from a stat taken before the upload)
+            filename: Filename sent to the AI service
+            content_type: MIME type of the file part
+            field_name: Form field name
+            chunk_size: Bytes read from disk per chunk
+        """
+        self.path = path
+        self.filename = filename
+        self.size = size
+        self.chunk_size = chunk_size
+        self.boundary = secrets.token_hex(16)
+
+        self._head = (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{_quote_param(field_name)}"; filename="{_quote_param(filename)}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode("utf-8")
+        self._tail = f"\r\n--{self.boundary}--\r\n".encode("ascii")
+
+    @property
+    def content_length(self) -> int:
+        """Total body size in bytes."""
+        return len(self._head) + self.size + len(self._tail)
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        """Request headers describing the body."""
+        return {
+            "Content-Type": f"multipart/form-data; boundary={self.boundary}",
+            "Content-Length": str(self.content_length)
+        }
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        """
+        Yield the body: part header, file chunks, closing boundary.
+
+        Raises:
+            IOError: If the file doesn't match its recorded size
+        """
+        yield self._head
+
+        remaining = self.size
+        async for chunk in self._read_file():
+            if len(chunk) > remaining:
+                raise IOError(f"File {self.filename} is longer than its recorded size")
+            remaining -= len(chunk)
+            yield chunk
+        if remaining > 0:
+            raise IOError(f"File {self.filename} is shorter than its recorded size")
+
+        yield self._tail
+
+    async def _read_file(self) -> AsyncIterator[bytes]:
+        """Stream the file's bytes (at most size of them from a local path)."""
+        if callable(self.path):
+            async for chunk in self.path():
+                yield chunk
+            return
+
+        remaining = self.size
+        async with aiofiles.open(self.path, "rb") as f:
+            while remaining > 0:
+                chunk = await f.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
@@ -0,0 +1,138 @@
+"""
+Per-document quiz question bank.
+Questions returned by the AI /quiz endpoint are kept in MongoDB (deduplicated by
+normalized question text) so later quiz requests can draw a fresh random sample
+in milliseconds instead of waiting minutes for a new generation.
+"""
+
+import re
+from datetime import datetime
+from typing import List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+from app.db.database import get_quiz_questions_collection
+
+
+def normalize_question(text: str) -> str:
+    """
+    Normalize question text for deduplication.
+    Lowercases, strips punctuation and collapses whitespace.
+    
+    Args:
+        text: Question text
+        
+    Returns:
+        str: Normalized question text
+    """
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class QuizBank:
+    """
+    MongoDB-backed question bank keyed by document (file SHA-256).
+    """
+    
+    async def count(self, db: AsyncIOMotorDatabase, bank_key: str) -> int:
+        """
+        Count questions in a document's bank.
+        
+        Args:
+            db: Database instance
+            bank_key: Document key (file SHA-256)
+            
+        Returns:
+            int: Number of stored questions
+        """
+        return await get_quiz_questions_collection(db).count_documents({"bank_key": bank_key})
+    
+    async def add_questions(self, db: AsyncIOMotorDatabase, bank_key: str, questions: List[dict]) -> int:
+        """
+        Add questions to a bank, skipping ones already stored.
+        
+        Args:
+            db: Database instance
+            bank_key: Document key (file SHA-256)
+            questions: Questions in frontend format (question, options, correct_answer, explanation)
+            
+        Returns:
+            int: Number of new questions added
+        """
+        now = datetime.utcnow()
+        operations = []
+        seen = set()
+        
+        for q in questions:
+            normalized = normalize_question(q.get("question", ""))
+            if not normalized or normalized in seen:
+                continue
+            seen.add(normalized)
+            
+            operations.append(UpdateOne(
+                {"bank_key": bank_key, "normalized": normalized},
+                {"$setOnInsert": {
+                    "bank_key": bank_key,
+                    "normalized": normalized,
+                    "question": q.get("question", ""),
+                    "options": q.get("options", []),
+                    "correct_answer": q.get("correct_answer", 0),
+                    "explanation": q.get("explanation", ""),
+                    "created_at": now
+                }},
+                upsert=True
+            ))
+        
+        if not operations:
+            return 0
+        
+        result = await get_quiz_questions_collection(db).bulk_write(operations, ordered=False)
+        return result.upserted_count
+    
+    async def sample(self, db: AsyncIOMotorDatabase, bank_key: str, size: int) -> List[dict]:
+        """
+        Draw a random sample of questions from a bank.
+        
+        Args:
+            db: Database instance
+            bank_key: Document key (file SHA-256)
+            size: Number of questions to draw
+            
+        Returns:
+            List[dict]: Questions in frontend format
+        """
+        cursor = get_quiz_questions_collection(db).aggregate([
+            {"$match": {"bank_key": bank_key}},
+            {"$sample": {"size": size}},
+            {"$project": {
+                "_id": 0,
+                "question": 1,
+                "options": 1,
+                "correct_answer": 1,
+                "explanation": 1
+            }}
+        ])
+        return await cursor.to_list(length=size)
+    
+    async def delete_bank(self, db: AsyncIOMotorDatabase, bank_key: str):
+        """
+        Remove all questions for a document.
+        
+        Args:
+            db: Database instance
+            bank_key: Document key (file SHA-256)
+        """
+        await get_quiz_questions_collection(db).delete_many({"bank_key": bank_key})
+
+
+# Global quiz bank instance
+_quiz_bank: Optional[QuizBank] = None
+
+
+def get_quiz_bank() -> QuizBank:
+    """Get the global quiz bank instance."""
+    global _quiz_bank
+    if _quiz_bank is None:
+        _quiz_bank = QuizBank()
+    return _quiz_bank
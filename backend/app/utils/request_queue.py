@@ -1,68 +1,279 @@
 """
 Request Queue Manager for AI Service
-Ensures all requests to Kalash's AI service are queued and processed sequentially
-to prevent lost requests during concurrent access.
+Global fair scheduler for all requests to Kalash's AI service.
+A fixed number of slots (matched to AI service capacity) is shared round-robin
+across users, so one user with many requests cannot starve everyone else.
+Per-user queues are bounded and disappear as soon as they are empty.
+Background work (precompute after upload) waits in a separate lower-priority
+queue and only starts when no interactive request is waiting.
 """
 
 import asyncio
-from typing import Dict, Callable, Any, Optional
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Callable, Any, AsyncIterator, Deque, Dict, Hashable, Optional
 from datetime import datetime
 import logging
 
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+
 logger = logging.getLogger(__name__)
 
 
+class QueueTicket:
+    """
+    A caller's place in the scheduler.
+    """
+
+    def __init__(self, user_id: str, key: Optional[Hashable] = None, background: bool = False):
+        self.user_id = user_id
+        self.key = key
+        self.background = background
+        self.ready: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.enqueued_at = datetime.now()
+        self.started = False
+        self.released = False
+
+
 class AIRequestQueue:
     """
-    Manages queued requests to the AI service to prevent concurrent access issues.
-    Ensures all requests are processed in order without loss.
+    Schedules AI service requests with a global concurrency cap and
+    round-robin fairness across users.
     """
-    
-    def __init__(self):
-        self._queues: Dict[str, asyncio.Queue] = {}  # One queue per user
-        self._workers: Dict[str, asyncio.Task] = {}  # One worker per user
-        self._lock = asyncio.Lock()
-    
-    async def _worker(self, user_id: str):
-        """
-        Worker that processes queued requests for a specific user.
-        
+
+    def __init__(self, max_concurrency: int = 4, max_queue_per_user: int = 5, max_background: int = 1):
+        """
+        Initialize the scheduler.
+
+        Args:
+            max_concurrency: Requests allowed to run against the AI service at once
+            max_queue_per_user: Waiting requests allowed per user before rejecting with 429
+            max_background: Slots background work may hold at once (within max_concurrency)
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue_per_user = max_queue_per_user
+        self.max_background = max_background
+
+        self._queues: Dict[str, Deque[QueueTicket]] = {}  # Waiting tickets per user
+        self._ring: Deque[str] = deque()  # Users with waiting tickets, in round-robin order
+        self._keys: Dict[Hashable, QueueTicket] = {}  # Tickets registered under a lookup key
+        self._running = 0
+        self._background: Deque[QueueTicket] = deque()  # Waiting background tickets (FIFO)
+        self._background_running = 0
+
+    def _start(self, ticket: QueueTicket):
+        """Hand a slot to a ticket."""
+        self._running += 1
+        if ticket.background:
+            self._background_running += 1
+        ticket.started = True
+        ticket.ready.set_result(None)
+
+    def _dispatch(self):
+        """Start waiting tickets while slots are free, one user at a time."""
+        while self._running < self.max_concurrency and self._ring:
+            user_id = self._ring.popleft()
+            queue = self._queues[user_id]
+            ticket = queue.popleft()
+
+            # Keep the user in rotation while they still have waiting tickets
+            if queue:
+                self._ring.append(user_id)
+            else:
+                del self._queues[user_id]
+
+            self._start(ticket)
+            logger.info(f"Started AI request for user {user_id} ({self._running}/{self.max_concurrency} running)")
+
+        # Background work only gets slots nobody interactive is waiting for
+        while (
+            self._running < self.max_concurrency
+            and self._background_running < self.max_background
+            and self._background
+            and not self._ring
+        ):
+            ticket = self._background.popleft()
+            self._start(ticket)
+            logger.info(f"Started background AI request for user {ticket.user_id}")
+
+    def submit(self, user_id: str, queue_key: Optional[Hashable] = None, background: bool = False) -> QueueTicket:
+        """
+        Take a place in the user's queue. Every ticket must be released.
+
         Args:
             user_id: User identifier
+            queue_key: Optional key to look up the request's queue position later
+            background: Queue below interactive requests (not bounded per user)
+
+        Returns:
+            QueueTicket: The caller's ticket (started at once if a slot is free)
+
+        Raises:
+            HTTPException: 429 if the user's queue is full
+        """
+        if background:
+            ticket = QueueTicket(user_id, queue_key, background=True)
+            self._background.append(ticket)
+            if queue_key is not None:
+                self._keys[queue_key] = ticket
+            self._dispatch()
+            return ticket
+
+        queue = self._queues.get(user_id)
+
+        if queue is not None and len(queue) >= self.max_queue_per_user:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f"Too many AI requests waiting (max {self.max_queue_per_user}). Please wait for earlier requests to finish.",
+                headers={"Retry-After": "30"}
+            )
+
+        ticket = QueueTicket(user_id, queue_key)
+        if queue is None:
+            queue = self._queues[user_id] = deque()
+            self._ring.append(user_id)
+        queue.append(ticket)
+
+        if queue_key is not None:
+            self._keys[queue_key] = ticket
+
+        self._dispatch()
+
+        if not ticket.started:
+            logger.info(f"Queued AI request for user {user_id}, position {self.position(ticket)}")
+        return ticket
+
+    def promote(self, queue_key: Hashable):
+        """
+        Move a waiting background request to interactive priority
+        (someone is now actively waiting for its result).
+
+        Args:
+            queue_key: Key the background request was submitted under
+        """
+        ticket = self._keys.get(queue_key)
+        if ticket is None or not ticket.background or ticket.started:
+            return
+
+        self._background.remove(ticket)
+        ticket.background = False
+
+        queue = self._queues.get(ticket.user_id)
+        if queue is None:
+            queue = self._queues[ticket.user_id] = deque()
+            self._ring.append(ticket.user_id)
+        queue.appendleft(ticket)
+
+        logger.info(f"Promoted background AI request {queue_key} to interactive")
+        self._dispatch()
+
+    def _withdraw(self, ticket: QueueTicket):
+        """Remove a ticket that gave up before it started."""
+        if ticket.background:
+            if ticket in self._background:
+                self._background.remove(ticket)
+            return
+
+        queue = self._queues.get(ticket.user_id)
+        if queue is None or ticket not in queue:
+            return
+
+        queue.remove(ticket)
+        if not queue:
+            del self._queues[ticket.user_id]
+            self._ring.remove(ticket.user_id)
+
+    async def wait(self, ticket: QueueTicket, interval: float = 1.0) -> AsyncIterator[int]:
         """
-        queue = self._queues[user_id]
-        
-        while True:
-            try:
-                # Get next request from queue
-                request_data = await queue.get()
-                
-                if request_data is None:  # Shutdown signal
-                    break
-                
-                callback = request_data['callback']
-                args = request_data['args']
-                kwargs = request_data['kwargs']
-                result_future = request_data['future']
-                
-                logger.info(f"Processing AI request for user {user_id}")
-                
-                try:
-                    # Execute the actual AI service call
-                    result = await callback(*args, **kwargs)
-                    result_future.set_result(result)
-                    logger.info(f"AI request completed for user {user_id}")
-                    
-                except Exception as e:
-                    logger.error(f"AI request failed for user {user_id}: {str(e)}")
-                    result_future.set_exception(e)
-                
-                finally:
-                    queue.task_done()
-                    
-            except Exception as e:
-                logger.error(f"Worker error for user {user_id}: {str(e)}")
-    
+        Wait for a ticket's turn, yielding its queue position whenever it changes.
+
+        Args:
+            ticket: Ticket returned by submit()
+            interval: Seconds between position checks
+
+        Yields:
+            int: 1-based queue position while waiting
+        """
+        last_position = None
+        while not ticket.ready.done():
+            position = self.position(ticket)
+            if position != last_position:
+                last_position = position
+                yield position
+            await asyncio.wait({ticket.ready}, timeout=interval)
+
+        ticket.ready.result()  # Raises if the scheduler shut down
+
+    def release(self, ticket: QueueTicket):
+        """Free a ticket's slot (or its queue place) and let the next request start."""
+        if ticket.released:
+            return
+        ticket.released = True
+
+        if ticket.key is not None and self._keys.get(ticket.key) is ticket:
+            del self._keys[ticket.key]
+
+        if ticket.started:
+            self._running -= 1
+            if ticket.background:
+                self._background_running -= 1
+        else:
+            self._withdraw(ticket)
+
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, user_id: str, queue_key: Optional[Hashable] = None, background: bool = False):
+        """
+        Wait for a fair turn, hold one AI slot for the duration of the block.
+
+        Args:
+            user_id: User identifier
+            queue_key: Optional key to look up the request's queue position later
+            background: Queue below interactive requests
+
+        Yields:
+            QueueTicket: The caller's ticket
+
+        Raises:
+            HTTPException: 429 if the user's queue is full
+        """
+        ticket = self.submit(user_id, queue_key, background)
+
+        try:
+            await ticket.ready
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    async def run(
+        self,
+        user_id: str,
+        callback: Callable,
+        *args,
+        queue_key: Optional[Hashable] = None,
+        background: bool = False,
+        **kwargs
+    ) -> Any:
+        """
+        Run an AI service call when the user's turn comes.
+
+        Args:
+            user_id: User identifier
+            callback: Async function to execute
+            *args: Positional arguments for callback
+            queue_key: Optional key to look up the request's queue position later
+            background: Queue below interactive requests
+            **kwargs: Keyword arguments for callback
+
+        Returns:
+            Result from the callback function
+        """
+        async with self.slot(user_id, queue_key, background):
+            return await callback(*args, **kwargs)
+
     async def enqueue_request(
         self,
         user_id: str,
@@ -72,59 +283,89 @@ class AIRequestQueue:
     ) -> Any:
         """
         Enqueue an AI service request for processing.
-        
+
         Args:
             user_id: User identifier
             callback: Async function to execute
             *args: Positional arguments for callback
             **kwargs: Keyword arguments for callback
-            
+
         Returns:
             Result from the callback function
         """
-        async with self._lock:
-            # Create queue and worker if they don't exist for this user
-            if user_id not in self._queues:
-                self._queues[user_id] = asyncio.Queue()
-                self._workers[user_id] = asyncio.create_task(self._worker(user_id))
-                logger.info(f"Created request queue for user {user_id}")
-        
-        # Create a future to hold the result
-        result_future = asyncio.Future()
-        
-        # Add request to queue
-        await self._queues[user_id].put({
-            'callback': callback,
-            'args': args,
-            'kwargs': kwargs,
-            'future': result_future,
-            'timestamp': datetime.now()
-        })
-        
-        logger.info(f"Queued AI request for user {user_id}, queue size: {self._queues[user_id].qsize()}")
-        
-        # Wait for result
-        return await result_future
-    
+        async with self.slot(user_id):
+            return await callback(*args, **kwargs)
+
+    def position(self, ticket: QueueTicket) -> int:
+        """
+        Estimate how many requests will start before this one (plus one).
+
+        Args:
+            ticket: A waiting ticket
+
+        Returns:
+            int: 1-based queue position, 0 if already running
+        """
+        if ticket.started or ticket.released:
+            return 0
+
+        # Background work waits for every interactive request
+        if ticket.background:
+            interactive = sum(len(queue) for queue in self._queues.values())
+            return interactive + self._background.index(ticket) + 1
+
+        queue = self._queues[ticket.user_id]
+        index = queue.index(ticket)
+        ahead = index
+
+        # Round-robin: every other user gets one turn per round
+        own_turn = self._ring.index(ticket.user_id)
+        for turn, other_user in enumerate(self._ring):
+            if other_user == ticket.user_id:
+                continue
+            rounds = index + 1 if turn < own_turn else index
+            ahead += min(len(self._queues[other_user]), rounds)
+
+        return ahead + 1
+
+    def position_for_key(self, key: Hashable) -> Optional[int]:
+        """
+        Get the queue position of the request registered under a key.
+
+        Returns:
+            Optional[int]: 1-based position, 0 if running, None if unknown
+        """
+        ticket = self._keys.get(key)
+        return self.position(ticket) if ticket else None
+
     async def get_queue_size(self, user_id: str) -> int:
         """Get the current queue size for a user."""
         if user_id not in self._queues:
             return 0
-        return self._queues[user_id].qsize()
-    
+        return len(self._queues[user_id])
+
+    def stats(self) -> dict:
+        """Get scheduler counters."""
+        return {
+            "running": self._running,
+            "max_concurrency": self.max_concurrency,
+            "waiting": sum(len(queue) for queue in self._queues.values()),
+            "waiting_users": len(self._queues),
+            "background_running": self._background_running,
+            "background_waiting": len(self._background)
+        }
+
     async def shutdown(self):
-        """Shutdown all workers gracefully."""
-        async with self._lock:
-            for user_id, queue in self._queues.items():
-                await queue.put(None)  # Shutdown signal
-            
-            # Wait for all workers to finish
-            if self._workers:
-                await asyncio.gather(*self._workers.values(), return_exceptions=True)
-            
-            self._queues.clear()
-            self._workers.clear()
-            logger.info("Request queue manager shutdown complete")
+        """Cancel all waiting requests."""
+        for queue in [*self._queues.values(), self._background]:
+            for ticket in queue:
+                if not ticket.ready.done():
+                    ticket.ready.cancel()
+
+        self._queues.clear()
+        self._ring.clear()
+        self._background.clear()
+        logger.info("Request queue manager shutdown complete")
 
 
 # Global queue manager instance
@@ -135,5 +376,9 @@ def get_queue_manager() -> AIRequestQueue:
     """Get the global queue manager instance."""
     global _queue_manager
     if _queue_manager is None:
-        _queue_manager = AIRequestQueue()
+        _queue_manager = AIRequestQueue(
+            max_concurrency=settings.AI_MAX_CONCURRENCY,
+            max_queue_per_user=settings.AI_MAX_QUEUE_PER_USER,
+            max_background=settings.AI_PRECOMPUTE_CONCURRENCY
+        )
     return _queue_manager
@@ -0,0 +1,73 @@
+"""
+Single-flight coalescing for expensive upstream calls.
+When several requests need the same result at the same time (double-clicks,
+several tabs on one document), only the first one runs the call; the others
+await the same in-flight task and receive its result or exception.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls that share a key.
+    """
+    
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+    
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        """Remove a finished call (unless the key was already reused)."""
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        
+        # Mark the exception as retrieved even if every waiter went away
+        if not task.cancelled():
+            task.exception()
+    
+    async def do(self, key: Hashable, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """
+        Run func(*args, **kwargs) once per key among concurrent callers.
+        
+        The shared call is shielded: a caller that is cancelled (e.g. client
+        disconnected) stops waiting without cancelling it for the others.
+        
+        Args:
+            key: Identifies identical work, e.g. ("summarize", content_hash)
+            func: Async function performing the upstream call
+            *args: Positional arguments for func
+            **kwargs: Keyword arguments for func
+            
+        Returns:
+            Result of the shared call
+        """
+        task = self._calls.get(key)
+        
+        if task is None:
+            task = asyncio.create_task(func(*args, **kwargs))
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            logger.info(f"Joining in-flight call for {key}")
+        
+        return await asyncio.shield(task)
+    
+    def in_flight(self, key: Hashable) -> bool:
+        """Check whether a call for this key is currently running."""
+        return key in self._calls
+
+
+# Global single-flight instance for AI service calls
+_single_flight: Optional[SingleFlight] = None
+
+
+def get_single_flight() -> SingleFlight:
+    """Get the global single-flight instance."""
+    global _single_flight
+    if _single_flight is None:
+        _single_flight = SingleFlight()
+    return _single_flight
@@ -0,0 +1,530 @@
+"""
+Storage backends for uploaded files.
+FileManager keeps the locking, hashing and blob reference counts (MongoDB);
+a backend only stores, serves and deletes bytes by key:
+  - LocalStorage: a directory on this node, with blobs sharded by hash prefix
+    (blobs/ab/cd/abcd...), so no directory grows past a few thousand entries
+  - S3Storage: an S3-compatible bucket (AWS S3, MinIO, ...) so several
+    backend nodes share one store; requests are signed with SigV4 and bodies
+    are streamed both ways through httpx
+
+Select with STORAGE_BACKEND ("local" or "s3") and the S3_* settings.
+"""
+
+import os
+import re
+import errno
+import hmac
+import asyncio
+import hashlib
+import aiofiles
+import aiofiles.os
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional
+from urllib.parse import quote
+
+import httpx
+
+from app.core.config import settings
+
+
+# Keys are relative paths of plain names ("blobs/<sha256>", "<content_id>")
+KEY_PATTERN = re.compile(r"^[A-Za-z0-9_.-]+(/[A-Za-z0-9_.-]+)*$")
+
+# Bytes per read when serving a stored file
+READ_CHUNK_SIZE = 64 * 1024
+
+# Bytes per kernel copy call or hashing read
+COPY_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Errors meaning a kernel copy method is unavailable for these files (try the next one)
+COPY_UNSUPPORTED_ERRORS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF}
+
+# S3 payload hash for bodies streamed without hashing them first
+UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+
+
+class StorageError(Exception):
+    """Raised when a storage backend fails an operation (not for missing keys)."""
+    pass
+
+
+def kernel_copy(src_fd: int, dst_fd: int, size: int):
+    """
+    Copy the first size bytes of src_fd to dst_fd's current position without
+    passing them through Python: copy_file_range, else sendfile, else pread/write.
+
+    Args:
+        src_fd: Source file descriptor (read by offset; its position is unchanged)
+        dst_fd: Destination file descriptor
+        size: Bytes to copy
+
+    Raises:
+        IOError: If the source ends before size bytes (e.g. it was truncated)
+    """
+    offset = 0
+
+    for method in ("copy_file_range", "sendfile"):
+        if not hasattr(os, method):
+            continue
+        try:
+            while offset < size:
+                count = min(COPY_CHUNK_SIZE, size - offset)
+                if method == "copy_file_range":
+                    copied = os.copy_file_range(src_fd, dst_fd, count, offset)
+                else:
+                    copied = os.sendfile(dst_fd, src_fd, offset, count)
+                if copied == 0:
+                    break
+                offset += copied
+            break
+        except OSError as e:
+            if e.errno not in COPY_UNSUPPORTED_ERRORS:
+                raise
+    else:
+        while offset < size:
+            data = os.pread(src_fd, min(COPY_CHUNK_SIZE, size - offset), offset)
+            if not data:
+                break
+            view = memoryview(data)
+            while view:
+                view = view[os.write(dst_fd, view):]
+            offset += len(data)
+
+    if offset != size:
+        raise IOError(f"Short copy: source ended after {offset} of {size} bytes")
+
+
+def move_file(source: Path, destination: Path):
+    """
+    Move a file into place atomically: a rename on the same file system, else
+    a kernel copy next to the destination, a rename, and removal of the source.
+
+    Args:
+        source: File to move
+        destination: Final path (replaced if it exists)
+    """
+    try:
+        os.replace(source, destination)
+        return
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+
+    staged = destination.with_name(destination.name + ".part")
+    try:
+        with open(source, "rb") as src, open(staged, "wb") as dst:
+            kernel_copy(src.fileno(), dst.fileno(), os.fstat(src.fileno()).st_size)
+        os.replace(staged, destination)
+    finally:
+        if staged.exists():
+            staged.unlink()
+    os.unlink(source)
+
+
+def check_key(key: str) -> str:
+    """
+    Validate a storage key (no absolute paths or path traversal).
+
+    Args:
+        key: Storage key
+
+    Returns:
+        str: The same key
+
+    Raises:
+        ValueError: If the key is not a relative path of plain names
+    """
+    if not KEY_PATTERN.match(key) or any(part in (".", "..") for part in key.split("/")):
+        raise ValueError(f"Invalid storage key: {key!r}")
+    return key
+
+
+class StorageBackend(ABC):
+    """
+    Where stored files live. Keys are relative paths ("blobs/<sha256>");
+    files are written once and never modified, only deleted.
+    """
+
+    @abstractmethod
+    async def size(self, key: str) -> Optional[int]:
+        """
+        Get a stored file's size.
+
+        Args:
+            key: Storage key
+
+        Returns:
+            Optional[int]: Size in bytes, or None if the key doesn't exist
+        """
+
+    async def exists(self, key: str) -> bool:
+        """Check if a key exists."""
+        return await self.size(key) is not None
+
+    @abstractmethod
+    async def put_file(self, key: str, path: Path, size: int):
+        """
+        Store a fully written local file under key. The local file is
+        consumed: moved into place or removed once its bytes are stored.
+
+        Args:
+            key: Storage key
+            path: Local file (e.g. a finished upload in the temp directory)
+            size: File size in bytes
+        """
+
+    @abstractmethod
+    def read(self, key: str, chunk_size: int = READ_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """
+        Stream a stored file.
+
+        Args:
+            key: Storage key
+            chunk_size: Bytes per chunk (approximate for remote backends)
+
+        Yields:
+            bytes: File contents in order
+
+        Raises:
+            FileNotFoundError: If the key doesn't exist
+        """
+
+    @abstractmethod
+    async def delete(self, key: str) -> bool:
+        """
+        Delete a stored file.
+
+        Args:
+            key: Storage key
+
+        Returns:
+            bool: True if deleted, False if it didn't exist
+        """
+
+    async def close(self):
+        """Release connections (called on shutdown)."""
+        pass
+
+
+class LocalStorage(StorageBackend):
+    """
+    Files under a local directory. With shard_depth > 0 the file name is
+    spread over hash-prefix subdirectories ("blobs/abcd..." is stored at
+    blobs/ab/cd/abcd...); files written before sharding, directly in the
+    key's directory, are still read and deleted.
+    """
+
+    def __init__(self, root: str, shard_depth: int = 2, shard_width: int = 2):
+        """
+        Initialize local storage.
+
+        Args:
+            root: Base directory
+            shard_depth: Levels of prefix subdirectories (0 = flat)
+            shard_width: Characters of the name per level
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.shard_depth = shard_depth
+        self.shard_width = shard_width
+
+    def path_for(self, key: str) -> Path:
+        """
+        Get the path a key is written to.
+
+        Args:
+            key: Storage key
+
+        Returns:
+            Path: Sharded file path
+        """
+        directory, _, name = check_key(key).rpartition("/")
+        shards = [
+            name[level * self.shard_width:(level + 1) * self.shard_width]
+            for level in range(self.shard_depth)
+        ]
+        return self.root.joinpath(directory, *shards, name)
+
+    def _candidates(self, key: str) -> List[Path]:
+        """Paths a key may be stored at: sharded, then flat (written before sharding)."""
+        paths = [self.path_for(key)]
+        if self.shard_depth:
+            paths.append(self.root / key)
+        return paths
+
+    async def _find(self, key: str) -> Optional[Path]:
+        """Path holding a key, or None."""
+        for path in self._candidates(key):
+            if await aiofiles.os.path.isfile(path):
+                return path
+        return None
+
+    async def size(self, key: str) -> Optional[int]:
+        for path in self._candidates(key):
+            # stat() in the thread pool so slow disks don't block the event loop
+            try:
+                return (await aiofiles.os.stat(path)).st_size
+            except FileNotFoundError:
+                continue
+        return None
+
+    async def put_file(self, key: str, path: Path, size: int):
+        destination = self.path_for(key)
+
+        def move():
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            move_file(path, destination)
+
+        await asyncio.to_thread(move)
+
+    async def read(self, key: str, chunk_size: int = READ_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        path = await self._find(key)
+        if path is None:
+            raise FileNotFoundError(key)
+
+        async with aiofiles.open(path, 'rb') as f:
+            while chunk := await f.read(chunk_size):
+                yield chunk
+
+    async def delete(self, key: str) -> bool:
+        deleted = False
+        for path in self._candidates(key):
+            try:
+                await aiofiles.os.remove(path)
+                deleted = True
+            except FileNotFoundError:
+                pass
+        return deleted
+
+
+def sign_v4(
+    method: str,
+    url: httpx.URL,
+    headers: Dict[str, str],
+    access_key: str,
+    secret_key: str,
+    region: str,
+    now: Optional[datetime] = None,
+    service: str = "s3"
+) -> Dict[str, str]:
+    """
+    Sign a request with AWS Signature Version 4 (header form).
+
+    Args:
+        method: HTTP method
+        url: Full request URL (path already percent-encoded)
+        headers: Headers to sign besides Host (must include x-amz-content-sha256)
+        access_key: Access key ID
+        secret_key: Secret access key
+        region: Region (MinIO accepts "us-east-1")
+        now: Signing time (default: current time)
+        service: Service name
+
+    Returns:
+        Dict[str, str]: headers plus x-amz-date and Authorization
+    """
+    now = now or datetime.now(timezone.utc)
+    amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+    scope = f"{amz_date[:8]}/{region}/{service}/aws4_request"
+
+    signed = {key.lower(): " ".join(str(value).split()) for key, value in headers.items()}
+    signed["host"] = url.netloc.decode("ascii")
+    signed["x-amz-date"] = amz_date
+    names = sorted(signed)
+
+    query = "&".join(
+        f"{quote(key, safe='-_.~')}={quote(value, safe='-_.~')}"
+        for key, value in sorted(url.params.multi_items())
+    )
+    canonical_request = "\n".join([
+        method,
+        url.raw_path.decode("ascii").split("?")[0],
+        query,
+        "".join(f"{name}:{signed[name]}\n" for name in names),
+        ";".join(names),
+        signed["x-amz-content-sha256"],
+    ])
+    string_to_sign = "\n".join([
+        "AWS4-HMAC-SHA256",
+        amz_date,
+        scope,
+        hashlib.sha256(canonical_request.encode("utf-8")).hexdigest(),
+    ])
+
+    key = ("AWS4" + secret_key).encode("utf-8")
+    for part in (amz_date[:8], region, service, "aws4_request"):
+        key = hmac.new(key, part.encode("utf-8"), hashlib.sha256).digest()
+    signature = hmac.new(key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+
+    return {
+        **headers,
+        "x-amz-date": amz_date,
+        "Authorization": (
+            f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, "
+            f"SignedHeaders={';'.join(names)}, Signature={signature}"
+        ),
+    }
+
+
+class S3Storage(StorageBackend):
+    """
+    Files in an S3-compatible bucket, addressed path-style
+    (<endpoint>/<bucket>/<prefix><key>, which MinIO and AWS both accept).
+    Uploads stream the local file as the request body and downloads stream
+    the response, so no file is ever held in memory.
+    """
+
+    def __init__(
+        self,
+        endpoint_url: str,
+        bucket: str,
+        access_key: str,
+        secret_key: str,
+        region: str = "us-east-1",
+        prefix: str = "",
+        timeout: float = 60.0
+    ):
+        """
+        Initialize the S3 driver.
+
+        Args:
+            endpoint_url: Service URL (e.g. https://s3.us-east-1.amazonaws.com or http://localhost:9000)
+            bucket: Bucket name (must exist)
+            access_key: Access key ID
+            secret_key: Secret access key
+            region: Bucket region
+            prefix: Prepended to every key (e.g. "prepgen/")
+            timeout: Seconds per network operation
+        """
+        self.endpoint_url = endpoint_url.rstrip("/")
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.prefix = prefix
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared HTTP client (created on first use)."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        return self._client
+
+    def url_for(self, key: str) -> httpx.URL:
+        """
+        Get the object URL of a key.
+
+        Args:
+            key: Storage key
+
+        Returns:
+            httpx.URL: Path-style object URL
+        """
+        path = quote(f"{self.bucket}/{self.prefix}{check_key(key)}", safe="/-_.~")
+        return httpx.URL(f"{self.endpoint_url}/{path}")
+
+    def _build(self, method: str, key: str, headers: Optional[Dict[str, str]] = None, **kwargs) -> httpx.Request:
+        """Build a signed request for a key."""
+        url = self.url_for(key)
+        signed = sign_v4(
+            method,
+            url,
+            {"x-amz-content-sha256": UNSIGNED_PAYLOAD},
+            self.access_key,
+            self.secret_key,
+            self.region
+        )
+        return self.client.build_request(method, url, headers={**signed, **(headers or {})}, **kwargs)
+
+    @staticmethod
+    def _raise_for_status(response: httpx.Response, key: str):
+        """Raise StorageError for an unexpected response."""
+        if response.status_code >= 400:
+            raise StorageError(f"S3 returned {response.status_code} for {key}: {response.text[:200]}")
+
+    async def size(self, key: str) -> Optional[int]:
+        response = await self.client.send(self._build("HEAD", key))
+        if response.status_code == 404:
+            return None
+        self._raise_for_status(response, key)
+        return int(response.headers["content-length"])
+
+    async def put_file(self, key: str, path: Path, size: int):
+        async def body() -> AsyncIterator[bytes]:
+            async with aiofiles.open(path, 'rb') as f:
+                while chunk := await f.read(READ_CHUNK_SIZE):
+                    yield chunk
+
+        request = self._build(
+            "PUT",
+            key,
+            headers={"Content-Length": str(size), "Content-Type": "application/octet-stream"},
+            content=body()
+        )
+        response = await self.client.send(request)
+        self._raise_for_status(response, key)
+
+        await aiofiles.os.remove(path)
+
+    async def read(self, key: str, chunk_size: int = READ_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        response = await self.client.send(self._build("GET", key), stream=True)
+        try:
+            if response.status_code == 404:
+                raise FileNotFoundError(key)
+            if response.status_code >= 400:
+                await response.aread()
+                self._raise_for_status(response, key)
+
+            async for chunk in response.aiter_bytes(chunk_size):
+                yield chunk
+        finally:
+            await response.aclose()
+
+    async def delete(self, key: str) -> bool:
+        # S3 answers 204 whether or not the key existed
+        response = await self.client.send(self._build("DELETE", key))
+        self._raise_for_status(response, key)
+        return True
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def create_storage_backend(upload_directory: str) -> StorageBackend:
+    """
+    Build the storage backend selected in settings.
+
+    Args:
+        upload_directory: Base directory for local storage
+
+    Returns:
+        StorageBackend: Configured backend
+
+    Raises:
+        ValueError: If STORAGE_BACKEND is unknown or S3 settings are missing
+    """
+    backend = settings.STORAGE_BACKEND.lower()
+
+    if backend == "local":
+        return LocalStorage(upload_directory)
+
+    if backend == "s3":
+        if not settings.S3_ENDPOINT_URL or not settings.S3_BUCKET:
+            raise ValueError("STORAGE_BACKEND=s3 requires S3_ENDPOINT_URL and S3_BUCKET")
+        return S3Storage(
+            settings.S3_ENDPOINT_URL,
+            settings.S3_BUCKET,
+            settings.S3_ACCESS_KEY_ID,
+            settings.S3_SECRET_ACCESS_KEY,
+            region=settings.S3_REGION,
+            prefix=settings.S3_PREFIX
+        )
+
+    raise ValueError(f"Unknown STORAGE_BACKEND: {settings.STORAGE_BACKEND!r} (use 'local' or 's3')")
@@ -0,0 +1,186 @@
+"""
+Persistent summary store keyed by document content hash.
+Formatted summaries are saved in MongoDB under the file's SHA-256, so repeat
+requests and identical files uploaded by other users skip the AI service.
+A small in-process LRU sits in front of MongoDB for the hottest documents.
+Each summary is also kept as its JSON response body, compressed once at the
+highest level in every supported encoding, so cache hits are served without
+re-serializing or re-compressing it.
+"""
+
+import asyncio
+import copy
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.core.config import settings
+from app.db.database import get_summaries_collection
+from app.utils.compression import SUPPORTED_ENCODINGS, compress_all
+
+
+def render_summary(summary: dict) -> bytes:
+    """Render a summary exactly as the endpoint's JSON response body."""
+    return JSONResponse(jsonable_encoder(summary)).body
+
+
+def encode_summary(summary: dict) -> Dict[str, bytes]:
+    """
+    Render a summary as its JSON response body plus pre-compressed variants.
+    CPU-bound (maximum compression levels): run it in a worker thread.
+    
+    Args:
+        summary: Formatted summary response
+        
+    Returns:
+        Dict[str, bytes]: "identity" -> JSON body, and encoding name -> compressed body
+            (only for bodies large enough to be compressed)
+    """
+    body = render_summary(summary)
+    encoded = {"identity": body}
+    if len(body) >= settings.COMPRESSION_MINIMUM_SIZE:
+        encoded.update(compress_all(body))
+    return encoded
+
+
+class SummaryStore:
+    """
+    Two-level summary cache: in-process LRU -> MongoDB 'summaries' collection.
+    """
+    
+    def __init__(self, max_entries: int = 128):
+        """
+        Initialize the store.
+        
+        Args:
+            max_entries: Maximum number of summaries kept in the in-process LRU
+        """
+        self.max_entries = max_entries
+        self._lru: "OrderedDict[str, dict]" = OrderedDict()  # content_hash -> {"summary", "encoded"}
+    
+    def _remember(self, content_hash: str, summary: dict, encoded: Optional[Dict[str, bytes]] = None):
+        """Add a summary to the LRU, evicting the least recently used entry."""
+        self._lru[content_hash] = {"summary": summary, "encoded": encoded}
+        self._lru.move_to_end(content_hash)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+    
+    async def _load(self, db: AsyncIOMotorDatabase, content_hash: str) -> Optional[dict]:
+        """Get the LRU entry for a summary, loading it from MongoDB on a miss."""
+        if content_hash in self._lru:
+            self._lru.move_to_end(content_hash)
+            return self._lru[content_hash]
+        
+        stored = await get_summaries_collection(db).find_one({"_id": content_hash})
+        if not stored:
+            return None
+        
+        # Compressed variants are persisted; the plain JSON body is cheap to render again
+        encoded = stored.get("encoded")
+        if encoded is not None:
+            encoded = {"identity": render_summary(stored["summary"]), **{k: bytes(v) for k, v in encoded.items()}}
+        
+        self._remember(content_hash, stored["summary"], encoded)
+        return self._lru[content_hash]
+    
+    async def get(self, db: AsyncIOMotorDatabase, content_hash: str) -> Optional[dict]:
+        """
+        Look up a stored summary.
+        
+        Args:
+            db: Database instance
+            content_hash: SHA-256 of the document
+            
+        Returns:
+            Optional[dict]: Formatted summary response or None if not stored
+        """
+        entry = await self._load(db, content_hash)
+        return copy.deepcopy(entry["summary"]) if entry else None
+    
+    async def get_encoded(
+        self,
+        db: AsyncIOMotorDatabase,
+        content_hash: str,
+        encoding: Optional[str]
+    ) -> Optional[Tuple[bytes, Optional[str]]]:
+        """
+        Look up a stored summary as a ready-to-send JSON response body.
+        Summaries stored before pre-compression are encoded once and saved back.
+        
+        Args:
+            db: Database instance
+            content_hash: SHA-256 of the document
+            encoding: Negotiated content encoding ("br", "gzip") or None
+            
+        Returns:
+            Optional[Tuple[bytes, Optional[str]]]: (body, its Content-Encoding or None),
+                or None if not stored
+        """
+        entry = await self._load(db, content_hash)
+        if not entry:
+            return None
+        
+        encoded = entry["encoded"]
+        if encoded is None or (
+            len(encoded["identity"]) >= settings.COMPRESSION_MINIMUM_SIZE
+            and any(name not in encoded for name in SUPPORTED_ENCODINGS)
+        ):
+            encoded = entry["encoded"] = await asyncio.to_thread(encode_summary, entry["summary"])
+            await get_summaries_collection(db).update_one(
+                {"_id": content_hash},
+                {"$set": {"encoded": {k: v for k, v in encoded.items() if k != "identity"}}}
+            )
+        
+        if encoding in encoded:
+            return encoded[encoding], encoding
+        return encoded["identity"], None
+    
+    async def put(self, db: AsyncIOMotorDatabase, content_hash: str, summary: dict):
+        """
+        Store (or replace) the formatted summary for a document.
+        
+        Args:
+            db: Database instance
+            content_hash: SHA-256 of the document
+            summary: Formatted summary response (output of enhance_summary_response)
+        """
+        summary = copy.deepcopy(summary)
+        encoded = await asyncio.to_thread(encode_summary, summary)
+        await get_summaries_collection(db).update_one(
+            {"_id": content_hash},
+            {"$set": {
+                "summary": summary,
+                "encoded": {k: v for k, v in encoded.items() if k != "identity"},
+                "updated_at": datetime.utcnow()
+            }},
+            upsert=True
+        )
+        self._remember(content_hash, summary, encoded)
+
+    
+    async def delete(self, db: AsyncIOMotorDatabase, content_hash: str):
+        """
+        Remove a stored summary.
+        
+        Args:
+            db: Database instance
+            content_hash: SHA-256 of the document
+        """
+        self._lru.pop(content_hash, None)
+        await get_summaries_collection(db).delete_one({"_id": content_hash})
+
+
+# Global summary store instance
+_summary_store: Optional[SummaryStore] = None
+
+
+def get_summary_store() -> SummaryStore:
+    """Get the global summary store instance."""
+    global _summary_store
+    if _summary_store is None:
+        _summary_store = SummaryStore(settings.SUMMARY_CACHE_SIZE)
+    return _summary_store
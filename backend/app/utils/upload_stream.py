@@ -0,0 +1,279 @@
+"""
+Single-pass reading of file uploads straight from the request body.
+The multipart/form-data body is parsed as it arrives (no spooled copy), so
+an oversized upload is rejected from its Content-Length before any byte is
+read, or as soon as the running byte count passes the limit, and the file
+type is checked against its magic bytes before anything reaches storage.
+"""
+
+from typing import AsyncIterator, List, Optional, Tuple, Union
+
+import multipart
+from multipart.exceptions import MultipartParseError
+from multipart.multipart import parse_options_header
+from fastapi import HTTPException, Request, status
+
+
+# Allowed upload types and the magic bytes their files start with
+# (DOCX and PPTX are ZIP containers)
+ALLOWED_UPLOAD_TYPES = {
+    "application/pdf": (b"%PDF-",),
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": (b"PK\x03\x04",),
+    "application/vnd.openxmlformats-officedocument.presentationml.presentation": (b"PK\x03\x04",),
+}
+
+# Bytes needed to check any signature above
+SNIFF_SIZE = max(len(magic) for signatures in ALLOWED_UPLOAD_TYPES.values() for magic in signatures)
+
+# Allowance for multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD = 16 * 1024
+
+# File bytes gathered before each write to storage (bounds memory per upload)
+UPLOAD_WRITE_SIZE = 1024 * 1024
+
+
+class MultipartFileStream:
+    """
+    The file field of a multipart/form-data request, read from the request
+    body as it arrives. Call start() to parse up to the field's headers,
+    then iterate for the file's bytes.
+    """
+
+    def __init__(self, request: Request, field_name: str = "file"):
+        """
+        Initialize the reader.
+
+        Args:
+            request: Incoming request (body not yet consumed)
+            field_name: Form field holding the file
+        """
+        self.request = request
+        self.field_name = field_name
+        self.filename: Optional[str] = None
+        self.content_type: Optional[str] = None
+
+        self._events: List[Tuple[str, Union[bytes, dict]]] = []
+        self._header_field = b""
+        self._header_value = b""
+        self._headers = {}
+        self._parse = None
+
+    def _callbacks(self) -> dict:
+        """Parser callbacks recording events for the async side to consume."""
+        def on_part_begin():
+            self._headers = {}
+
+        def on_part_data(data: bytes, start: int, end: int):
+            self._events.append(("data", data[start:end]))
+
+        def on_part_end():
+            self._events.append(("end", b""))
+
+        def on_header_field(data: bytes, start: int, end: int):
+            self._header_field += data[start:end]
+
+        def on_header_value(data: bytes, start: int, end: int):
+            self._header_value += data[start:end]
+
+        def on_header_end():
+            self._headers[self._header_field.lower()] = self._header_value
+            self._header_field = b""
+            self._header_value = b""
+
+        def on_headers_finished():
+            # Copy: later parts in the same chunk reset the headers before start() sees this event
+            self._events.append(("headers", dict(self._headers)))
+
+        return {
+            "on_part_begin": on_part_begin,
+            "on_part_data": on_part_data,
+            "on_part_end": on_part_end,
+            "on_header_field": on_header_field,
+            "on_header_value": on_header_value,
+            "on_header_end": on_header_end,
+            "on_headers_finished": on_headers_finished,
+        }
+
+    async def _parse_events(self, boundary: bytes) -> AsyncIterator[Tuple[str, Union[bytes, dict]]]:
+        """
+        Feed the request body to the parser and yield its events in order.
+
+        Raises:
+            HTTPException: 400 if the body is not valid multipart/form-data
+        """
+        parser = multipart.MultipartParser(boundary, self._callbacks())
+
+        try:
+            async for chunk in self.request.stream():
+                parser.write(chunk)
+                events, self._events = self._events, []
+                for event in events:
+                    yield event
+
+            parser.finalize()
+        except MultipartParseError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Malformed multipart/form-data body"
+            )
+
+        for event in self._events:
+            yield event
+
+    async def start(self) -> bool:
+        """
+        Read the body up to the headers of the file field.
+
+        Returns:
+            bool: True if the field was found (filename and content_type are set)
+
+        Raises:
+            HTTPException: 400 if the body is not (well-formed) multipart/form-data
+        """
+        content_type, params = parse_options_header(self.request.headers.get("content-type", ""))
+        boundary = params.get(b"boundary")
+        if content_type != b"multipart/form-data" or not boundary:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Expected a multipart/form-data upload"
+            )
+
+        self._parse = self._parse_events(boundary)
+        async for kind, headers in self._parse:
+            if kind != "headers":
+                continue
+
+            _, disposition = parse_options_header(headers.get(b"content-disposition", b""))
+            name = disposition.get(b"name", b"").decode("utf-8", "replace")
+            if name == self.field_name and b"filename" in disposition:
+                self.filename = disposition[b"filename"].decode("utf-8", "replace")
+                self.content_type = headers.get(b"content-type", b"").decode("latin-1")
+                return True
+
+        return False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        """Yield the file's bytes in chunks of about UPLOAD_WRITE_SIZE."""
+        buffer = bytearray()
+
+        async for kind, data in self._parse:
+            if kind == "end":
+                break
+            buffer += data
+            if len(buffer) >= UPLOAD_WRITE_SIZE:
+                yield bytes(buffer)
+                buffer.clear()
+
+        if buffer:
+            yield bytes(buffer)
+
+
+def reject_oversized_request(request: Request, max_size: int):
+    """
+    Reject an upload from its Content-Length before reading the body.
+
+    Args:
+        request: Incoming request
+        max_size: Maximum file size in bytes
+
+    Raises:
+        HTTPException: 413 if the declared body cannot fit within the limit
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_size + MULTIPART_OVERHEAD:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File size exceeds {max_size // (1024 * 1024)}MB limit"
+        )
+
+
+async def checked_upload_chunks(
+    chunks: AsyncIterator[bytes],
+    content_type: str,
+    max_size: int
+) -> AsyncIterator[bytes]:
+    """
+    Pass the file's chunks through, enforcing the size limit as they arrive
+    and checking the magic bytes before the first chunk is released.
+
+    Args:
+        chunks: File bytes
+        content_type: Declared MIME type (a key of ALLOWED_UPLOAD_TYPES)
+        max_size: Maximum file size in bytes
+
+    Yields:
+        bytes: The same chunks
+
+    Raises:
+        HTTPException: 413 once the file passes max_size, 400 if it is empty
+        or its contents do not match the declared type
+    """
+    received = 0
+    head = b""
+
+    async for chunk in chunks:
+        received += len(chunk)
+        if received > max_size:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"File size exceeds {max_size // (1024 * 1024)}MB limit"
+            )
+
+        # Hold back the first bytes until there are enough to check the signature
+        if head is not None:
+            head += chunk
+            if len(head) < SNIFF_SIZE:
+                continue
+            check_file_signature(head, content_type)
+            chunk, head = head, None
+
+        yield chunk
+
+    if head is not None:
+        if not head:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Uploaded file is empty"
+            )
+        check_file_signature(head, content_type)
+        yield head
+
+
+def check_file_signature(head: bytes, content_type: str):
+    """
+    Check a file's first bytes against the magic bytes of its declared type.
+
+    Args:
+        head: At least SNIFF_SIZE bytes from the start of the file (fewer if the file is shorter)
+        content_type: Declared MIME type (a key of ALLOWED_UPLOAD_TYPES)
+
+    Raises:
+        HTTPException: 400 unless the file starts with one of the type's signatures
+    """
+    if not any(head.startswith(magic) for magic in ALLOWED_UPLOAD_TYPES[content_type]):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="File contents do not match its type. Only PDF, DOCX, and PPTX files are allowed."
+        )
+
+
+async def limit_chunks(chunks: AsyncIterator[bytes], limit: int) -> AsyncIterator[bytes]:
+    """
+    Pass chunks through, stopping with 413 once more than limit bytes arrive.
+
+    Args:
+        chunks: Incoming bytes
+        limit: Maximum bytes accepted
+
+    Yields:
+        bytes: The same chunks
+    """
+    received = 0
+    async for chunk in chunks:
+        received += len(chunk)
+        if received > limit:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail="Chunk goes past the declared upload size"
+            )
+        yield chunk
@@ -0,0 +1,135 @@
+"""
+YouTube video summaries keyed by canonical video ID.
+Every URL form (watch, youtu.be, embed, shorts, live, mobile, music,
+nocookie) maps to the same 11-character video ID, so a popular lecture is
+summarized once and served from MongoDB until its TTL expires.
+"""
+
+import re
+from datetime import datetime, timedelta
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.core.config import settings
+from app.db.database import get_youtube_summaries_collection
+
+
+VIDEO_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{11}$")
+
+YOUTUBE_HOSTS = (
+    "youtube.com",
+    "www.youtube.com",
+    "m.youtube.com",
+    "music.youtube.com",
+    "youtube-nocookie.com",
+    "www.youtube-nocookie.com",
+)
+
+# Path prefixes followed by the video ID (youtube.com/embed/<id>, /shorts/<id>, ...)
+PATH_PREFIXES = ("embed", "shorts", "live", "v", "e")
+
+
+def extract_video_id(url: str) -> Optional[str]:
+    """
+    Extract the canonical video ID from any YouTube URL form (or a bare ID).
+
+    Args:
+        url: URL as entered by the user
+
+    Returns:
+        Optional[str]: 11-character video ID, or None if the URL is not a YouTube video
+    """
+    url = url.strip()
+    if VIDEO_ID_PATTERN.match(url):
+        return url
+
+    if "://" not in url:
+        url = "https://" + url
+    parsed = urlparse(url)
+    host = (parsed.hostname or "").lower()
+    segments = [segment for segment in parsed.path.split("/") if segment]
+
+    candidate = None
+    if host in ("youtu.be", "www.youtu.be"):
+        candidate = segments[0] if segments else None
+    elif host in YOUTUBE_HOSTS:
+        if segments[:1] == ["watch"] or not segments:
+            candidate = parse_qs(parsed.query).get("v", [None])[0]
+        elif len(segments) >= 2 and segments[0] in PATH_PREFIXES:
+            candidate = segments[1]
+
+    if candidate and VIDEO_ID_PATTERN.match(candidate):
+        return candidate
+    return None
+
+
+def canonical_video_url(video_id: str) -> str:
+    """Build the canonical watch URL sent to the AI service."""
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+
+class YouTubeSummaryStore:
+    """
+    Video summaries in MongoDB ('youtube_summaries'), expiring after a TTL
+    (a TTL index removes them; reads also ignore expired entries).
+    """
+
+    def __init__(self, ttl_seconds: int = 604800):
+        """
+        Initialize the store.
+
+        Args:
+            ttl_seconds: How long a video summary is served before it is regenerated
+        """
+        self.ttl_seconds = ttl_seconds
+
+    async def get(self, db: AsyncIOMotorDatabase, video_id: str) -> Optional[dict]:
+        """
+        Look up a stored video summary.
+
+        Args:
+            db: Database instance
+            video_id: Canonical video ID
+
+        Returns:
+            Optional[dict]: AI service response, or None if missing or expired
+        """
+        stored = await get_youtube_summaries_collection(db).find_one({
+            "_id": video_id,
+            "expires_at": {"$gt": datetime.utcnow()}
+        })
+        return stored["summary"] if stored else None
+
+    async def put(self, db: AsyncIOMotorDatabase, video_id: str, summary: dict):
+        """
+        Store (or replace) a video summary.
+
+        Args:
+            db: Database instance
+            video_id: Canonical video ID
+            summary: AI service response
+        """
+        now = datetime.utcnow()
+        await get_youtube_summaries_collection(db).update_one(
+            {"_id": video_id},
+            {"$set": {
+                "summary": summary,
+                "created_at": now,
+                "expires_at": now + timedelta(seconds=self.ttl_seconds)
+            }},
+            upsert=True
+        )
+
+
+# Global YouTube summary store instance
+_youtube_store: Optional[YouTubeSummaryStore] = None
+
+
+def get_youtube_store() -> YouTubeSummaryStore:
+    """Get the global YouTube summary store instance."""
+    global _youtube_store
+    if _youtube_store is None:
+        _youtube_store = YouTubeSummaryStore(settings.YOUTUBE_SUMMARY_TTL_SECONDS)
+    return _youtube_store
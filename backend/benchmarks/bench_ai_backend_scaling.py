@@ -0,0 +1,159 @@
+"""
+Benchmark: AI throughput as backends are added to the pool.
+
+Starts N local stubs of the AI service, each with a fixed number of compute
+slots and a fixed service time (like one GPU instance), uploads a set of
+documents through AIBackendPool (least-outstanding placement) and then fires
+/ask calls routed by session affinity. Reports throughput, how requests were
+spread across backends, and any call that reached a backend not holding its
+session (should be 0).
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_ai_backend_scaling --backends 1 2 4 --slots 2 --service-ms 50
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Settings require these; the benchmark never touches MongoDB or OAuth
+os.environ.setdefault("DATABASE_URL", "mongodb://localhost:27017")
+os.environ.setdefault("GOOGLE_CLIENT_ID", "bench")
+os.environ.setdefault("GOOGLE_CLIENT_SECRET", "bench")
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("AI_HEALTH_POLL_INTERVAL", "0")
+
+from app.utils.ai_client import AIBackendPool  # noqa: E402
+
+
+class CapacityStubServer:
+    """Keep-alive HTTP stub with `slots` concurrent compute slots of `service_time` seconds each."""
+
+    def __init__(self, slots: int, service_time: float):
+        self.slots = asyncio.Semaphore(slots)
+        self.service_time = service_time
+        self.sessions = set()
+        self.served = 0
+        self.misrouted = 0
+        self.server = None
+        self.port = None
+
+    def _respond(self, writer: asyncio.StreamWriter, payload: dict, code: bytes = b"200 OK"):
+        body = json.dumps(payload).encode()
+        writer.write(
+            b"HTTP/1.1 " + code + b"\r\nContent-Type: application/json\r\n"
+            b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body
+        )
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                headers = await reader.readuntil(b"\r\n\r\n")
+                path = headers.split(b" ", 2)[1]
+                length = 0
+                for line in headers.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                body = await reader.readexactly(length) if length else b""
+
+                if path == b"/upload":
+                    session_id = str(uuid.uuid4())
+                    self.sessions.add(session_id)
+                    self._respond(writer, {"session_id": session_id})
+                elif json.loads(body or b"{}").get("session_id") not in self.sessions:
+                    self.misrouted += 1
+                    self._respond(writer, {"detail": "Session not found"}, b"404 Not Found")
+                else:
+                    async with self.slots:
+                        await asyncio.sleep(self.service_time)
+                    self.served += 1
+                    self._respond(writer, {"answer": "stub"})
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+
+async def run_pool(count: int, args) -> float:
+    """Upload documents and run the /ask load against `count` backends; return requests per second."""
+    servers = [CapacityStubServer(args.slots, args.service_ms / 1000) for _ in range(count)]
+    for server in servers:
+        await server.start()
+
+    pool = AIBackendPool([f"http://127.0.0.1:{server.port}" for server in servers])
+    await pool.start()
+
+    # New sessions: placed on the least loaded backend, like document activation
+    sessions = []
+    for _ in range(args.documents):
+        backend = pool.pick()
+        resp = await backend.post("/upload", operation="upload", content=b"%PDF-1.4 bench")
+        session_id = resp.json()["session_id"]
+        pool.bind(session_id, backend)
+        sessions.append(session_id)
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    rng = random.Random(0)
+    picks = [rng.choice(sessions) for _ in range(args.requests)]
+
+    async def ask(session_id: str):
+        async with semaphore:
+            resp = await pool.post(
+                "/ask", operation="ask", session_id=session_id,
+                json={"session_id": session_id, "question": "What are the main topics?"}
+            )
+            resp.raise_for_status()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(ask(session_id) for session_id in picks))
+    elapsed = time.perf_counter() - started
+
+    throughput = args.requests / elapsed
+    spread = " / ".join(str(server.served) for server in servers)
+    misrouted = sum(server.misrouted for server in servers)
+    print(f"{count:2d} backend(s)  {elapsed * 1000:9.1f} ms  {throughput:8.1f} req/s  "
+          f"served {spread:<24} misrouted {misrouted}")
+
+    await pool.close()
+    for server in servers:
+        await server.stop()
+    return throughput
+
+
+async def main(args):
+    capacity = 1000 / args.service_ms * args.slots
+    print(f"{args.requests} /ask calls over {args.documents} documents, concurrency {args.concurrency}; "
+          f"each backend: {args.slots} slots x {args.service_ms:g} ms (~{capacity:.0f} req/s)\n")
+
+    baseline = None
+    for count in args.backends:
+        throughput = await run_pool(count, args)
+        baseline = baseline or throughput
+        print(f"{'':14}scaling x{throughput / baseline:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--slots", type=int, default=2, help="Concurrent compute slots per backend")
+    parser.add_argument("--service-ms", type=float, default=50, help="Compute time per call in milliseconds")
+    parser.add_argument("--documents", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,161 @@
+"""
+Benchmark: pooled AI gateway client vs. a new httpx client per call.
+
+Starts a local stub of the AI service (HTTP/1.1 keep-alive, optional TLS with a
+self-signed certificate) that counts accepted connections, then fires the same
+number of /ask-style POSTs through both strategies.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_ai_client_pool --requests 200 --concurrency 10 --tls
+"""
+
+import argparse
+import asyncio
+import os
+import ssl
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Settings require these; the benchmark never touches MongoDB or OAuth
+os.environ.setdefault("DATABASE_URL", "mongodb://localhost:27017")
+os.environ.setdefault("GOOGLE_CLIENT_ID", "bench")
+os.environ.setdefault("GOOGLE_CLIENT_SECRET", "bench")
+os.environ.setdefault("SECRET_KEY", "bench")
+
+import httpx  # noqa: E402
+
+from app.utils.ai_client import AIServiceClient  # noqa: E402
+
+
+class StubAIServer:
+    """Minimal keep-alive HTTP server that answers every request with a small JSON body."""
+
+    BODY = b'{"answer": "stub"}'
+
+    def __init__(self, ssl_context=None):
+        self.ssl_context = ssl_context
+        self.connections = 0
+        self.server = None
+        self.port = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            while True:
+                headers = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in headers.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                if length:
+                    await reader.readexactly(length)
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    b"Content-Length: " + str(len(self.BODY)).encode() + b"\r\n\r\n" + self.BODY
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ssl.SSLError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0, ssl=self.ssl_context)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+
+def make_self_signed_context() -> ssl.SSLContext:
+    """Create a server SSL context with a throwaway self-signed certificate."""
+    from datetime import datetime, timedelta
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name).issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(datetime.utcnow() - timedelta(days=1))
+        .not_valid_after(datetime.utcnow() + timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+
+    tmp = tempfile.mkdtemp()
+    cert_path, key_path = os.path.join(tmp, "cert.pem"), os.path.join(tmp, "key.pem")
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.TraditionalOpenSSL,
+            serialization.NoEncryption()
+        ))
+
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert_path, key_path)
+    return context
+
+
+async def run_strategy(name, base_url, server, total, concurrency, send):
+    """Run `total` requests with bounded concurrency and report time and connections."""
+    server.connections = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await send()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+
+    print(f"{name:<28} {elapsed * 1000:9.1f} ms  {total / elapsed:8.1f} req/s  "
+          f"{server.connections:5d} connections")
+
+
+async def main(args):
+    server = StubAIServer(make_self_signed_context() if args.tls else None)
+    await server.start()
+    scheme = "https" if args.tls else "http"
+    base_url = f"{scheme}://127.0.0.1:{server.port}"
+    payload = {"session_id": "bench", "question": "What are the main topics?"}
+
+    print(f"Stub AI service at {base_url} - {args.requests} requests, concurrency {args.concurrency}\n")
+
+    async def per_call_client():
+        # Previous behaviour: a fresh client (and handshake) for every call
+        async with httpx.AsyncClient(timeout=None, verify=False) as client:
+            resp = await client.post(f"{base_url}/ask", json=payload)
+            resp.raise_for_status()
+
+    gateway = AIServiceClient(base_url)
+    await gateway.start()
+
+    async def pooled_client():
+        resp = await gateway.post("/ask", operation="ask", json=payload)
+        resp.raise_for_status()
+
+    await run_strategy("new client per call", base_url, server, args.requests, args.concurrency, per_call_client)
+    await run_strategy("pooled AI gateway", base_url, server, args.requests, args.concurrency, pooled_client)
+
+    await gateway.close()
+    await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--tls", action="store_true", help="Serve the stub over TLS (self-signed)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,155 @@
+"""
+Benchmark: bytes on the wire and CPU cost of response compression per endpoint.
+
+Serves representative payloads (a long markdown summary, a 10-question quiz,
+a 50-document content list) through CompressionMiddleware and reports, per
+endpoint and negotiated encoding, the response size and the CPU time spent
+compressing each response. Stored summaries are also served the way
+summarize_content does on a cache hit: pre-compressed once at the maximum
+level, so the per-hit compression cost is zero.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_response_compression --iterations 200
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Settings require these; the benchmark never touches MongoDB or OAuth
+os.environ.setdefault("DATABASE_URL", "mongodb://localhost:27017")
+os.environ.setdefault("GOOGLE_CLIENT_ID", "bench")
+os.environ.setdefault("GOOGLE_CLIENT_SECRET", "bench")
+os.environ.setdefault("SECRET_KEY", "bench")
+
+import httpx  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+from fastapi.responses import Response  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.middleware.compression import CompressionMiddleware  # noqa: E402
+from app.utils.compression import SUPPORTED_ENCODINGS, compress  # noqa: E402
+from app.utils.summary_store import encode_summary, render_summary  # noqa: E402
+
+
+WORDS = (
+    "cell membrane protein energy transport gradient diffusion osmosis enzyme substrate "
+    "reaction equilibrium molecule structure function process system cycle photosynthesis "
+    "respiration glucose oxygen carbon mitochondria chloroplast nucleus genetic expression "
+    "regulation pathway signal receptor hormone response stimulus example important key"
+).split()
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def make_summary(rng: random.Random) -> dict:
+    """Markdown summary of roughly 12 KB, shaped like enhance_summary_response output."""
+    parts = ["# Chapter Summary\n"]
+    for section in range(8):
+        parts.append(f"\n## Section {section + 1}: {sentence(rng, 4)}\n")
+        parts.append(" ".join(sentence(rng, rng.randint(10, 20)) for _ in range(4)) + "\n")
+        parts.extend(f"- **{rng.choice(WORDS).title()}**: {sentence(rng, 12)}\n" for _ in range(4))
+    return {"summary": "".join(parts)}
+
+
+def make_quiz(rng: random.Random) -> dict:
+    """Ten multiple-choice questions, shaped like QuizResponse."""
+    return {"questions": [
+        {
+            "question": sentence(rng, 14)[:-1] + "?",
+            "options": [sentence(rng, 5) for _ in range(4)],
+            "correct_answer": "B",
+            "explanation": sentence(rng, 25)
+        }
+        for _ in range(10)
+    ]}
+
+
+def make_content_list(rng: random.Random) -> dict:
+    """Fifty documents, shaped like GET /content/."""
+    now = datetime(2025, 1, 1)
+    return {"content": [
+        {
+            "_id": "%024x" % rng.getrandbits(96),
+            "user_id": "65f0c0ffee0000000000beef",
+            "filename": f"{rng.choice(WORDS)}_{rng.choice(WORDS)}_notes_{i}.pdf",
+            "content_type": "application/pdf",
+            "file_size": rng.randint(100_000, 50_000_000),
+            "upload_date": (now + timedelta(hours=i)).isoformat()
+        }
+        for i in range(50)
+    ]}
+
+
+def cpu_per_call(func, iterations: int) -> float:
+    """CPU microseconds per call."""
+    started = time.process_time()
+    for _ in range(iterations):
+        func()
+    return (time.process_time() - started) / iterations * 1_000_000
+
+
+async def main(args):
+    rng = random.Random(0)
+    payloads = {
+        "summarize": make_summary(rng),
+        "quiz": make_quiz(rng),
+        "content list": make_content_list(rng)
+    }
+    stored = encode_summary(payloads["summarize"])
+
+    app = FastAPI()
+    for name, payload in payloads.items():
+        app.add_api_route(f"/{name.replace(' ', '-')}", lambda payload=payload: payload)
+
+    @app.get("/summarize-stored")
+    async def stored_summary(request_encoding: str = ""):
+        body, encoding = (stored[request_encoding], request_encoding) if request_encoding in stored else (stored["identity"], None)
+        headers = {"Content-Encoding": encoding} if encoding else {}
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MINIMUM_SIZE)
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+    encodings = ["identity", *SUPPORTED_ENCODINGS]
+    print(f"Threshold {settings.COMPRESSION_MINIMUM_SIZE} B, gzip level {settings.COMPRESSION_GZIP_LEVEL}, "
+          f"brotli quality {settings.COMPRESSION_BROTLI_QUALITY}"
+          f"{'' if 'br' in SUPPORTED_ENCODINGS else ' (brotli not installed)'}\n")
+    print(f"{'endpoint':<20} {'encoding':<9} {'wire bytes':>11} {'ratio':>7} {'CPU/response':>14}")
+
+    for name, payload in [*payloads.items(), ("summarize (stored)", payloads["summarize"])]:
+        body = render_summary(payload)
+        for encoding in encodings:
+            if name == "summarize (stored)":
+                resp = await client.get("/summarize-stored", params={"request_encoding": encoding},
+                                        headers={"Accept-Encoding": encoding})
+                cost = 0.0  # Compressed once when the summary was stored
+            else:
+                resp = await client.get(f"/{name.replace(' ', '-')}", headers={"Accept-Encoding": encoding})
+                compressed = resp.headers.get("content-encoding")
+                cost = cpu_per_call(lambda body=body, encoding=encoding: compress(body, encoding), args.iterations) if compressed else 0.0
+
+            wire = resp.num_bytes_downloaded
+            print(f"{name:<20} {encoding:<9} {wire:>11,d} {len(body) / wire:>6.1f}x {cost:>11.0f} us")
+        print()
+
+    one_time = cpu_per_call(lambda: encode_summary(payloads["summarize"]), max(1, args.iterations // 10))
+    print(f"Stored summary: {one_time:.0f} us once per summary to render and pre-compress "
+          f"({', '.join(SUPPORTED_ENCODINGS)} at maximum level), 0 us per cache hit")
+
+    await client.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200, help="Compressions timed per endpoint and encoding")
+    asyncio.run(main(parser.parse_args()))
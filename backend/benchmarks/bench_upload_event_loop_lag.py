@@ -0,0 +1,193 @@
+"""
+Benchmark: event-loop lag while stored files are uploaded to the AI service.
+
+Compares the previous activation upload (synchronous open() + os.path.getsize,
+file object handed to httpx, which reads it on the event loop) with the
+streamed AsyncMultipartFile body (aiofiles chunks in the thread pool).
+A ticker task measures how late the event loop wakes it up while N
+activations run concurrently against a local stub that discards the body.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_upload_event_loop_lag --size-mb 50 --concurrency 8 --cold
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Settings require these; the benchmark never touches MongoDB or OAuth
+os.environ.setdefault("DATABASE_URL", "mongodb://localhost:27017")
+os.environ.setdefault("GOOGLE_CLIENT_ID", "bench")
+os.environ.setdefault("GOOGLE_CLIENT_SECRET", "bench")
+os.environ.setdefault("SECRET_KEY", "bench")
+
+import httpx  # noqa: E402
+
+from app.utils.multipart import AsyncMultipartFile  # noqa: E402
+
+
+class DiscardingUploadServer:
+    """Keep-alive HTTP server that reads and discards request bodies, then returns a session_id."""
+
+    BODY = b'{"session_id": "bench"}'
+
+    def __init__(self):
+        self.server = None
+        self.port = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                headers = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                chunked = False
+                for line in headers.split(b"\r\n"):
+                    lower = line.lower()
+                    if lower.startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                    if lower.startswith(b"transfer-encoding:") and b"chunked" in lower:
+                        chunked = True
+
+                if chunked:
+                    while True:
+                        size = int((await reader.readuntil(b"\r\n")).strip(), 16)
+                        await reader.readexactly(size + 2)
+                        if size == 0:
+                            break
+                while length:
+                    length -= len(await reader.read(min(length, 1024 * 1024)))
+
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    b"Content-Length: " + str(len(self.BODY)).encode() + b"\r\n\r\n" + self.BODY
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+
+async def measure_lag(stop: asyncio.Event, interval: float, samples: list):
+    """Record how late the loop resumes a task that sleeps `interval` seconds."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(loop.time() - start - interval)
+
+
+def evict_from_page_cache(paths):
+    """Drop the files from the OS page cache so reads hit the disk (Linux only)."""
+    for path in paths:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+async def run_strategy(name, upload, paths, interval, cold):
+    """Run one activation per file concurrently and report event-loop lag."""
+    if cold:
+        evict_from_page_cache(paths)
+
+    samples = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(measure_lag(stop, interval, samples))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(upload(path) for path in paths))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await ticker
+
+    samples.sort()
+    p99 = samples[int(len(samples) * 0.99) - 1] if samples else 0.0
+    print(f"{name:<30} {elapsed * 1000:9.1f} ms   lag max {max(samples or [0]) * 1000:7.2f} ms   "
+          f"p99 {p99 * 1000:6.2f} ms   mean {statistics.mean(samples or [0]) * 1000:5.2f} ms")
+
+
+async def peak_memory(upload, paths) -> float:
+    """Peak Python heap (MB) while running the uploads."""
+    tracemalloc.start()
+    await asyncio.gather(*(upload(path) for path in paths))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+async def main(args):
+    server = DiscardingUploadServer()
+    await server.start()
+
+    tmp = tempfile.mkdtemp()
+    paths = []
+    for i in range(args.concurrency):
+        path = os.path.join(tmp, f"doc{i}.pdf")
+        with open(path, "wb") as f:
+            f.write(os.urandom(args.size_mb * 1024 * 1024))
+        paths.append(path)
+
+    print(f"{args.concurrency} concurrent activations of {args.size_mb} MB files "
+          f"({'cold' if args.cold else 'warm'} page cache), lag sampled every {args.interval * 1000:.0f} ms\n")
+
+    client = httpx.AsyncClient(base_url=f"http://127.0.0.1:{server.port}", timeout=None)
+
+    async def sync_file_upload(path):
+        # Previous behaviour in activate_document_on_ai_server
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        os.path.getsize(path)
+        with open(path, "rb") as f:
+            files = {"file": (os.path.basename(path), f, "application/pdf")}
+            resp = await client.post("/upload", files=files)
+            resp.raise_for_status()
+
+    async def streamed_upload(path):
+        size = (await asyncio.to_thread(os.stat, path)).st_size
+        body = AsyncMultipartFile(path, size, os.path.basename(path), "application/pdf")
+        resp = await client.post("/upload", content=body, headers=body.headers)
+        resp.raise_for_status()
+
+    for _ in range(args.rounds):
+        await run_strategy("sync open() + files=", sync_file_upload, paths, args.interval, args.cold)
+        await run_strategy("AsyncMultipartFile (aiofiles)", streamed_upload, paths, args.interval, args.cold)
+
+    if args.memory:
+        print()
+        for name, upload in (("sync open() + files=", sync_file_upload), ("AsyncMultipartFile", streamed_upload)):
+            print(f"{name:<30} peak traced memory {await peak_memory(upload, paths):7.2f} MB")
+
+    await client.aclose()
+    await server.stop()
+    for path in paths:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--interval", type=float, default=0.005, help="Lag sampling interval in seconds")
+    parser.add_argument("--rounds", type=int, default=2)
+    parser.add_argument("--cold", action="store_true", help="Evict the files from the page cache before each run (Linux)")
+    parser.add_argument("--memory", action="store_true", help="Also report peak traced memory per strategy")
+    asyncio.run(main(parser.parse_args()))
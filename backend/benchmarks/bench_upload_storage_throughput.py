@@ -0,0 +1,202 @@
+"""
+Benchmark: throughput and disk writes for concurrent large uploads into storage.
+
+Sends N concurrent multipart uploads (50 MB each by default) through two
+ways of getting them into blob storage:
+  - spool + copy:        Starlette spools the body to a temp file, which is then
+                         read back 1 MB at a time, written again with blocking
+                         f.write on the event loop and hashed by a second read
+                         (the upload path before single-pass streaming)
+  - streamed:            the body is parsed as it arrives and written once, then
+                         renamed into its blob (the upload endpoint)
+For each, reports aggregate MB/s, bytes written per upload as counted by the
+kernel (/proc/self/io, Linux; kernel copies count too), and the worst
+event-loop stall.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_upload_storage_throughput --size-mb 50 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Settings require these; the benchmark never touches MongoDB or OAuth
+os.environ.setdefault("DATABASE_URL", "mongodb://localhost:27017")
+os.environ.setdefault("GOOGLE_CLIENT_ID", "bench")
+os.environ.setdefault("GOOGLE_CLIENT_SECRET", "bench")
+os.environ.setdefault("SECRET_KEY", "bench")
+
+from bson import ObjectId  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+
+from app.utils.file_manager import FileManager  # noqa: E402
+from app.utils.upload_stream import MultipartFileStream, checked_upload_chunks  # noqa: E402
+
+
+BOUNDARY = "benchboundary"
+
+# Request body bytes per ASGI message (what uvicorn typically delivers)
+RECEIVE_CHUNK = 64 * 1024
+
+
+class InMemoryBlobs:
+    """Stand-in for the 'blobs' collection (only the calls FileManager makes on save)."""
+
+    def __init__(self):
+        self.refs = {}
+
+    async def update_one(self, query, update, upsert=False):
+        self.refs.setdefault(query["_id"], set()).update(update.get("$addToSet", {}).values())
+
+
+class BenchDatabase:
+    """Stand-in for the database handle passed to FileManager."""
+
+    def __init__(self):
+        self.blobs = InMemoryBlobs()
+
+
+def make_request(payload: bytes) -> Request:
+    """A multipart upload request whose body arrives in RECEIVE_CHUNK messages."""
+    head = (
+        f"--{BOUNDARY}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="notes.pdf"\r\n'
+        "Content-Type: application/pdf\r\n\r\n"
+    ).encode()
+    tail = f"\r\n--{BOUNDARY}--\r\n".encode()
+    body = memoryview(head + payload + tail)
+    position = 0
+
+    async def receive():
+        nonlocal position
+        chunk = bytes(body[position:position + RECEIVE_CHUNK])
+        position += len(chunk)
+        await asyncio.sleep(0)  # Let other uploads interleave, as with real sockets
+        return {"type": "http.request", "body": chunk, "more_body": position < len(body)}
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/content/upload",
+        "headers": [
+            (b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode()),
+            (b"content-length", str(len(body)).encode()),
+        ],
+    }
+    return Request(scope, receive)
+
+
+async def spool_and_copy(file_manager: FileManager, db, request: Request):
+    """Previous upload path: spool, Python read/write copy on the event loop, second read to hash."""
+    form = await request.form()
+    upload = form["file"]
+    content_id = str(ObjectId())
+    file_path = file_manager.upload_directory / content_id
+    temp_path = file_path.with_suffix(".tmp")
+
+    with open(temp_path, "wb") as f:
+        await upload.seek(0)
+        while chunk := await upload.read(1024 * 1024):
+            f.write(chunk)
+    os.replace(temp_path, file_path)
+
+    sha256_hash = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(8192):
+            sha256_hash.update(chunk)
+    await form.close()
+
+
+async def streamed(file_manager: FileManager, db, request: Request):
+    """Single pass from the request body into storage (the upload endpoint)."""
+    upload = MultipartFileStream(request)
+    await upload.start()
+    chunks = checked_upload_chunks(upload, upload.content_type, 1 << 40)
+    await file_manager.save_upload_stream(chunks, str(ObjectId()), db)
+
+
+STRATEGIES = {
+    "spool + copy": spool_and_copy,
+    "streamed": streamed,
+}
+
+
+def io_counters() -> dict:
+    """Bytes written by this process: 'wchar' (write syscalls) and 'write_bytes' (sent to storage)."""
+    try:
+        with open("/proc/self/io") as f:
+            return {key: int(value) for key, value in (line.split(": ") for line in f)}
+    except OSError:
+        return {}
+
+
+async def measure_lag(stop: asyncio.Event, samples: list):
+    """Record how late the loop resumes a task sleeping 5 ms."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(0.005)
+        samples.append(loop.time() - start - 0.005)
+
+
+async def run_strategy(name, strategy, args, base_payload):
+    upload_directory = tempfile.mkdtemp(prefix="bench_uploads_", dir=args.upload_dir)
+    file_manager = FileManager(upload_directory)
+    db = BenchDatabase()
+
+    # Distinct files, so deduplication never skips a write
+    requests = [make_request(b"%PDF-" + os.urandom(16) + base_payload) for _ in range(args.concurrency)]
+
+    samples = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(measure_lag(stop, samples))
+    before = io_counters()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(strategy(file_manager, db, request) for request in requests))
+    elapsed = time.perf_counter() - started
+
+    after = io_counters()
+    stop.set()
+    await ticker
+    shutil.rmtree(upload_directory)
+
+    total_mb = args.size_mb * args.concurrency
+    written = {key: (after[key] - before[key]) / args.concurrency / 2**20 for key in ("wchar", "write_bytes")} if after else {}
+    print(
+        f"{name:<20} {total_mb / elapsed:>8.0f} MB/s"
+        f" {written.get('wchar', float('nan')):>10.0f} MB {written.get('write_bytes', float('nan')):>13.0f} MB"
+        f" {max(samples, default=0) * 1000:>12.1f} ms"
+    )
+
+
+async def main(args):
+    base_payload = os.urandom(args.size_mb * 2**20 - 21)
+
+    print(f"{args.concurrency} concurrent uploads of {args.size_mb} MB "
+          f"(upload directory under {args.upload_dir or tempfile.gettempdir()}, spools in {tempfile.gettempdir()})\n")
+    print(f"{'strategy':<20} {'throughput':>13} {'written':>13} {'to storage':>16} {'max loop stall':>15}")
+    for name in args.strategies:
+        for _ in range(args.repeat):
+            await run_strategy(name, STRATEGIES[name], args, base_payload)
+    print("\nPer upload: 'written' counts bytes passed to write syscalls and kernel copies; 'to storage' counts "
+          "bytes the kernel queued for the disk (files deleted before writeback still count)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=50, help="Size of each upload")
+    parser.add_argument("--concurrency", type=int, default=8, help="Uploads in flight at once")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per strategy")
+    parser.add_argument("--upload-dir", default=None,
+                        help="Parent of the temporary upload directory (another file system than the spools shows the cross-device copy)")
+    parser.add_argument("--strategies", nargs="+", default=list(STRATEGIES), choices=list(STRATEGIES))
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,297 @@
+"""
+Stress test: FileManager shared by several worker processes.
+
+Starts --processes worker processes (like uvicorn --workers N) on one upload
+directory. Each runs --tasks concurrent tasks that upload a few identical
+files over and over (so every upload races on the same blobs) and delete
+its earlier uploads soon after (so blobs keep losing their last
+reference). The 'blobs' reference counts live in a store shared by all
+processes with atomic single-document updates, as in MongoDB, and
+storage calls are delayed by a random jitter to widen race windows.
+Workers check that an upload stays readable for as long as they hold a
+reference to it (a later upload of the same file can silently restore a
+wrongly deleted blob, so the end state alone would hide races), and
+afterwards the invariant FileManager promises is checked:
+  - every blob with references exists and has the right contents
+  - no blob file exists without references
+  - no temporary or lock files are left behind
+Run once per lock mode: "process" (asyncio locks, expected to break with
+several processes) and "file" (fcntl lock files, expected to hold).
+No MongoDB needed.
+
+Usage (from the backend directory):
+    python -m benchmarks.stress_file_manager_processes --processes 4 --tasks 4 --operations 300
+"""
+
+import argparse
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing.managers import BaseManager
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Settings require these; the stress test never touches MongoDB or OAuth
+os.environ.setdefault("DATABASE_URL", "mongodb://localhost:27017")
+os.environ.setdefault("GOOGLE_CLIENT_ID", "stress")
+os.environ.setdefault("GOOGLE_CLIENT_SECRET", "stress")
+os.environ.setdefault("SECRET_KEY", "stress")
+
+from bson import ObjectId  # noqa: E402
+
+from app.utils.file_manager import FileManager  # noqa: E402
+from app.utils.keyed_lock import FileKeyedLock, KeyedLock  # noqa: E402
+from app.utils.storage import LocalStorage  # noqa: E402
+
+
+AUTHKEY = b"stress"
+
+
+class SharedBlobs:
+    """
+    The 'blobs' collection, shared by all processes through a manager.
+    Each call is atomic, like a single-document update in MongoDB.
+    """
+
+    def __init__(self):
+        self._refs = {}
+        self._unreadable = 0
+        self._lock = threading.Lock()
+
+    def add_ref(self, blob_id: str, content_id: str):
+        with self._lock:
+            self._refs.setdefault(blob_id, set()).add(content_id)
+
+    def pull_ref(self, blob_id: str, content_id: str) -> int:
+        with self._lock:
+            refs = self._refs.get(blob_id)
+            if refs is None or content_id not in refs:
+                return 0
+            refs.discard(content_id)
+            return 1
+
+    def delete_if_unreferenced(self, blob_id: str) -> int:
+        with self._lock:
+            if blob_id in self._refs and not self._refs[blob_id]:
+                del self._refs[blob_id]
+                return 1
+            return 0
+
+    def record_unreadable(self):
+        with self._lock:
+            self._unreadable += 1
+
+    def unreadable(self) -> int:
+        with self._lock:
+            return self._unreadable
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {blob_id: set(refs) for blob_id, refs in self._refs.items()}
+
+
+_shared_blobs = SharedBlobs()
+
+
+def get_shared_blobs() -> SharedBlobs:
+    return _shared_blobs
+
+
+class StressManager(BaseManager):
+    pass
+
+
+StressManager.register("get_shared_blobs", callable=get_shared_blobs)
+
+
+class Result:
+    def __init__(self, modified_count: int = 0, deleted_count: int = 0):
+        self.modified_count = modified_count
+        self.deleted_count = deleted_count
+
+
+class BlobsCollection:
+    """The calls FileManager makes on the 'blobs' collection, forwarded to the shared store."""
+
+    def __init__(self, shared):
+        self.shared = shared
+
+    async def update_one(self, query, update, upsert=False):
+        await asyncio.sleep(0)
+        if "$addToSet" in update:
+            self.shared.add_ref(query["_id"], update["$addToSet"]["refs"])
+            return Result(modified_count=1)
+        return Result(modified_count=self.shared.pull_ref(query["_id"], update["$pull"]["refs"]))
+
+    async def delete_one(self, query):
+        await asyncio.sleep(0)
+        return Result(deleted_count=self.shared.delete_if_unreferenced(query["_id"]))
+
+
+class StressDatabase:
+    """Stand-in for the database handle passed to FileManager."""
+
+    def __init__(self, shared):
+        self.blobs = BlobsCollection(shared)
+
+
+class JitterStorage(LocalStorage):
+    """Local storage that pauses before each call, so processes interleave inside critical sections."""
+
+    def __init__(self, root: str, jitter: float):
+        super().__init__(root)
+        self.jitter = jitter
+
+    async def _pause(self):
+        await asyncio.sleep(random.uniform(0, self.jitter))
+
+    async def size(self, key):
+        await self._pause()
+        return await super().size(key)
+
+    async def put_file(self, key, path, size):
+        await self._pause()
+        await super().put_file(key, path, size)
+
+    async def delete(self, key):
+        await self._pause()
+        return await super().delete(key)
+
+
+def payloads(count: int) -> list:
+    """The files uploaded over and over (identical across processes)."""
+    return [b"%PDF-" + hashlib.sha256(str(i).encode()).digest() * 4096 for i in range(count)]
+
+
+async def worker_main(args, upload_directory: str, address):
+    random.seed()  # Forked workers would otherwise share one random sequence
+    manager = StressManager(address=address, authkey=AUTHKEY)
+    manager.connect()
+    shared = manager.get_shared_blobs()
+    db = StressDatabase(shared)
+
+    locks = FileKeyedLock(Path(upload_directory) / ".locks") if args.mode == "file" else KeyedLock()
+    file_manager = FileManager(upload_directory, storage=JitterStorage(upload_directory, args.jitter_ms / 1000), locks=locks)
+    files = payloads(args.files)
+
+    async def check_readable(content_id, content_hash):
+        # We hold a reference, so the blob must be there
+        if await file_manager.get_file_size(content_id, content_hash) is None:
+            shared.record_unreadable()
+
+    async def chunks(data: bytes):
+        for start in range(0, len(data), 32 * 1024):
+            yield data[start:start + 32 * 1024]
+
+    async def task():
+        owned = []
+        for _ in range(args.operations):
+            if len(owned) >= args.keep or (owned and random.random() < 0.5):
+                content_id, content_hash = owned.pop(random.randrange(len(owned)))
+                await check_readable(content_id, content_hash)
+                await file_manager.delete_file(content_id, db, content_hash)
+            else:
+                content_id = str(ObjectId())
+                _, _, content_hash = await file_manager.save_upload_stream(
+                    chunks(random.choice(files)), content_id, db
+                )
+                await check_readable(content_id, content_hash)
+                owned.append((content_id, content_hash))
+
+    await asyncio.gather(*(task() for _ in range(args.tasks)))
+
+
+def run_worker(args, upload_directory: str, address):
+    asyncio.run(worker_main(args, upload_directory, address))
+
+
+def check(upload_directory: str, refs: dict, files: list) -> dict:
+    """Compare the shared reference counts with the blobs on disk."""
+    storage = LocalStorage(upload_directory)
+    expected = {hashlib.sha256(data).hexdigest() for data in files}
+    problems = {"missing blobs": 0, "corrupt blobs": 0, "orphan blobs": 0, "leftover files": 0}
+
+    for blob_id, content_ids in refs.items():
+        path = storage.path_for(f"blobs/{blob_id}")
+        if not content_ids:
+            continue
+        if not path.exists():
+            problems["missing blobs"] += 1
+        elif hashlib.sha256(path.read_bytes()).hexdigest() != blob_id:
+            problems["corrupt blobs"] += 1
+
+    for blob_id in expected:
+        if storage.path_for(f"blobs/{blob_id}").exists() and not refs.get(blob_id):
+            problems["orphan blobs"] += 1
+
+    root = Path(upload_directory)
+    problems["leftover files"] = sum(
+        1 for path in root.rglob("*")
+        if path.is_file() and (path.suffix in (".tmp", ".part", ".lock"))
+    )
+    return problems
+
+
+def run_mode(args, mode: str) -> bool:
+    args.mode = mode
+    upload_directory = tempfile.mkdtemp(prefix="stress_uploads_", dir=args.upload_dir)
+
+    manager = StressManager(address=("127.0.0.1", 0), authkey=AUTHKEY)
+    manager.start()
+    try:
+        workers = [
+            multiprocessing.Process(target=run_worker, args=(args, upload_directory, manager.address))
+            for _ in range(args.processes)
+        ]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+
+        failed_workers = sum(1 for worker in workers if worker.exitcode != 0)
+        refs = manager.get_shared_blobs().snapshot()
+        unreadable = manager.get_shared_blobs().unreadable()
+    finally:
+        manager.shutdown()
+
+    problems = {"unreadable uploads": unreadable, **check(upload_directory, refs, payloads(args.files))}
+    shutil.rmtree(upload_directory)
+
+    operations = args.processes * args.tasks * args.operations
+    ok = failed_workers == 0 and not any(problems.values())
+    details = ", ".join(f"{name} {count}" for name, count in problems.items())
+    print(f"{mode:<8} {operations / elapsed:>8.0f} op/s  workers failed {failed_workers}, {details}"
+          f"  -> {'OK' if ok else 'BROKEN'}")
+    return ok
+
+
+def main(args):
+    print(f"{args.processes} processes x {args.tasks} tasks x {args.operations} operations "
+          f"on {args.files} distinct files, storage jitter up to {args.jitter_ms} ms\n")
+    results = {mode: run_mode(args, mode) for mode in args.modes}
+    # Only "file" mode promises safety across processes
+    sys.exit(0 if results.get("file", True) else 1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=4, help="Worker processes")
+    parser.add_argument("--tasks", type=int, default=4, help="Concurrent tasks per process")
+    parser.add_argument("--operations", type=int, default=300, help="Uploads/deletes per task")
+    parser.add_argument("--files", type=int, default=4, help="Distinct files (fewer means more contention)")
+    parser.add_argument("--keep", type=int, default=1,
+                        help="Uploads a task holds before deleting one (few, so blobs keep losing their last reference)")
+    parser.add_argument("--jitter-ms", type=float, default=2.0, help="Random delay before each storage call")
+    parser.add_argument("--upload-dir", default=None, help="Parent of the temporary upload directory")
+    parser.add_argument("--modes", nargs="+", default=["process", "file"], choices=["process", "file"])
+    main(parser.parse_args())
@@ -0,0 +1,45 @@
+"""
+Tests for AnswerCache matching: rephrased repeats hit, near-miss questions don't.
+"""
+
+import pytest
+
+from app.utils.answer_cache import AnswerCache
+
+
+def cached(asked: str, stored: str) -> bool:
+    """Whether asking `asked` returns the answer cached for `stored`."""
+    cache = AnswerCache()
+    cache.put("doc", stored, {"answer": stored})
+    return cache.get("doc", asked) is not None
+
+
+@pytest.mark.parametrize("stored, asked", [
+    ("What are the main topics?", "what are the main topics"),
+    ("What are the main topics?", "What are the main topics covered in this document?"),
+    ("Explain photosynthesis", "Can you please explain photosynthesis?"),
+])
+def test_rephrased_repeat_hits(stored, asked):
+    assert cached(asked, stored)
+
+
+@pytest.mark.parametrize("stored, asked", [
+    ("What are the advantages of X?", "What are the disadvantages of X?"),
+    ("Is the process possible?", "Is the process impossible?"),
+    ("How does TCP handle packet loss?", "How does UDP handle packet loss?"),
+    ("Summarize chapter one", "Summarize chapter two"),
+    ("Summarize chapter 2", "Summarize chapter 3"),
+    ("Is the function continuous?", "Is the function not continuous?"),
+    ("Does the algorithm terminate?", "Why doesn't the algorithm terminate?"),
+    ("Does inflation cause unemployment?", "Does unemployment cause inflation?"),
+    ("What is it?", "What is this?"),
+])
+def test_near_miss_is_a_miss(stored, asked):
+    assert not cached(asked, stored)
+
+
+def test_returns_a_copy():
+    cache = AnswerCache()
+    cache.put("doc", "What is X?", {"answer": "X"})
+    cache.get("doc", "What is X?")["answer"] = "changed"
+    assert cache.get("doc", "what is x")["answer"] == "X"
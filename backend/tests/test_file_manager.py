@@ -0,0 +1,43 @@
+"""
+Tests for FileManager's upload paths.
+"""
+
+import asyncio
+import hashlib
+import io
+import tempfile
+
+from bson import ObjectId
+from fastapi import UploadFile
+from mongomock_motor import AsyncMongoMockClient
+
+from app.utils.file_manager import FileManager
+
+
+def make_upload(data: bytes) -> UploadFile:
+    """An UploadFile whose spool has rolled over to disk, as Starlette leaves large uploads."""
+    spool = tempfile.SpooledTemporaryFile(max_size=1024)
+    spool.write(data)
+    assert spool._rolled
+    return UploadFile(file=spool, filename="doc.pdf")
+
+
+def test_save_upload_file_stores_and_deduplicates(tmp_path):
+    async def run():
+        db = AsyncMongoMockClient().prepgenDB
+        file_manager = FileManager(str(tmp_path))
+        data = b"%PDF-" + bytes(range(256)) * 8192
+
+        first_id, second_id = str(ObjectId()), str(ObjectId())
+        blob_key, size, content_hash = await file_manager.save_upload_file(make_upload(data), first_id, db)
+        assert (size, content_hash) == (len(data), hashlib.sha256(data).hexdigest())
+        assert await file_manager.save_upload_file(make_upload(data), second_id, db) == (blob_key, size, content_hash)
+
+        stored = io.BytesIO()
+        async for chunk in file_manager.read_file(first_id, content_hash):
+            stored.write(chunk)
+        assert stored.getvalue() == data
+        assert sorted((await db.blobs.find_one({"_id": content_hash}))["refs"]) == sorted([first_id, second_id])
+        assert not list(tmp_path.glob("*.tmp"))
+
+    asyncio.run(run())
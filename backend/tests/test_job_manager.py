@@ -0,0 +1,170 @@
+"""
+Tests for JobManager's handling of jobs orphaned by a restarted or crashed process.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+
+from app.db.init_db import create_indexes
+from app.utils.job_manager import JOB_FAILED, JOB_RUNNING, JOB_STALE_AFTER, JobManager
+
+
+def make_db():
+    return AsyncMongoMockClient().prepgenDB
+
+
+class YieldingDatabase:
+    """Database whose 'jobs' calls first yield to the event loop, like a real round trip."""
+
+    def __init__(self, db):
+        self._db = db
+
+    @property
+    def jobs(self):
+        return YieldingCollection(self._db.jobs)
+
+
+class YieldingCollection:
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        method = getattr(self._collection, name)
+
+        async def call(*args, **kwargs):
+            await asyncio.sleep(0)
+            return await method(*args, **kwargs)
+
+        return call
+
+
+async def insert_job(db, owner: str, age_seconds: float, status: str = JOB_RUNNING) -> ObjectId:
+    """An active job as another (or a previous) process left it."""
+    now = datetime.utcnow()
+    result = await db.jobs.insert_one({
+        "user_id": "user",
+        "kind": "summarize",
+        "content_id": "content",
+        "queue_key": None,
+        "status": status,
+        "owner": owner,
+        "created_at": now - timedelta(seconds=age_seconds),
+        "updated_at": now - timedelta(seconds=age_seconds)
+    })
+    return result.inserted_id
+
+
+async def finished_work():
+    return {"summary": "done"}
+
+
+def test_stale_job_of_dead_process_is_replaced():
+    async def run():
+        db = make_db()
+        manager = JobManager()
+        orphan_id = await insert_job(db, "old-host:1:x", JOB_STALE_AFTER + 5)
+
+        job = await manager.submit(db, "user", "summarize", finished_work, content_id="content")
+        assert job["job_id"] != str(orphan_id)
+
+        orphan = await db.jobs.find_one({"_id": orphan_id})
+        assert orphan["status"] == JOB_FAILED
+        assert orphan["error_status"] == 503
+        await manager.shutdown(db)
+
+    asyncio.run(run())
+
+
+def test_live_job_of_other_worker_is_reused():
+    async def run():
+        db = make_db()
+        manager = JobManager()
+        other_id = await insert_job(db, "other-worker:2:y", 1)
+
+        job = await manager.submit(db, "user", "summarize", finished_work, content_id="content")
+        assert job["job_id"] == str(other_id)
+        assert (await db.jobs.find_one({"_id": other_id}))["status"] == JOB_RUNNING
+
+    asyncio.run(run())
+
+
+def test_own_job_not_running_here_fails_on_poll():
+    async def run():
+        db = make_db()
+        manager = JobManager()
+        job_id = await insert_job(db, manager.owner, 1)
+
+        job = await manager.get_job(db, str(job_id), "user")
+        assert job["status"] == JOB_FAILED
+
+    asyncio.run(run())
+
+
+def test_startup_fails_only_stale_jobs():
+    async def run():
+        db = make_db()
+        manager = JobManager()
+        stale_id = await insert_job(db, "old-host:1:x", JOB_STALE_AFTER + 5)
+        live_id = await insert_job(db, "other-worker:2:y", 1)
+
+        assert await manager.fail_orphaned_jobs(db) == 1
+        assert (await db.jobs.find_one({"_id": stale_id}))["status"] == JOB_FAILED
+        assert (await db.jobs.find_one({"_id": live_id}))["status"] == JOB_RUNNING
+
+    asyncio.run(run())
+
+
+def test_job_runs_and_shutdown_fails_unfinished_jobs():
+    async def run():
+        db = make_db()
+        manager = JobManager()
+
+        job = await manager.submit(db, "user", "summarize", finished_work, content_id="done")
+        await asyncio.sleep(0.05)
+        stored = await manager.get_job(db, job["job_id"], "user")
+        assert stored["status"] == "done"
+        assert stored["result"] == {"summary": "done"}
+
+        async def never_finishes():
+            await asyncio.sleep(3600)
+
+        job = await manager.submit(db, "user", "quiz", never_finishes, content_id="slow")
+        await asyncio.sleep(0.05)
+        await manager.shutdown(db)
+        stored = await db.jobs.find_one({"_id": ObjectId(job["job_id"])})
+        assert stored["status"] == JOB_FAILED
+
+    asyncio.run(run())
+
+
+def test_concurrent_submissions_share_one_job():
+    async def run():
+        mock_db = make_db()
+        await create_indexes(mock_db)
+        db = YieldingDatabase(mock_db)
+        manager = JobManager()
+
+        async def slow_work():
+            await asyncio.sleep(0.2)
+            return {"summary": "done"}
+
+        # Separate managers stand in for separate worker processes
+        managers = [manager, JobManager(), JobManager()]
+        jobs = await asyncio.gather(*(
+            managers[i % 3].submit(db, "user", "summarize", slow_work, content_id="content")
+            for i in range(9)
+        ))
+        assert len({job["job_id"] for job in jobs}) == 1
+        assert await db.jobs.count_documents({}) == 1
+
+        # Once finished, the same operation can start a new job
+        await asyncio.sleep(0.3)
+        job = await manager.submit(db, "user", "summarize", slow_work, content_id="content")
+        assert job["job_id"] != jobs[0]["job_id"]
+        for each in managers:
+            await each.shutdown(db)
+
+    asyncio.run(run())
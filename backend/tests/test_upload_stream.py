@@ -0,0 +1,93 @@
+"""
+Tests for MultipartFileStream (single-pass multipart upload parsing).
+"""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.utils.upload_stream import MultipartFileStream
+
+
+BOUNDARY = b"----testboundary"
+
+
+def make_request(body: bytes, chunk_size: int) -> Request:
+    """A request whose body arrives in chunks of chunk_size bytes."""
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+        for i, chunk in enumerate(chunks)
+    ]
+
+    async def receive():
+        return messages.pop(0)
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/content/upload",
+        "headers": [(b"content-type", b"multipart/form-data; boundary=" + BOUNDARY)],
+    }
+    return Request(scope, receive)
+
+
+def form_body(fields: list) -> bytes:
+    """Encode (headers, data) parts as a multipart/form-data body."""
+    body = b""
+    for headers, data in fields:
+        body += b"--" + BOUNDARY + b"\r\n" + headers + b"\r\n\r\n" + data + b"\r\n"
+    return body + b"--" + BOUNDARY + b"--\r\n"
+
+
+async def read_upload(request: Request):
+    stream = MultipartFileStream(request)
+    found = await stream.start()
+    data = b"".join([chunk async for chunk in stream]) if found else None
+    return found, stream.filename, stream.content_type, data
+
+
+def test_field_before_file_in_same_chunk():
+    """A text field parsed in the same chunk as the file's headers must not be taken for the file."""
+    payload = b"%PDF-" + bytes(range(256)) * 64
+    body = form_body([
+        (b'Content-Disposition: form-data; name="note"', b"hi"),
+        (b'Content-Disposition: form-data; name="file"; filename="doc.pdf"\r\n'
+         b"Content-Type: application/pdf", payload),
+    ])
+
+    # Whole body in one chunk, then split so the file spans many chunks
+    for chunk_size in (len(body), 4096, 7):
+        found, filename, content_type, data = asyncio.run(read_upload(make_request(body, chunk_size)))
+        assert found
+        assert filename == "doc.pdf"
+        assert content_type == "application/pdf"
+        assert data == payload
+
+
+def test_missing_file_field():
+    body = form_body([(b'Content-Disposition: form-data; name="note"', b"hi")])
+    found, filename, _, _ = asyncio.run(read_upload(make_request(body, len(body))))
+    assert not found
+    assert filename is None
+
+
+def test_malformed_body_before_file_is_400():
+    body = b"garbage-not-multipart\r\n" * 4
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(read_upload(make_request(body, len(body))))
+    assert e.value.status_code == 400
+
+
+def test_malformed_body_after_file_headers_is_400():
+    """A malformed part after the file is only parsed while the file streams."""
+    body = form_body([
+        (b'Content-Disposition: form-data; name="file"; filename="doc.pdf"\r\n'
+         b"Content-Type: application/pdf", b"%PDF-" + b"x" * 10000),
+        (b"not a header line", b"hi"),
+    ])
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(read_upload(make_request(body, 4096)))
+    assert e.value.status_code == 400
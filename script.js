@@ -13,6 +13,23 @@ document.addEventListener('DOMContentLoaded', function() {
     // For local development, use:
     // const API_BASE_URL = "http://127.0.0.1:8000";
     
+    // How often to poll background AI jobs (summarize/quiz)
+    const JOB_POLL_INTERVAL_MS = 2000;
+    // Give up on a job after this long (longest AI deadline plus queueing)
+    const JOB_TIMEOUT_MS = 30 * 60 * 1000;
+    
+    // Files above this size are uploaded in resumable chunks (/uploads)
+    const RESUMABLE_UPLOAD_THRESHOLD = 8 * 1024 * 1024;
+    const RESUMABLE_CHUNK_SIZE = 5 * 1024 * 1024;
+    const RESUMABLE_MAX_RETRIES = 5;
+    
+    // MIME types by extension (some browsers leave File.type empty for Office files)
+    const UPLOAD_MIME_TYPES = {
+        '.pdf': 'application/pdf',
+        '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+        '.pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation'
+    };
+    
     
     // ============================================================================
     // DOM ELEMENT SELECTION
@@ -228,6 +245,141 @@ document.addEventListener('DOMContentLoaded', function() {
     }
     
     
+    /**
+     * Run a long AI operation (summarize/quiz/YouTube) in job mode.
+     * The backend answers right away with a job (202) and we poll its status,
+     * so no HTTP request is held open for minutes. Results already stored on
+     * the server come back directly.
+     * @param {string} endpoint - AI endpoint (e.g. /content/{id}/summarize)
+     * @param {object} body - Optional JSON request body
+     * @returns {Promise<any>} - Job result or null on error
+     */
+    async function runAIJob(endpoint, body) {
+        const separator = endpoint.includes('?') ? '&' : '?';
+        const data = await fetchAPI(`${endpoint}${separator}async=1`, {
+            method: 'POST',
+            ...(body ? { body: JSON.stringify(body) } : {})
+        });
+        
+        // Served from storage - no job needed
+        if (!data || !data.job_id) {
+            return data;
+        }
+        
+        let lastPosition = null;
+        const deadline = Date.now() + JOB_TIMEOUT_MS;
+        
+        while (true) {
+            if (Date.now() >= deadline) {
+                throw new Error('The AI job is taking too long. Please try again later.');
+            }
+            
+            await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+            
+            const job = await fetchAPI(`/jobs/${data.job_id}`);
+            if (!job) {
+                return null;
+            }
+            
+            // Let the user know they are waiting behind other AI requests
+            if (job.queue_position && job.queue_position !== lastPosition) {
+                lastPosition = job.queue_position;
+                showNotification(`Waiting for the AI service (position ${job.queue_position} in queue)...`, 'info');
+            }
+            
+            if (job.status === 'done') {
+                return job.result;
+            }
+            
+            if (job.status === 'failed') {
+                throw new Error(job.error || 'AI job failed');
+            }
+        }
+    }
+    
+    
+    /**
+     * POST to a streaming (Server-Sent Events) endpoint and deliver text as it arrives.
+     * @param {string} endpoint - Streaming endpoint (e.g. /content/{id}/ask/stream)
+     * @param {object} body - JSON request body
+     * @param {function} onText - Called with each text chunk
+     * @returns {Promise<any>} - Payload of the final 'done' event, or null on error
+     */
+    async function streamAPI(endpoint, body, onText) {
+        const accessToken = localStorage.getItem('access_token');
+        
+        if (!accessToken) {
+            showLoginPage();
+            return null;
+        }
+        
+        try {
+            const response = await fetch(`${API_BASE_URL}${endpoint}`, {
+                method: 'POST',
+                headers: {
+                    'Authorization': `Bearer ${accessToken}`,
+                    'Content-Type': 'application/json',
+                    'Accept': 'text/event-stream'
+                },
+                body: JSON.stringify(body)
+            });
+            
+            if (response.status === 401) {
+                localStorage.removeItem('access_token');
+                showLoginPage();
+                showNotification('Session expired. Please login again.', 'error');
+                return null;
+            }
+            
+            if (!response.ok) {
+                const errorData = await response.json().catch(() => ({ detail: 'An error occurred' }));
+                throw new Error(errorData.detail || `HTTP error! status: ${response.status}`);
+            }
+            
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                
+                buffer += decoder.decode(value, { stream: true });
+                
+                // SSE frames are separated by a blank line
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    const frame = buffer.slice(0, boundary);
+                    buffer = buffer.slice(boundary + 2);
+                    
+                    let event = 'message';
+                    let data = '';
+                    for (const line of frame.split('\n')) {
+                        if (line.startsWith('event:')) event = line.slice(6).trim();
+                        if (line.startsWith('data:')) data += line.slice(5).trim();
+                    }
+                    if (!data) continue;
+                    
+                    const payload = JSON.parse(data);
+                    if (event === 'done') return payload;
+                    if (event === 'error') throw new Error(payload.detail || 'AI service error');
+                    if (event === 'queued') {
+                        showNotification(`Waiting for the AI service (position ${payload.position} in queue)...`, 'info');
+                        continue;
+                    }
+                    if (payload.text) onText(payload.text);
+                }
+            }
+            
+            return null;
+        } catch (error) {
+            console.error('Stream Error:', error);
+            showNotification(error.message || 'An error occurred', 'error');
+            return null;
+        }
+    }
+    
+    
     // ============================================================================
     // PAGE VISIBILITY FUNCTIONS
     // ============================================================================
@@ -896,9 +1048,7 @@ document.addEventListener('DOMContentLoaded', function() {
             showNotification('Generating summary...', 'info');
             
             // Request summary from backend
-            const data = await fetchAPI(`/content/${contentId}/summarize`, {
-                method: 'POST'
-            });
+            const data = await runAIJob(`/content/${contentId}/summarize`);
             
             if (data && data.summary) {
                 // Navigate to chat page
@@ -964,9 +1114,7 @@ document.addEventListener('DOMContentLoaded', function() {
             showNotification('Generating quiz questions...', 'info');
             
             // Request quiz from backend
-            const data = await fetchAPI(`/content/${contentId}/quiz`, {
-                method: 'POST'
-            });
+            const data = await runAIJob(`/content/${contentId}/quiz`);
             
             if (data && data.questions && data.questions.length > 0) {
                 // Initialize quiz state
@@ -1110,6 +1258,13 @@ document.addEventListener('DOMContentLoaded', function() {
         // Show loading notification
         showNotification('Uploading file...', 'info');
         
+        // Large files go up in chunks that survive a dropped connection
+        if (file.size > RESUMABLE_UPLOAD_THRESHOLD) {
+            uploadFileResumable(file, UPLOAD_MIME_TYPES[fileExtension]);
+            fileInput.value = '';
+            return;
+        }
+        
         // Create FormData and upload
         const formData = new FormData();
         formData.append('file', file);
@@ -1168,6 +1323,102 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
     
+    /**
+     * Upload a large file in chunks (create, PATCH each chunk, finalize).
+     * After a network error the upload resumes from the offset the server
+     * reports, so only the missing bytes are sent again.
+     * @param {File} file - File to upload
+     * @param {string} contentType - MIME type of the file
+     */
+    async function uploadFileResumable(file, contentType) {
+        const accessToken = localStorage.getItem('access_token');
+        
+        if (!accessToken) {
+            showLoginPage();
+            return;
+        }
+        
+        const upload = await fetchAPI('/uploads/', {
+            method: 'POST',
+            body: JSON.stringify({ filename: file.name, content_type: contentType, size: file.size })
+        });
+        if (!upload) {
+            return;
+        }
+        
+        try {
+            let offset = upload.offset;
+            let retries = 0;
+            let lastProgress = 0;
+            
+            while (offset < file.size) {
+                try {
+                    const response = await fetch(`${API_BASE_URL}${upload.upload_url}`, {
+                        method: 'PATCH',
+                        headers: {
+                            'Authorization': `Bearer ${accessToken}`,
+                            'Content-Type': 'application/offset+octet-stream',
+                            'Upload-Offset': String(offset)
+                        },
+                        body: file.slice(offset, offset + RESUMABLE_CHUNK_SIZE)
+                    });
+                    
+                    if (response.status === 401) {
+                        localStorage.removeItem('access_token');
+                        showLoginPage();
+                        showNotification('Session expired. Please login again.', 'error');
+                        return;
+                    }
+                    
+                    // 409: the server has a different offset - continue from there
+                    if (!response.ok && response.status !== 409) {
+                        const errorData = await response.json().catch(() => ({ detail: 'Upload failed' }));
+                        throw new Error(errorData.detail || 'Upload failed');
+                    }
+                    
+                    offset = parseInt(response.headers.get('Upload-Offset'), 10);
+                    retries = 0;
+                } catch (error) {
+                    // Network errors: ask the server how far it got, then resume
+                    if (!(error instanceof TypeError) || ++retries > RESUMABLE_MAX_RETRIES) {
+                        throw error;
+                    }
+                    await new Promise(resolve => setTimeout(resolve, 1000 * retries));
+                    
+                    const status = await fetchAPI(upload.upload_url);
+                    if (!status) {
+                        return;
+                    }
+                    offset = status.offset;
+                }
+                
+                // Progress every 25%
+                const progress = Math.floor((offset / file.size) * 4) * 25;
+                if (progress > lastProgress && offset < file.size) {
+                    lastProgress = progress;
+                    showNotification(`Uploading file... ${progress}%`, 'info');
+                }
+            }
+            
+            const data = await fetchAPI(`${upload.upload_url}/finalize`, { method: 'POST' });
+            if (!data) {
+                return;
+            }
+            showNotification('File uploaded successfully!', 'success');
+            
+            // Refresh both dashboard and quiz materials lists
+            await Promise.all([
+                fetchAndDisplayContent(),
+                fetchQuizMaterials()
+            ]);
+            
+        } catch (error) {
+            console.error('Upload error:', error);
+            showNotification(error.message || 'Failed to upload file', 'error');
+            await fetchAPI(upload.upload_url, { method: 'DELETE' });
+        }
+    }
+    
     /**
      * Open YouTube summarize modal
      */
@@ -1229,11 +1480,8 @@ document.addEventListener('DOMContentLoaded', function() {
         youtubeLoading.classList.remove('hidden');
         
         try {
-            // Request summary from backend
-            const data = await fetchAPI('/api/youtube/summarize', {
-                method: 'POST',
-                body: JSON.stringify({ url: youtubeUrl })
-            });
+            // Request summary from backend (job mode: long transcripts take minutes)
+            const data = await runAIJob('/api/youtube/summarize', { url: youtubeUrl });
             
             if (data && data.summary) {
                 // Set active chat document for YouTube
@@ -1270,6 +1518,7 @@ document.addEventListener('DOMContentLoaded', function() {
      * Add a message to the chat
      * @param {string} sender - 'User' or 'AI'
      * @param {string} message - Message text
+     * @returns {HTMLElement} The message element (to update while streaming)
      */
     /**
      * Convert Markdown to HTML using marked.js library
@@ -1320,6 +1569,8 @@ document.addEventListener('DOMContentLoaded', function() {
         
         // Scroll to bottom
         chatMessages.scrollTop = chatMessages.scrollHeight;
+        
+        return messageDiv;
     }
     
     /**
@@ -1363,21 +1614,42 @@ document.addEventListener('DOMContentLoaded', function() {
         chatMessages.appendChild(typingDiv);
         chatMessages.scrollTop = chatMessages.scrollHeight;
         
-        // Send message to backend
-        const data = await fetchAPI(`/content/${activeChatDocument.id}/ask`, {
-            method: 'POST',
-            body: JSON.stringify({ question: message })
-        });
+        // Stream the answer from the backend, rendering it as it arrives
+        let answerText = '';
+        let answerDiv = null;
+        
+        const removeTypingIndicator = () => {
+            const indicator = document.getElementById('typing-indicator');
+            if (indicator) {
+                indicator.remove();
+            }
+        };
+        
+        const data = await streamAPI(
+            `/content/${activeChatDocument.id}/ask/stream`,
+            { question: message },
+            (text) => {
+                answerText += text;
+                if (!answerDiv) {
+                    removeTypingIndicator();
+                    answerDiv = addMessageToChat('AI', answerText);
+                } else {
+                    answerDiv.querySelector('.markdown-content').innerHTML = markdownToHTML(answerText);
+                    chatMessages.scrollTop = chatMessages.scrollHeight;
+                }
+            }
+        );
         
         // Remove typing indicator
-        const indicator = document.getElementById('typing-indicator');
-        if (indicator) {
-            indicator.remove();
-        }
+        removeTypingIndicator();
         
         if (data && data.answer) {
-            addMessageToChat('AI', data.answer);
-        } else {
+            if (answerDiv) {
+                answerDiv.querySelector('.markdown-content').innerHTML = markdownToHTML(answerText);
+            } else {
+                addMessageToChat('AI', data.answer);
+            }
+        } else if (!answerDiv) {
             addMessageToChat('AI', 'Sorry, I could not generate a response. Please try again.');
         }
     }